@@ -0,0 +1,44 @@
+# Scaling benchmark for the index-based TTC engine.
+#
+#   python benchmarks/ttc_scaling.py [max_size]
+#
+# Full preference lists for 10^5 agents do not fit in memory, so every agent ranks the objects
+# in a cyclic order (shift, shift + step, shift + 2 * step, ...) that is generated on access.
+# The random shift makes agents compete for the same objects, so pointers keep moving.
+import random
+import sys
+import time
+from gamealloc.ttc import _ttc_engine
+
+class CyclicRow:
+    """Preference list row[k] = (shift + k * step) % n, generated on access."""
+    __slots__ = ("shift", "step", "n")
+
+    def __init__(self, shift, step, n):
+        self.shift, self.step, self.n = shift, step, n
+
+    def __getitem__(self, k):
+        return (self.shift + k * self.step) % self.n
+
+    def __len__(self):
+        return self.n
+
+def instance(size, seed=42):
+    rng = random.Random(seed)
+    step = 1 if size < 3 else size - 1 # coprime with size
+    prefs = [CyclicRow(rng.randrange(size), step, size) for _ in range(size)]
+    endowment = rng.sample(range(size), size)
+    return endowment, prefs
+
+def main(max_size=100_000):
+    print(f"{'agents':>10} {'seconds':>10}")
+    size = 100
+    while size <= max_size:
+        endowment, prefs = instance(size)
+        start = time.perf_counter()
+        _ttc_engine(endowment, prefs)
+        print(f"{size:>10} {time.perf_counter() - start:>10.4f}")
+        size *= 10
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
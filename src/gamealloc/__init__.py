@@ -1,19 +1,66 @@
-from .preference import Preference
-from .allocation import Allocation
-from .sp import sequential_priority
-from .ttc import top_trading_cycles
-from .pareto import is_pareto_efficient, find_all_pareto_efficient_allocations
+from .preference import Preference, SparsePreference
+from .allocation import Allocation, CompactAllocation, ManyToOneAllocation, NameTable
+from .observer import TraceEvent, TraceRecorder
+from .sp import sequential_priority, sequential_priority_batch, IncrementalSP
+from .ttc import top_trading_cycles, top_trading_cycles_batch
+from .pareto import is_pareto_efficient, find_improving_cycle, pareto_improve, ParetoImprovement, find_all_pareto_efficient_allocations, iter_pareto_efficient_allocations
+from .pareto import ParetoEfficientOutcomes, count_pareto_efficient_allocations
 from .instance import random_objects_allocation_instance, random_objects_preference_instance
-from .manipulation import manipulation
+from .instance import uniform_preference_instance, mallows_preference_instance, single_peaked_preference_instance
+from .instance import common_value_preference_instance, spawn_seeds
+from .storage import save_preference, load_preference, save_allocations, load_allocations
+from .storage import SharedPreference, PreferenceHandle, attach_preference, detach_preference
+from .cache import ResultCache, profile_hash
+from .rsd import RSDResult, rsd_monte_carlo, rsd_exact
+from .manipulation import manipulation, fast_manipulation, audit_all_agents
+from .fuzz import Counterexample, FuzzResult, fuzz_strategy_proofness
 
 __all__ = [
     "Preference",
+    "SparsePreference",
     "Allocation",
+    "TraceEvent",
+    "TraceRecorder",
+    "CompactAllocation",
+    "ManyToOneAllocation",
+    "NameTable",
     "sequential_priority",
     "top_trading_cycles",
+    "sequential_priority_batch",
+    "IncrementalSP",
+    "top_trading_cycles_batch",
     "is_pareto_efficient",
+    "find_improving_cycle",
+    "pareto_improve",
+    "ParetoImprovement",
     "find_all_pareto_efficient_allocations",
+    "iter_pareto_efficient_allocations",
+    "ParetoEfficientOutcomes",
+    "count_pareto_efficient_allocations",
+    "save_preference",
+    "load_preference",
+    "save_allocations",
+    "load_allocations",
+    "SharedPreference",
+    "PreferenceHandle",
+    "attach_preference",
+    "detach_preference",
+    "ResultCache",
+    "profile_hash",
+    "RSDResult",
+    "rsd_monte_carlo",
+    "rsd_exact",
     "manipulation",
+    "fast_manipulation",
+    "audit_all_agents",
+    "fuzz_strategy_proofness",
+    "FuzzResult",
+    "Counterexample",
     "random_objects_allocation_instance", 
-    "random_objects_preference_instance"
+    "random_objects_preference_instance",
+    "uniform_preference_instance",
+    "mallows_preference_instance",
+    "single_peaked_preference_instance",
+    "common_value_preference_instance",
+    "spawn_seeds",
 ]
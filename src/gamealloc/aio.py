@@ -0,0 +1,266 @@
+# asyncio front end: mechanism runs are offloaded to an executor and concurrent requests are micro-batched
+#
+# Stand-in server for load testing: `python -m gamealloc.aio --port 8765`
+# Every request line is one JSON instance in the `gamealloc.cli` format plus "mechanism" ("sp", "ttc" or "pareto");
+# every response line is {"id", "result"} or {"id", "error"}. Responses on one connection may come back out of order.
+from typing import *
+from concurrent.futures import Executor, ThreadPoolExecutor
+import argparse
+import asyncio
+import json
+import operator
+from .preference import Preference
+from .allocation import Allocation
+from .sp import sequential_priority_batch, _check_order
+from .ttc import top_trading_cycles_batch, _check_endowment
+from .pareto import _check_allocation, _improving_cycle
+from .cache import profile_hash
+
+def _run_batch(mechanism: str, preference: Preference, arguments: List[List[int]]) -> List[Any]:
+    """Run one mechanism for every argument on one profile. Module-level so that process pools can pickle it."""
+    if mechanism == "sp":
+        return [row.tolist() for row in sequential_priority_batch(arguments, preference)]
+    if mechanism == "ttc":
+        return [row.tolist() for row in top_trading_cycles_batch(arguments, preference)]
+    ranks = preference.rank_matrix()
+    return [_improving_cycle(allocation, preference.prefs, ranks) is None for allocation in arguments]
+
+def _prepare(mechanism: str, preference: Preference, request: Union[List[int], Allocation]) -> str:
+    """Validate one request against its profile and return the profile hash. Runs in the executor, like `_run_batch`."""
+    if mechanism == "sp":
+        _check_order(request, len(preference.prefs))
+    elif mechanism == "ttc":
+        _check_endowment(request, len(preference.prefs))
+    else:
+        _check_allocation(request, preference)
+    return profile_hash(preference)
+
+def _as_indices(values: Sequence[int], name: str) -> List[int]:
+    try:
+        return list(map(operator.index, values))
+    except TypeError:
+        raise TypeError(f"Each element in {name} should be int.")
+
+class AllocationService:
+    """
+    Non-blocking, micro-batching front end for `sequential_priority`, `top_trading_cycles` and `is_pareto_efficient`.
+
+    Every request is checked and its profile hashed in the executor before it joins a batch, so an invalid request
+    raises in its caller and never fails a batch. Valid requests that share a mechanism and a profile (same
+    `profile_hash`, so equal profiles built by different clients are grouped too) are collected for up to max_delay
+    seconds or until max_batch of them are waiting, then run as one batched call in the executor. The event loop is
+    never blocked by a mechanism run, a validation or a profile hash.
+
+    Backpressure: at most max_pending requests are queued or running; further callers wait for a slot.
+    Cancellation: a cancelled caller is dropped from its batch, and a batch whose callers are all cancelled is not run.
+    A batch already running in the executor finishes, and its results for cancelled callers are discarded.
+
+    Parameters
+    --------
+    executor: concurrent.futures.Executor, optional
+        Where batches run. With a ProcessPoolExecutor, each batch sends its profile to the worker once.
+        If not provided, the service owns a single-thread ThreadPoolExecutor and shuts it down in `close()`.
+    max_batch: int
+        Maximum number of requests per batched run (default = 64).
+    max_delay: float
+        Seconds the first request of a batch waits for others (default = 0.002).
+    max_pending: int
+        Maximum number of requests queued or running (default = 1024).
+
+    Examples
+    --------
+    >>> async def main():
+    ...     async with AllocationService() as service:
+    ...         pref = Preference([[0, 1, 2], [2, 0, 1], [2, 1, 0]])
+    ...         results = await asyncio.gather(*(service.sequential_priority(order, pref) for order in ([0, 1, 2], [2, 1, 0])))
+    ...         return [r.to_list() for r in results], service.stats()
+    >>> asyncio.run(main())
+    ([[0, 2, 1], [1, 0, 2]], {'requests': 2, 'batches': 1, 'cancelled': 0})
+    """
+
+    def __init__(self, executor: Optional[Executor] = None, max_batch: int = 64, max_delay: float = 0.002, max_pending: int = 1024):
+        if max_batch <= 0 or max_pending <= 0:
+            raise ValueError("max_batch and max_pending should be positive integers.")
+        if max_delay < 0:
+            raise ValueError("max_delay should be non-negative.")
+        self._owns_executor = executor is None
+        self._executor = executor if executor is not None else ThreadPoolExecutor(max_workers=1)
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self._slots = None # asyncio.Semaphore, created on first use so the service binds to the running loop
+        self._batches = {} # (mechanism, profile hash) -> (preference, [(argument, future)], timer handle)
+        self._running = set()
+        self.requests = self.batch_count = self.cancelled = 0
+
+    async def __aenter__(self) -> "AllocationService":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def sequential_priority(self, order: Sequence[int], preferences: Preference) -> Allocation:
+        """Asynchronous `sequential_priority`."""
+        self._check_preference(preferences)
+        order = _as_indices(order, "order")
+        allocation = await self._submit("sp", preferences, order)
+        return Allocation._from_trusted(allocation, preferences.agents, preferences.objects)
+
+    async def top_trading_cycles(self, endowment: Sequence[int], preferences: Preference) -> Allocation:
+        """Asynchronous `top_trading_cycles`."""
+        self._check_preference(preferences)
+        endowment = _as_indices(endowment, "endowment")
+        allocation = await self._submit("ttc", preferences, endowment)
+        return Allocation._from_trusted(allocation, preferences.agents, preferences.objects)
+
+    async def is_pareto_efficient(self, allocation: Allocation, preference: Preference) -> bool:
+        """Asynchronous `is_pareto_efficient`."""
+        self._check_preference(preference)
+        if not isinstance(allocation, Allocation):
+            raise TypeError("allocation should be Allocation type.")
+        return await self._submit("pareto", preference, list(allocation.allocation), allocation)
+
+    @staticmethod
+    def _check_preference(preference: Preference):
+        if not isinstance(preference, Preference):
+            raise TypeError("preference should be Preference type.")
+
+    async def _submit(self, mechanism: str, preference: Preference, argument: List[int], request: Any = None) -> Any:
+        """Queue argument in its batch once request (default = argument) is validated in the executor."""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+        async with self._slots:
+            loop = asyncio.get_running_loop()
+            self.requests += 1
+            try:
+                digest = await loop.run_in_executor(self._executor, _prepare, mechanism, preference,
+                                                    argument if request is None else request)
+                preference._digest = digest # computed in another process with a process pool
+                future = loop.create_future()
+                key = (mechanism, digest)
+                if key not in self._batches:
+                    timer = loop.call_later(self.max_delay, self._flush, key)
+                    self._batches[key] = (preference, [], timer)
+                batch = self._batches[key][1]
+                batch.append((argument, future))
+                if len(batch) >= self.max_batch:
+                    self._flush(key)
+                return await future
+            except asyncio.CancelledError:
+                self.cancelled += 1
+                raise
+
+    def _flush(self, key: Tuple[str, str]):
+        preference, batch, timer = self._batches.pop(key)
+        timer.cancel()
+        batch = [(argument, future) for argument, future in batch if not future.cancelled()]
+        if not batch:
+            return
+        self.batch_count += 1
+        task = asyncio.ensure_future(self._run(key[0], preference, batch))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _run(self, mechanism: str, preference: Preference, batch: List[Tuple[List[int], asyncio.Future]]):
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(self._executor, _run_batch, mechanism, preference, [argument for argument, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def close(self):
+        """Run every waiting batch, wait for running ones, and shut down the executor if the service owns it."""
+        for key in list(self._batches):
+            self._flush(key)
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+        if self._owns_executor:
+            self._executor.shutdown(wait=True)
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of requests, batched runs and cancelled requests so far."""
+        return {"requests": self.requests, "batches": self.batch_count, "cancelled": self.cancelled}
+
+async def handle_request(service: AllocationService, line: str) -> Dict[str, Any]:
+    """Answer one JSON request line of the stand-in server."""
+    response = {}
+    try:
+        instance = json.loads(line)
+        if not isinstance(instance, dict):
+            raise TypeError("Each request should be a JSON object.")
+        response["id"] = instance.get("id")
+        preference = Preference(instance["prefs"], instance.get("agents"), instance.get("objects"))
+        mechanism = instance.get("mechanism", "sp")
+        if mechanism == "sp":
+            response["result"] = (await service.sequential_priority(instance["order"], preference)).to_list()
+        elif mechanism == "ttc":
+            response["result"] = (await service.top_trading_cycles(instance["endowment"], preference)).to_list()
+        elif mechanism == "pareto":
+            allocation = Allocation(instance["allocation"], preference.agents, preference.objects)
+            response["result"] = await service.is_pareto_efficient(allocation, preference)
+        else:
+            raise ValueError(f"Unknown mechanism {mechanism!r}.")
+    except (ValueError, TypeError, KeyError) as e:
+        response["error"] = f"{type(e).__name__}: {e}"
+    return response
+
+async def serve(service: AllocationService, host: str = "127.0.0.1", port: int = 8765) -> asyncio.AbstractServer:
+    """
+    Start the stand-in NDJSON server on host:port and return it (see the format at the top of this module).
+
+    Every request line is answered concurrently, so requests from one or many connections share batches.
+    """
+    async def client(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        lock = asyncio.Lock()
+        tasks = set()
+
+        async def answer(line: str):
+            response = await handle_request(service, line)
+            async with lock:
+                writer.write((json.dumps(response) + "\n").encode())
+                await writer.drain()
+
+        try:
+            while line := await reader.readline():
+                if line.strip():
+                    task = asyncio.ensure_future(answer(line.decode()))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            writer.close()
+
+    return await asyncio.start_server(client, host, port)
+
+def main(argv: Optional[List[str]] = None):
+    """Run the stand-in server until interrupted."""
+    parser = argparse.ArgumentParser(prog="python -m gamealloc.aio", description="Stand-in NDJSON allocation server for load testing.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max-batch", type=int, default=64, help="requests per batched run (default 64)")
+    parser.add_argument("--max-delay", type=float, default=0.002, help="seconds a batch waits for more requests (default 0.002)")
+    parser.add_argument("--max-pending", type=int, default=1024, help="requests queued or running (default 1024)")
+    args = parser.parse_args(argv)
+
+    async def run():
+        async with AllocationService(max_batch=args.max_batch, max_delay=args.max_delay, max_pending=args.max_pending) as service:
+            server = await serve(service, args.host, args.port)
+            async with server:
+                await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
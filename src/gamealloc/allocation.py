@@ -1,6 +1,8 @@
 from dataclasses import dataclass
 from typing import *
+from array import array
 import warnings
+import weakref
 
 @dataclass
 class Allocation:
@@ -13,7 +15,7 @@ class Allocation:
     Parameters
     ----------
     allocation : List[int]
-        allocation[i] is the index of the object assigned to agent i.
+        allocation[i] is the index of the object assigned to agent i, or -1 if agent i is unassigned.
     agents : Optional[List[str]], optional
         Names or identifiers of the agents.
     objects : Optional[List[str]], optional
@@ -22,7 +24,7 @@ class Allocation:
     Attributes
     ----------
     allocation : List[int]
-        allocation[i] is the index of the object assigned to agent i.
+        allocation[i] is the index of the object assigned to agent i, or -1 if agent i is unassigned.
     agents : Optional[List[str]]
         Names or identifiers of the agents. If not provided, default names "agent_0", "agent_1", ... are used.
     objects : Optional[List[str]]
@@ -33,12 +35,14 @@ class Allocation:
     to_list() -> List
         Return the allocation as a list of assigned object indices.
     to_dict() -> Dict[str, str]
-        Convert the allocation to a dictionary mapping agent names to object names.
+        Convert the allocation to a dictionary mapping agent names to object names (None for unassigned agents).
     to_pairs() -> List[tuple]
-        Return the allocation as a list of (agent, object) pairs.
+        Return the allocation as a list of (agent, object) pairs (None for unassigned agents).
     validate() -> Allocation
         Checks and enforces the consistency and validity of the object.  
         Returns a validated Allocation if all checks pass.
+    _from_trusted(allocation, agents, objects) -> Allocation
+        Build an Allocation from data that is already known to be valid, skipping all checks.
     __str__()
         Return a pretty string representation of the allocation.
     __repr__()
@@ -67,23 +71,38 @@ class Allocation:
     agents: Optional[List[str]] = None
     objects: Optional[List[str]] = None
 
+    @classmethod
+    def _from_trusted(cls, allocation: List[int], agents: List[str], objects: List[str]) -> "Allocation":
+        """
+        Build an Allocation without running `__post_init__`.
+
+        Used by the algorithms in this package, whose results are valid by construction: the element checks,
+        the duplicate check and the default name lists are skipped. agents and objects must be complete name lists,
+        and they are shared, not copied.
+        """
+        self = cls.__new__(cls)
+        self.allocation = allocation
+        self.agents = agents
+        self.objects = objects
+        return self
+
     def to_list(self) -> List[int]:
         """Return the allocation as a list of assigned object indices."""
         return list(self.allocation)
     
     def to_dict(self) -> Dict[Any, Any]:
-        """Convert the allocation to a dictionary mapping agent names to object names."""
-        return {self.agents[i]: self.objects[v] for i, v in enumerate(self.allocation)}
+        """Convert the allocation to a dictionary mapping agent names to object names (None for unassigned agents)."""
+        return {self.agents[i]: self.objects[v] if v >= 0 else None for i, v in enumerate(self.allocation)}
 
     def to_pairs(self) -> List[tuple]:
-        """Return the allocation as a list of (agent, object) pairs."""
-        return [(self.agents[i], self.objects[v]) for i, v in enumerate(self.allocation)]
+        """Return the allocation as a list of (agent, object) pairs (None for unassigned agents)."""
+        return [(self.agents[i], self.objects[v] if v >= 0 else None) for i, v in enumerate(self.allocation)]
     
     def __str__(self):
         res = self.to_pairs()
         os = [f"\n{'=' * 15} Allocation {'=' * 15}"]
         for agent, object in res:
-            os.append(f"{agent} \u2192 {object}")
+            os.append(f"{agent} \u2192 {object if object is not None else '(unassigned)'}")
         os.append("=" * 42)
         return "\n".join(os)
     
@@ -92,8 +111,8 @@ class Allocation:
     
     def _valid_allocation(self):
         """Check data type in allocation"""
-        if not all(isinstance(x, int) and x >= 0 for x in self.allocation):
-            raise TypeError("Each element in allocation should be non-negative int.")
+        if not all(isinstance(x, int) and x >= -1 for x in self.allocation):
+            raise TypeError("Each element in allocation should be non-negative int, or -1 for an unassigned agent.")
         return self
     
     def _valid_agents(self):
@@ -122,13 +141,12 @@ class Allocation:
         return self._valid_allocation()._valid_agents()._valid_objects()
     
     def __post_init__(self):
-        # TODO: #(agent) > #(object), use -1 to indicate agent who is not be assigned
         self._valid_allocation()._valid_agents()._valid_objects()
         n = len(self.allocation)
-        set_allocation = set(self.allocation)
+        assigned = [x for x in self.allocation if x >= 0] # -1 marks an unassigned agent
         agents = [f"agent_{i}" for i in range(n)]
-        objects = [f"object_{i}" for i in range(n)]
-        if len(set_allocation) != n:
+        objects = [f"object_{i}" for i in range(max(n, max(assigned, default=-1) + 1))]
+        if len(set(assigned)) != len(assigned):
             raise ValueError("One object cannot be assigned to multi-agents")
         if self.agents is None:
             self.agents = agents
@@ -138,10 +156,281 @@ class Allocation:
             if len(self.agents) < n:
                 warnings.warn(f"List of agents is partial. \
                                 Missing names have been appended as \"agent_i\" for the i-th agent.", UserWarning)
-            self.agents += agents[len(self.agents):]
+            self.agents = self.agents + agents[len(self.agents):] # copy, the caller's list is not extended
         if self.objects is None:
             self.objects = objects
-        elif len(self.objects) < n:
-            raise ValueError("Number of objects should not less than number of agents.")
-        elif n > 0 and max(self.allocation) >= len(self.objects):
+        elif len(self.objects) < len(assigned):
+            raise ValueError("Number of objects should not less than number of agents assigned an object.")
+        elif assigned and max(assigned) >= len(self.objects):
             raise ValueError("Object index is out of range.")
+
+
+def _check_capacities(capacities: Sequence[int], n_objects: int) -> List[int]:
+    """Check that capacities gives a non-negative number of seats for each of n_objects objects, and return a copy."""
+    if not all(isinstance(c, int) for c in capacities):
+        raise TypeError("Each element in capacities should be int.")
+    if len(capacities) != n_objects:
+        raise ValueError("The length of capacities should be same as the number of objects.")
+    if any(c < 0 for c in capacities):
+        raise ValueError("Each capacity should be non-negative.")
+    return list(capacities)
+
+@dataclass
+class ManyToOneAllocation:
+    """
+    Stores a many-to-one allocation, where each object has a number of seats (its capacity) shared by several agents.
+
+    Objects are stored once with their capacities, not once per seat.
+
+    Parameters
+    ----------
+    allocation : List[int]
+        allocation[i] is the index of the object whose seat agent i receives, or -1 if agent i is unassigned.
+    capacities : List[int]
+        capacities[obj] is the number of seats of obj.
+    agents : Optional[List[str]], optional
+        Names or identifiers of the agents. If not provided, default names "agent_0", "agent_1", ... are used.
+    objects : Optional[List[str]], optional
+        Names or identifiers of the objects. If not provided, default names "object_0", "object_1", ... are used.
+
+    Methods
+    -------
+    to_list() -> List
+        Return the allocation as a list of assigned object indices.
+    to_dict() -> Dict[str, str]
+        Convert the allocation to a dictionary mapping agent names to object names (None for unassigned agents).
+    to_groups() -> Dict[str, List[str]]
+        Return, for every object name, the names of the agents holding its seats.
+    load() -> List[int]
+        Return the number of seats taken for every object.
+    remaining() -> List[int]
+        Return the number of free seats for every object.
+
+    Examples
+    --------
+    >>> allocation = ManyToOneAllocation([0, 1, 0], [2, 1], ["Alice", "Bob", "Carol"], ["A", "B"])
+    >>> allocation.to_groups()
+    {'A': ['Alice', 'Carol'], 'B': ['Bob']}
+    >>> allocation.remaining()
+    [0, 0]
+    """
+    allocation: List[int]
+    capacities: List[int]
+    agents: Optional[List[str]] = None
+    objects: Optional[List[str]] = None
+
+    @classmethod
+    def _from_trusted(cls, allocation: List[int], capacities: List[int], agents: List[str], objects: List[str]) -> "ManyToOneAllocation":
+        """Build a ManyToOneAllocation without running `__post_init__`, for results that are valid by construction."""
+        self = cls.__new__(cls)
+        self.allocation = allocation
+        self.capacities = capacities
+        self.agents = agents
+        self.objects = objects
+        return self
+
+    def __post_init__(self):
+        if not all(isinstance(x, int) and x >= -1 for x in self.allocation):
+            raise TypeError("Each element in allocation should be non-negative int, or -1 for an unassigned agent.")
+        self.capacities = _check_capacities(self.capacities, len(self.capacities))
+        m = len(self.capacities)
+        if any(x >= m for x in self.allocation):
+            raise ValueError("Object index is out of range.")
+        if any(used > c for used, c in zip(self.load(), self.capacities)):
+            raise ValueError("Number of agents assigned to an object should not exceed its capacity.")
+        self.agents = self._names(self.agents, len(self.allocation), "agent")
+        self.objects = self._names(self.objects, m, "object")
+
+    @staticmethod
+    def _names(names: Optional[List[str]], n: int, kind: str) -> List[str]:
+        if names is None:
+            return [f"{kind}_{i}" for i in range(n)]
+        if not all(isinstance(name, str) for name in names):
+            raise TypeError(f"Each {kind}'s name should be string")
+        if len(set(names)) != len(names):
+            raise ValueError(f"Each {kind}'s name should be different")
+        if len(names) != n:
+            raise ValueError(f"Number of {kind}s should be {n}.")
+        return list(names)
+
+    def to_list(self) -> List[int]:
+        """Return the allocation as a list of assigned object indices."""
+        return list(self.allocation)
+
+    def to_dict(self) -> Dict[Any, Any]:
+        """Convert the allocation to a dictionary mapping agent names to object names (None for unassigned agents)."""
+        return {self.agents[i]: self.objects[v] if v >= 0 else None for i, v in enumerate(self.allocation)}
+
+    def to_groups(self) -> Dict[Any, List[Any]]:
+        """Return, for every object name, the names of the agents holding its seats (in agent order)."""
+        groups = {obj: [] for obj in self.objects}
+        for i, v in enumerate(self.allocation):
+            if v >= 0:
+                groups[self.objects[v]].append(self.agents[i])
+        return groups
+
+    def load(self) -> List[int]:
+        """Return the number of seats taken for every object."""
+        used = [0] * len(self.capacities)
+        for v in self.allocation:
+            if v >= 0:
+                used[v] += 1
+        return used
+
+    def remaining(self) -> List[int]:
+        """Return the number of free seats for every object."""
+        return [c - used for c, used in zip(self.capacities, self.load())]
+
+    def __repr__(self):
+        return f"ManyToOneAllocation({self.allocation}, capacities={self.capacities}, agents={self.agents!r}, objects={self.objects!r})"
+
+
+class NameTable:
+    """
+    Immutable agent and object names shared by every allocation of one market.
+
+    Use `NameTable.intern` to get the table: equal name lists map to the same NameTable instance for as long as
+    it is referenced, so millions of allocations of one market hold a single copy of the names.
+
+    Parameters
+    ----------
+    agents : Sequence[str]
+        Names or identifiers of the agents.
+    objects : Sequence[str]
+        Names or identifiers of the objects.
+
+    Attributes
+    ----------
+    agents : Tuple[str, ...]
+        Names or identifiers of the agents.
+    objects : Tuple[str, ...]
+        Names or identifiers of the objects.
+
+    Examples
+    --------
+    >>> NameTable.intern(["Alice", "Bob"], ["A", "B"]) is NameTable.intern(("Alice", "Bob"), ("A", "B"))
+    True
+    """
+    __slots__ = ("agents", "objects", "__weakref__")
+    _interned = weakref.WeakValueDictionary()
+
+    def __init__(self, agents: Sequence[str], objects: Sequence[str]):
+        object.__setattr__(self, "agents", tuple(agents))
+        object.__setattr__(self, "objects", tuple(objects))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("NameTable is immutable.")
+
+    @classmethod
+    def intern(cls, agents: Sequence[str], objects: Sequence[str]) -> "NameTable":
+        """Return the shared NameTable for these names, creating it if needed."""
+        key = (tuple(agents), tuple(objects))
+        table = cls._interned.get(key)
+        if table is None:
+            table = cls(*key)
+            cls._interned[key] = table
+        return table
+
+    @classmethod
+    def default(cls, n: int) -> "NameTable":
+        """Return the shared NameTable with default names "agent_i" and "object_i" for n agents."""
+        return cls.intern([f"agent_{i}" for i in range(n)], [f"object_{i}" for i in range(n)])
+
+    def __eq__(self, other):
+        if not isinstance(other, NameTable):
+            return NotImplemented
+        return self is other or (self.agents == other.agents and self.objects == other.objects)
+
+    def __hash__(self):
+        return hash((self.agents, self.objects))
+
+    def __repr__(self):
+        return f"NameTable(agents={list(self.agents)!r}, objects={list(self.objects)!r})"
+
+
+class CompactAllocation:
+    """
+    Memory-compact allocation for storing many allocations of one market.
+
+    The assignment is kept in an int32 `array.array` and the names live in a shared `NameTable`, so each instance
+    costs a few dozen bytes plus 4 bytes per agent. Name-based views are built only when requested.
+
+    Parameters
+    ----------
+    allocation : Sequence[int]
+        allocation[i] is the index of the object assigned to agent i, or -1 if agent i is unassigned.
+    names : NameTable, optional
+        Shared names of the market. If not provided, the default names of the same size are used.
+
+    Methods
+    -------
+    from_allocation(allocation, names) -> CompactAllocation
+        Convert an Allocation.
+    to_allocation() -> Allocation
+        Convert back to an Allocation.
+    to_list() -> List
+        Return the allocation as a list of assigned object indices.
+    to_dict() -> Dict[str, str]
+        Convert the allocation to a dictionary mapping agent names to object names.
+    to_pairs() -> List[tuple]
+        Return the allocation as a list of (agent, object) pairs.
+
+    Examples
+    --------
+    >>> names = NameTable.intern(["Alice", "Bob"], ["A", "B"])
+    >>> allocation = CompactAllocation([1, 0], names)
+    >>> allocation.to_pairs()
+    [('Alice', 'B'), ('Bob', 'A')]
+    """
+    __slots__ = ("allocation", "names")
+
+    def __init__(self, allocation: Sequence[int], names: Optional[NameTable] = None):
+        if (isinstance(allocation, array) and allocation.typecode == "i") or (isinstance(allocation, memoryview) and allocation.format == "i"):
+            self.allocation = allocation # int32 data is used without copying
+        else:
+            self.allocation = array("i", allocation)
+        self.names = names if names is not None else NameTable.default(len(self.allocation))
+        if len(self.names.agents) != len(self.allocation):
+            raise ValueError("Number of agents should be same as the length of allocation.")
+
+    @classmethod
+    def from_allocation(cls, allocation: Allocation, names: Optional[NameTable] = None) -> "CompactAllocation":
+        """Convert an Allocation. Pass the market's NameTable to avoid interning the name lists again."""
+        if names is None:
+            names = NameTable.intern(allocation.agents, allocation.objects)
+        return cls(allocation.allocation, names)
+
+    def to_allocation(self) -> Allocation:
+        """Convert back to an Allocation."""
+        return Allocation._from_trusted(self.allocation.tolist(), list(self.names.agents), list(self.names.objects))
+
+    def to_list(self) -> List[int]:
+        """Return the allocation as a list of assigned object indices."""
+        return self.allocation.tolist()
+
+    def to_dict(self) -> Dict[Any, Any]:
+        """Convert the allocation to a dictionary mapping agent names to object names."""
+        objects = self.names.objects
+        return {agent: objects[v] if v >= 0 else None for agent, v in zip(self.names.agents, self.allocation)}
+
+    def to_pairs(self) -> List[tuple]:
+        """Return the allocation as a list of (agent, object) pairs."""
+        objects = self.names.objects
+        return [(agent, objects[v] if v >= 0 else None) for agent, v in zip(self.names.agents, self.allocation)]
+
+    def __len__(self):
+        return len(self.allocation)
+
+    def __eq__(self, other):
+        if not isinstance(other, CompactAllocation):
+            return NotImplemented
+        return self.allocation == other.allocation and self.names == other.names
+
+    def __hash__(self):
+        return hash(self.allocation.tobytes())
+
+    def __str__(self):
+        return str(self.to_allocation())
+
+    def __repr__(self):
+        return f"CompactAllocation({self.allocation.tolist()}, names={self.names!r})"
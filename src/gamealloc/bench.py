@@ -0,0 +1,170 @@
+# Benchmark suite for the mechanisms. Run `python -m gamealloc.bench --help` for options.
+from typing import *
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+import warnings
+from .preference import Preference
+from .allocation import Allocation
+from .sp import sequential_priority
+from .ttc import top_trading_cycles
+from .pareto import is_pareto_efficient, find_all_pareto_efficient_allocations
+from .manipulation import manipulation, fast_manipulation
+from .instance import random_objects_allocation_instance, FAMILIES
+
+# mechanism name -> (largest size to run, function building the call from (preference, permutation))
+MECHANISMS = {
+    "sequential_priority": (None, lambda pref, perm: lambda: sequential_priority(perm, pref)),
+    "top_trading_cycles": (None, lambda pref, perm: lambda: top_trading_cycles(perm, pref)),
+    "is_pareto_efficient": (None, lambda pref, perm: lambda: is_pareto_efficient(Allocation(perm), pref)),
+    "find_all_pareto_efficient_allocations": (8, lambda pref, perm: lambda: find_all_pareto_efficient_allocations(pref)),
+    "manipulation": (6, lambda pref, perm: lambda: manipulation(0, pref, order=perm, endowment=perm)),
+    "fast_manipulation": (None, lambda pref, perm: lambda: fast_manipulation(0, pref, order=perm, endowment=perm)),
+}
+
+DEFAULT_SIZES = [5, 50, 500]
+
+def _measure(make_call: Callable[[], Callable[[], Any]], repeat: int) -> Tuple[float, int]:
+    """
+    Return (best wall time in seconds, peak traced memory in bytes) of the calls built by make_call.
+
+    Every run gets a new call from make_call, so no run reuses state cached by an earlier one (e.g. `Preference._ranks`).
+    """
+    seconds = float("inf")
+    for _ in range(repeat): # timing runs are not traced, tracemalloc slows allocation down
+        call = make_call()
+        start = time.perf_counter()
+        call()
+        seconds = min(seconds, time.perf_counter() - start)
+    call = make_call()
+    tracemalloc.start()
+    try:
+        call()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return seconds, peak
+
+def run_benchmarks(sizes: Sequence[int] = DEFAULT_SIZES, families: Sequence[str] = tuple(FAMILIES),
+                   mechanisms: Sequence[str] = tuple(MECHANISMS), repeat: int = 3, seed: int = 42) -> List[Dict[str, Any]]:
+    """
+    Time every mechanism on every (family, size) instance.
+
+    Mechanisms with exponential running time are only run up to their size limit in `MECHANISMS`.
+
+    Parameters
+    --------
+    sizes: Sequence[int]
+        Numbers of agents.
+    families: Sequence[str]
+        Preference families, keys of `FAMILIES`.
+    mechanisms: Sequence[str]
+        Mechanisms, keys of `MECHANISMS`.
+    repeat: int
+        Number of timed runs; the best one is recorded (default = 3).
+    seed: int
+        Random seed of the instances (default = 42).
+
+    Returns
+    --------
+    results: List[Dict[str, Any]]
+        One record {"mechanism", "family", "size", "seconds", "peak_bytes"} per run benchmark.
+
+    Examples
+    --------
+    >>> results = run_benchmarks([3], ["uniform"], ["sequential_priority"], repeat=1)
+    >>> sorted(results[0])
+    ['family', 'mechanism', 'peak_bytes', 'seconds', 'size']
+    """
+    unknown = [x for x in families if x not in FAMILIES] + [x for x in mechanisms if x not in MECHANISMS]
+    if unknown:
+        raise ValueError(f"Unknown family or mechanism: {unknown}")
+    if repeat <= 0:
+        raise ValueError("repeat should be a positive integer.")
+    results = []
+    for family in families:
+        for size in sizes:
+            pref = Preference.from_array(FAMILIES[family](size, seed))
+            perm = random_objects_allocation_instance(size, seed)
+            for mechanism in mechanisms:
+                limit, build = MECHANISMS[mechanism]
+                if limit is not None and size > limit:
+                    continue
+                # a new Preference over the same rows for every run: each run pays for the rank matrix and hash again
+                def make_call():
+                    return build(Preference.from_validated(pref.prefs, pref.agents, pref.objects), perm)
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore")
+                    seconds, peak = _measure(make_call, repeat)
+                results.append({"mechanism": mechanism, "family": family, "size": size, "seconds": seconds, "peak_bytes": peak})
+    return results
+
+def compare(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]], time_threshold: float = 0.25,
+            memory_threshold: float = 0.25, min_seconds: float = 1e-3) -> List[Dict[str, Any]]:
+    """
+    Return the benchmarks that regressed against the baseline.
+
+    A benchmark regresses when its time grows by more than time_threshold (relative) or its peak memory grows by more
+    than memory_threshold (relative). Timings where both runs are below min_seconds are too noisy and are not compared.
+    Benchmarks missing from either side are ignored.
+
+    Returns
+    --------
+    regressions: List[Dict[str, Any]]
+        One record {"mechanism", "family", "size", "metric", "baseline", "current", "ratio"} per regression.
+    """
+    def key(record):
+        return record["mechanism"], record["family"], record["size"]
+    previous = {key(record): record for record in baseline}
+    regressions = []
+    for record in results:
+        old = previous.get(key(record))
+        if old is None:
+            continue
+        checks = [("peak_bytes", memory_threshold)]
+        if max(record["seconds"], old["seconds"]) >= min_seconds:
+            checks.insert(0, ("seconds", time_threshold))
+        for metric, threshold in checks:
+            if old[metric] > 0 and record[metric] > old[metric] * (1 + threshold):
+                regressions.append({"mechanism": record["mechanism"], "family": record["family"], "size": record["size"],
+                                    "metric": metric, "baseline": old[metric], "current": record[metric],
+                                    "ratio": record[metric] / old[metric]})
+    return regressions
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command-line entry point. Returns 1 if a regression against the baseline is found, otherwise 0."""
+    parser = argparse.ArgumentParser(prog="python -m gamealloc.bench", description="Benchmark the gamealloc mechanisms.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="numbers of agents")
+    parser.add_argument("--families", nargs="+", default=list(FAMILIES), choices=list(FAMILIES), help="preference families")
+    parser.add_argument("--mechanisms", nargs="+", default=list(MECHANISMS), choices=list(MECHANISMS), help="mechanisms to time")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per benchmark, the best one is kept")
+    parser.add_argument("--seed", type=int, default=42, help="random seed of the instances")
+    parser.add_argument("--output", "-o", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="JSON file from a previous run to compare against")
+    parser.add_argument("--time-threshold", type=float, default=0.25, help="allowed relative slowdown (default 0.25)")
+    parser.add_argument("--memory-threshold", type=float, default=0.25, help="allowed relative peak memory growth (default 0.25)")
+    parser.add_argument("--min-seconds", type=float, default=1e-3, help="do not compare timings below this many seconds")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.sizes, args.families, args.mechanisms, args.repeat, args.seed)
+    for r in results:
+        print(f"{r['mechanism']:<40} {r['family']:<14} {r['size']:>7} {r['seconds']:>12.6f}s {r['peak_bytes']:>12} B")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"version": 1, "results": results}, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.time_threshold, args.memory_threshold, args.min_seconds)
+        for r in regressions:
+            print(f"REGRESSION {r['mechanism']} {r['family']} size={r['size']} {r['metric']}: "
+                  f"{r['baseline']:.6g} -> {r['current']:.6g} (x{r['ratio']:.2f})", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,231 @@
+# Opt-in result cache for mechanism calls, keyed by a content hash of the inputs
+from typing import *
+from array import array
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from .preference import Preference
+from .allocation import Allocation
+from .sp import sequential_priority
+from .ttc import top_trading_cycles
+from .pareto import is_pareto_efficient
+
+def _int32_bytes(values: Sequence[int]) -> bytes:
+    block = values if isinstance(values, array) and values.typecode == "i" else array("i", values)
+    if sys.byteorder == "big":
+        block = array("i", block)
+        block.byteswap()
+    return block.tobytes()
+
+def profile_hash(preference: Preference) -> str:
+    """
+    Return a stable SHA-256 content hash of a preference profile (names and rankings).
+
+    The hash only depends on the content, not on how the rows are stored (lists, arrays or memory-mapped views), so it
+    is the same across processes and runs. It is computed once per Preference object and cached on it;
+    `validate()` clears the cached value after a modification.
+
+    Examples
+    --------
+    >>> profile_hash(Preference([[0, 1], [1, 0]])) == profile_hash(Preference.from_array([[0, 1], [1, 0]]))
+    True
+    """
+    if preference._digest is None:
+        h = hashlib.sha256()
+        h.update(json.dumps([preference.agents, preference.objects]).encode())
+        for row in preference.prefs:
+            h.update(len(row).to_bytes(4, "little"))
+            h.update(_int32_bytes(row))
+        preference._digest = h.hexdigest()
+    return preference._digest
+
+class ResultCache:
+    """
+    Cache of `sequential_priority`, `top_trading_cycles` and `is_pareto_efficient` results.
+
+    Results are keyed by SHA-256 of (mechanism, profile hash, argument). The in-memory tier is an LRU with a maximum
+    number of entries and an optional time-to-live; the optional on-disk tier stores one small JSON file per result
+    in `directory`, is shared by every process using the same directory, and honours the same TTL: an expired file is
+    deleted when it is looked up, and `prune()` deletes every expired file.
+    Only valid calls are cached: invalid inputs raise as usual. Only dense `Preference` profiles are supported.
+
+    Parameters
+    --------
+    maxsize: int
+        Maximum number of results kept in memory (default = 1024).
+    ttl: float, optional
+        Seconds after which a result expires. None (default) keeps results until they are evicted.
+    directory: str | os.PathLike, optional
+        Directory of the on-disk tier. None (default) disables it.
+
+    Attributes
+    --------
+    hits, misses, disk_hits, evictions: int
+        Counters since creation (or the last `clear()`). disk_hits are included in hits.
+
+    Examples
+    --------
+    >>> cache = ResultCache(maxsize=10000, ttl=3600)
+    >>> pref = Preference([[0, 1, 2], [2, 0, 1], [2, 1, 0]])
+    >>> cache.sequential_priority([2, 0, 1], pref).to_list()
+    [0, 1, 2]
+    >>> cache.sequential_priority([2, 0, 1], pref).to_list()
+    [0, 1, 2]
+    >>> cache.stats()
+    {'hits': 1, 'misses': 1, 'disk_hits': 0, 'evictions': 0, 'size': 1}
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None, directory: Optional[Union[str, os.PathLike]] = None):
+        if maxsize <= 0:
+            raise ValueError("maxsize should be a positive integer.")
+        if ttl is not None and ttl <= 0:
+            raise ValueError("ttl should be positive.")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.directory = directory
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+        self._entries = OrderedDict() # key -> (value, expiry time on time.monotonic() or None)
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.disk_hits = self.evictions = 0
+
+    @staticmethod
+    def key(mechanism: str, preference: Preference, argument: Sequence[int]) -> str:
+        """
+        Return the cache key of a call.
+
+        Only dense `Preference` profiles are cached: a SparsePreference raises TypeError, call the mechanism directly.
+        An argument with an integer outside the int32 range raises ValueError, as the mechanism would.
+        """
+        if not isinstance(preference, Preference):
+            raise TypeError("ResultCache only supports Preference type, call the mechanism directly for SparsePreference.")
+        try:
+            argument = _int32_bytes(argument)
+        except OverflowError:
+            raise ValueError("Each element of the argument should be an object or agent index.")
+        h = hashlib.sha256(f"{mechanism}:{profile_hash(preference)}:".encode())
+        h.update(argument)
+        return h.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """Return (found, value) for a key, looking in memory first and then on disk."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expiry = entry
+                if expiry is None or now < expiry:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self._entries[key]
+        if self.directory is not None:
+            try:
+                with open(self._path(key)) as f:
+                    stored = json.load(f)
+            except (OSError, ValueError):
+                stored = None
+            if stored is not None:
+                age = time.time() - stored["created"]
+                if self.ttl is None or age < self.ttl:
+                    self._store(key, stored["value"], None if self.ttl is None else self.ttl - age) # expires with the file
+                    with self._lock:
+                        self.hits += 1
+                        self.disk_hits += 1
+                    return True, stored["value"]
+                self._unlink(self._path(key))
+        with self._lock:
+            self.misses += 1
+        return False, None
+
+    def _store(self, key: str, value: Any, lifetime: Optional[float] = None):
+        lifetime = self.ttl if lifetime is None else lifetime
+        expiry = None if lifetime is None else time.monotonic() + lifetime
+        with self._lock:
+            self._entries[key] = (value, expiry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def put(self, key: str, value: Any):
+        """Store a JSON-serialisable value in memory and, if enabled, on disk."""
+        self._store(key, value)
+        if self.directory is not None:
+            path = self._path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "w") as f:
+                json.dump({"value": value, "created": time.time()}, f)
+            os.replace(tmp, path) # atomic, concurrent readers never see a partial file
+
+    @staticmethod
+    def _unlink(path: str):
+        try:
+            os.remove(path)
+        except OSError: # already removed by another process
+            pass
+
+    def prune(self) -> int:
+        """Delete expired and unreadable files from the on-disk tier and return how many were deleted."""
+        if self.directory is None or self.ttl is None:
+            return 0
+        removed = 0
+        now = time.time()
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    with open(path) as f:
+                        expired = now - json.load(f)["created"] >= self.ttl
+                except (OSError, ValueError, KeyError, TypeError):
+                    expired = True
+                if expired:
+                    self._unlink(path)
+                    removed += 1
+        return removed
+
+    def _cached(self, mechanism: str, preference: Preference, argument: Sequence[int], compute: Callable[[], Any]) -> Any:
+        key = self.key(mechanism, preference, argument)
+        found, value = self.get(key)
+        if not found:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def sequential_priority(self, order: List[int], preferences: Preference) -> Allocation:
+        """Cached `sequential_priority`. Every call returns a new Allocation."""
+        allocation = self._cached("sequential_priority", preferences, order, lambda: sequential_priority(order, preferences).to_list())
+        return Allocation._from_trusted(list(allocation), preferences.agents, preferences.objects)
+
+    def top_trading_cycles(self, endowment: List[int], preferences: Preference) -> Allocation:
+        """Cached `top_trading_cycles`. Every call returns a new Allocation."""
+        allocation = self._cached("top_trading_cycles", preferences, endowment, lambda: top_trading_cycles(endowment, preferences).to_list())
+        return Allocation._from_trusted(list(allocation), preferences.agents, preferences.objects)
+
+    def is_pareto_efficient(self, allocation: Allocation, preference: Preference) -> bool:
+        """Cached `is_pareto_efficient`. The allocation's names are checked on every call."""
+        names = hashlib.sha256(json.dumps([allocation.agents, allocation.objects]).encode()).hexdigest()
+        return self._cached(f"is_pareto_efficient:{names}", preference, allocation.allocation,
+                            lambda: is_pareto_efficient(allocation, preference))
+
+    def stats(self) -> Dict[str, int]:
+        """Return the hit, miss, disk hit and eviction counters and the number of results in memory."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "disk_hits": self.disk_hits,
+                    "evictions": self.evictions, "size": len(self._entries)}
+
+    def clear(self):
+        """Drop every result from memory and reset the counters. The on-disk tier is left untouched."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.disk_hits = self.evictions = 0
@@ -0,0 +1,155 @@
+# Command-line batch runner: `gamealloc [input.jsonl] --mechanisms sp ttc pareto`
+#
+# Every input line is one JSON instance:
+#   {"id": ..., "prefs": [[...], ...], "agents": [...], "objects": [...],
+#    "order": [...], "endowment": [...], "allocation": [...]}
+# Only "prefs" is required; "order" is needed by sp, "endowment" by ttc, "allocation" by pareto.
+# Every output line is one JSON result, in input order.
+from typing import *
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import itertools
+import json
+import os
+import sys
+import warnings
+from .preference import Preference
+from .allocation import Allocation
+from .sp import sequential_priority
+from .ttc import top_trading_cycles
+from .pareto import find_improving_cycle
+
+MECHANISMS = ("sp", "ttc", "pareto")
+
+def process_instance(line: str, mechanisms: Sequence[str] = MECHANISMS, lineno: int = 0) -> Dict[str, Any]:
+    """
+    Run the requested mechanisms and checks on one JSON instance.
+
+    Parameters
+    --------
+    line: str
+        One JSON object, see the format at the top of this module.
+    mechanisms: Sequence[str]
+        Any of "sp", "ttc" and "pareto".
+    lineno: int
+        Line number reported with the result (default = 0).
+
+    Returns
+    --------
+    result: Dict[str, Any]
+        {"line", "id", "sequential_priority", "top_trading_cycles", "pareto_efficient", "improving_cycle", "warnings"}
+        for the requested mechanisms, or {"line", "id", "error"} if the instance is invalid.
+
+    Examples
+    --------
+    >>> process_instance('{"prefs": [[1, 0], [0, 1]], "order": [1, 0], "allocation": [0, 1]}', ["sp", "pareto"])
+    {'line': 0, 'sequential_priority': [1, 0], 'pareto_efficient': False, 'improving_cycle': [0, 1]}
+    """
+    result = {"line": lineno}
+    try:
+        instance = json.loads(line)
+        if not isinstance(instance, dict):
+            raise TypeError("Each instance should be a JSON object.")
+        if "id" in instance:
+            result["id"] = instance["id"]
+        outputs = {}
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            preference = Preference(instance["prefs"], instance.get("agents"), instance.get("objects"))
+            for mechanism in mechanisms:
+                if mechanism == "sp":
+                    outputs["sequential_priority"] = sequential_priority(_field(instance, "order", mechanism), preference).to_list()
+                elif mechanism == "ttc":
+                    outputs["top_trading_cycles"] = top_trading_cycles(_field(instance, "endowment", mechanism), preference).to_list()
+                elif mechanism == "pareto":
+                    allocation = Allocation(_field(instance, "allocation", mechanism), preference.agents, preference.objects)
+                    cycle = find_improving_cycle(allocation, preference)
+                    outputs["pareto_efficient"] = cycle is None
+                    outputs["improving_cycle"] = cycle
+                else:
+                    raise ValueError(f"Unknown mechanism {mechanism!r}.")
+        result.update(outputs)
+        if caught:
+            result["warnings"] = [" ".join(str(w.message).split()) for w in caught]
+    except (ValueError, TypeError, KeyError) as e: # json.JSONDecodeError is a ValueError
+        result["error"] = f"{type(e).__name__}: {e}"
+    return result
+
+def _field(instance: Dict[str, Any], key: str, mechanism: str):
+    if key not in instance:
+        raise KeyError(f"{mechanism} needs {key!r} in the instance.")
+    return instance[key]
+
+def _process_chunk(chunk: List[Tuple[int, str]], mechanisms: Sequence[str]) -> List[Tuple[str, bool]]:
+    """Return (JSON line, failed) for every instance of the chunk."""
+    results = [process_instance(line, mechanisms, lineno) for lineno, line in chunk]
+    return [(json.dumps(result), "error" in result) for result in results]
+
+def run(lines: Iterable[str], out: TextIO, mechanisms: Sequence[str] = MECHANISMS, workers: Optional[int] = 1,
+        chunksize: int = 64, max_in_flight: Optional[int] = None) -> int:
+    """
+    Stream instances from lines to out as NDJSON, in input order.
+
+    Lines are grouped in chunks of chunksize and processed in a process pool (or in the current process when
+    workers == 1). At most max_in_flight chunks are submitted but not yet written (default: 4 per worker), so memory
+    stays constant however long the input is. Blank lines are skipped.
+
+    Returns
+    --------
+    int
+        Number of instances that could not be processed.
+    """
+    numbered = ((lineno, line) for lineno, line in enumerate(lines, 1) if line.strip())
+    chunks = iter(lambda: list(itertools.islice(numbered, chunksize)), [])
+    errors = 0
+
+    def write(results):
+        nonlocal errors
+        for line, failed in results:
+            errors += failed
+            out.write(line + "\n")
+
+    if workers == 1:
+        for chunk in chunks:
+            write(_process_chunk(chunk, mechanisms))
+        return errors
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        limit = max_in_flight or 4 * (workers or os.cpu_count() or 1)
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(_process_chunk, chunk, mechanisms))
+            while len(pending) >= limit:
+                write(pending.popleft().result())
+        while pending:
+            write(pending.popleft().result())
+    return errors
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Console entry point. Returns 1 if any instance failed, otherwise 0."""
+    parser = argparse.ArgumentParser(prog="gamealloc", description="Run allocation mechanisms over a JSONL stream of instances.")
+    parser.add_argument("input", nargs="?", default="-", help="JSONL file of instances (default: stdin)")
+    parser.add_argument("-o", "--output", default="-", help="NDJSON output file (default: stdout)")
+    parser.add_argument("-m", "--mechanisms", nargs="+", choices=MECHANISMS, default=list(MECHANISMS),
+                        help="mechanisms and checks to run (default: all)")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="worker processes (default: every CPU, 1 = no pool)")
+    parser.add_argument("--chunksize", type=int, default=64, help="instances per task (default 64)")
+    parser.add_argument("--max-in-flight", type=int, default=None, help="tasks submitted ahead of the writer (default 4 per worker)")
+    args = parser.parse_args(argv)
+    if args.chunksize <= 0:
+        parser.error("--chunksize should be a positive integer.")
+
+    source = sys.stdin if args.input == "-" else open(args.input)
+    sink = sys.stdout if args.output == "-" else open(args.output, "w")
+    try:
+        errors = run(source, sink, args.mechanisms, args.workers, args.chunksize, args.max_in_flight)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if sink is not sys.stdout:
+            sink.close()
+    return 1 if errors else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
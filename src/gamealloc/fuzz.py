@@ -0,0 +1,273 @@
+# Randomised search for profitable misreports against any allocation mechanism
+from dataclasses import dataclass
+from typing import *
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+import os
+import random
+import time
+from .preference import Preference
+from .instance import FAMILIES
+
+Mechanism = Callable[[Preference], Any] # returns an Allocation, a ManyToOneAllocation or a sequence of object indices
+
+@dataclass
+class Counterexample:
+    """
+    A market where one agent gains by misreporting.
+
+    Parameters
+    --------
+    preference: Preference
+        The truthful profile (after shrinking, the smallest market found).
+    agent: int
+        The manipulating agent.
+    misreport: List[int]
+        The report that gets the agent a strictly better object.
+    truthful: int
+        Object the agent receives when reporting truthfully (-1 if unassigned).
+    manipulated: int
+        Object the agent receives with the misreport.
+    family: str
+        Preference family of the generated market.
+    seed: int
+        Seed of the generated market: `FAMILIES[family](original_size, seed)` rebuilds it.
+    original_size: int
+        Number of agents before shrinking.
+    """
+    preference: Preference
+    agent: int
+    misreport: List[int]
+    truthful: int
+    manipulated: int
+    family: str
+    seed: int
+    original_size: int
+
+@dataclass
+class FuzzResult:
+    """
+    Outcome of `fuzz_strategy_proofness`.
+
+    Parameters
+    --------
+    counterexample: Counterexample, optional
+        The first counterexample found, or None if none was found within the budget.
+    instances: int
+        Number of markets searched.
+    seconds: float
+        Wall time of the search, shrinking included.
+    """
+    counterexample: Optional[Counterexample]
+    instances: int
+    seconds: float
+
+def _outcome(mechanism: Mechanism, prefs: List[List[int]], agent: int) -> int:
+    result = mechanism(Preference.from_validated(prefs))
+    allocation = getattr(result, "allocation", result)
+    return allocation[agent]
+
+def _find_misreport(mechanism: Mechanism, prefs: List[List[int]], agent: int, rng: random.Random,
+                    exhaustive_size: int, random_reports: int) -> Optional[Tuple[List[int], int, int]]:
+    """Return (misreport, truthful object, manipulated object) for a profitable misreport of agent, or None."""
+    truth = prefs[agent]
+    n = len(truth)
+    rank = {obj: i for i, obj in enumerate(truth)}
+    curr = _outcome(mechanism, prefs, agent)
+    curr_rank = rank.get(curr, n)
+    if curr_rank == 0:
+        return None
+    if n <= exhaustive_size:
+        reports = map(list, itertools.permutations(truth))
+    else:
+        def candidates():
+            for target in truth[:curr_rank]: # each better object placed first
+                yield [target] + [obj for obj in truth if obj != target]
+            for i in range(n - 1): # adjacent swaps
+                report = list(truth)
+                report[i], report[i + 1] = report[i + 1], report[i]
+                yield report
+            for _ in range(random_reports):
+                yield rng.sample(truth, n)
+        reports = candidates()
+    misreported = list(prefs) # shallow copy, only the agent's row is replaced
+    for report in reports:
+        misreported[agent] = report
+        obj = _outcome(mechanism, misreported, agent)
+        if rank.get(obj, n) < curr_rank:
+            return report, curr, obj
+    return None
+
+_worker_config = None # (mechanism, sizes, families, exhaustive_size, random_reports) held by each worker process
+
+def _init_worker(mechanism: Mechanism, sizes: Sequence[int], families: Sequence[str], exhaustive_size: int, random_reports: int):
+    global _worker_config
+    _worker_config = (mechanism, sizes, families, exhaustive_size, random_reports)
+
+def _fuzz_chunk(chunk_seed: int, count: int, deadline: float) -> Tuple[Optional[Tuple], int]:
+    """Search count generated markets, or until the wall-clock deadline. Returns (first hit or None, markets searched)."""
+    mechanism, sizes, families, exhaustive_size, random_reports = _worker_config
+    rng = random.Random(chunk_seed)
+    for searched in range(count):
+        if time.time() >= deadline:
+            return None, searched
+        family, size, seed = rng.choice(families), rng.choice(sizes), rng.getrandbits(64)
+        prefs = [list(row) for row in FAMILIES[family](size, seed)]
+        for agent in range(size):
+            hit = _find_misreport(mechanism, prefs, agent, rng, exhaustive_size, random_reports)
+            if hit is not None:
+                return (prefs, agent, family, seed) + hit, searched + 1
+    return None, count
+
+def _shrink(mechanism: Mechanism, prefs: List[List[int]], agent: int, hit: Tuple[List[int], int, int],
+            exhaustive_size: int, random_reports: int) -> Tuple[List[List[int]], int, Tuple[List[int], int, int]]:
+    """
+    Greedily remove (agent, object) pairs and simplify rows while a profitable misreport still exists.
+
+    Removing another agent j and an object o keeps the market square: o is deleted from every row and larger
+    indices are shifted down. Then every other agent's row is replaced by the identity ranking when possible.
+    """
+    rng = random.Random(0)
+    progress = True
+    while progress and len(prefs) > 1:
+        progress = False
+        for j in range(len(prefs)):
+            if j == agent:
+                continue
+            for o in range(len(prefs)):
+                smaller = [[x - (x > o) for x in row if x != o] for i, row in enumerate(prefs) if i != j]
+                new_agent = agent - (j < agent)
+                found = _find_misreport(mechanism, smaller, new_agent, rng, exhaustive_size, random_reports)
+                if found is not None:
+                    prefs, agent, hit, progress = smaller, new_agent, found, True
+                    break
+            if progress:
+                break
+    identity = list(range(len(prefs)))
+    for j in range(len(prefs)):
+        if j != agent and prefs[j] != identity:
+            simpler = prefs[:j] + [identity] + prefs[j + 1:]
+            found = _find_misreport(mechanism, simpler, agent, rng, exhaustive_size, random_reports)
+            if found is not None:
+                prefs, hit = simpler, found
+    return prefs, agent, hit
+
+def fuzz_strategy_proofness(mechanism: Mechanism, sizes: Sequence[int] = range(2, 7), families: Sequence[str] = tuple(FAMILIES),
+                            time_budget: float = 60.0, max_instances: Optional[int] = None, seed: int = 42,
+                            max_workers: Optional[int] = None, chunksize: int = 32, exhaustive_size: int = 5,
+                            random_reports: int = 20, shrink: bool = True) -> FuzzResult:
+    """
+    Search randomly generated markets for a profitable misreport against any mechanism.
+
+    Markets are drawn from the preference families of `gamealloc.instance.FAMILIES` (built on the `instance` module)
+    with sizes drawn from sizes. For every agent, the search tries misreports until one gives it an object it truly
+    prefers: all n! reports when n <= exhaustive_size, otherwise each better object placed first, every adjacent swap
+    and random_reports random orders. Chunks of markets run in a process pool; every worker receives the mechanism once.
+    The search stops at the first counterexample, after max_instances markets, or when time_budget runs out, and the
+    counterexample is then shrunk to a smaller market with the same property.
+
+    Parameters
+    --------
+    mechanism: Callable[[Preference], Allocation | Sequence[int]]
+        The mechanism under test. result[i] (or result.allocation[i]) is the object of agent i, -1 if unassigned.
+        With a process pool it must be picklable: a module-level function or a `functools.partial` of one.
+    sizes: Sequence[int]
+        Numbers of agents to draw from (default = 2 to 6).
+    families: Sequence[str]
+        Keys of `gamealloc.instance.FAMILIES` (default = all).
+    time_budget: float
+        Seconds to search before giving up (default = 60). Shrinking is not counted.
+    max_instances: int, optional
+        Maximum number of markets to search.
+    seed: int
+        Random seed (default = 42). Results are reproducible for fixed seed, chunksize and max_instances when
+        the budget is not hit.
+    max_workers: int, optional
+        Number of worker processes. With 1, the search runs in the current process; None (default) uses every CPU.
+    chunksize: int
+        Markets per task (default = 32).
+    exhaustive_size: int
+        Largest market where all misreports are tried (default = 5).
+    random_reports: int
+        Random misreports per agent in larger markets (default = 20).
+    shrink: bool
+        Shrink the counterexample (default = True).
+
+    Returns
+    --------
+    FuzzResult
+        The counterexample (or None), the number of markets searched and the elapsed time.
+
+    Examples
+    --------
+    >>> def boston(preference): # immediate acceptance, lower index wins
+    ...     n = len(preference.prefs)
+    ...     allocation, taken = [-1] * n, set()
+    ...     for k in range(n):
+    ...         for agent, row in enumerate(preference.prefs):
+    ...             if allocation[agent] == -1 and row[k] not in taken:
+    ...                 allocation[agent] = row[k]
+    ...                 taken.add(row[k])
+    ...     return allocation
+    >>> ce = fuzz_strategy_proofness(boston, time_budget=10, max_workers=1).counterexample
+    >>> ce.preference.prefs, ce.agent, ce.misreport # shrunk from a 6-agent market
+    ([[2, 0, 1], [2, 1, 0], [1, 2, 0]], 1, [1, 2, 0])
+    """
+    if chunksize <= 0:
+        raise ValueError("chunksize should be a positive integer.")
+    if not sizes or min(sizes) <= 0:
+        raise ValueError("sizes should contain positive integers.")
+    unknown = [family for family in families if family not in FAMILIES]
+    if unknown or not families:
+        raise ValueError(f"Unknown preference families {unknown}, use keys of FAMILIES.")
+    start = time.time()
+    deadline = start + time_budget
+    config = (mechanism, list(sizes), list(families), exhaustive_size, random_reports)
+    root = random.Random(seed)
+    instances = 0
+    hit = None
+
+    def tasks():
+        remaining = max_instances
+        while remaining is None or remaining > 0:
+            count = chunksize if remaining is None else min(chunksize, remaining)
+            if remaining is not None:
+                remaining -= count
+            yield root.getrandbits(64), count
+
+    if max_workers == 1:
+        _init_worker(*config)
+        try:
+            for chunk_seed, count in tasks():
+                hit, searched = _fuzz_chunk(chunk_seed, count, deadline)
+                instances += searched
+                if hit is not None or time.time() >= deadline:
+                    break
+        finally:
+            _init_worker(None, (), (), 0, 0)
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=config) as executor:
+            wave = 2 * (max_workers or os.cpu_count() or 1)
+            pending = tasks()
+            while hit is None and time.time() < deadline:
+                futures = [executor.submit(_fuzz_chunk, chunk_seed, count, deadline) for chunk_seed, count in itertools.islice(pending, wave)]
+                if not futures:
+                    break
+                for future in futures: # in submission order, so the reported counterexample does not depend on timing
+                    found, searched = future.result()
+                    instances += searched
+                    if hit is None and found is not None:
+                        hit = found
+                if hit is not None:
+                    executor.shutdown(cancel_futures=True)
+
+    counterexample = None
+    if hit is not None:
+        prefs, agent, family, market_seed, misreport, truthful, manipulated = hit
+        original_size = len(prefs)
+        if shrink:
+            prefs, agent, (misreport, truthful, manipulated) = _shrink(mechanism, prefs, agent, (misreport, truthful, manipulated),
+                                                                       exhaustive_size, random_reports)
+        counterexample = Counterexample(Preference.from_validated(prefs), agent, list(misreport), truthful, manipulated,
+                                        family, market_seed, original_size)
+    return FuzzResult(counterexample, instances, time.time() - start)
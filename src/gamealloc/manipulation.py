@@ -1,11 +1,14 @@
 # Discuss whether agent would get benefit from misrepresent his preference
 from typing import *
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import copy
 import itertools
 import warnings
 from .preference import Preference
 from .allocation import Allocation
-from .ttc import top_trading_cycles
-from .sp import sequential_priority
+from .ttc import top_trading_cycles, _check_endowment, _ttc_engine
+from .sp import IncrementalSP
+from .storage import PreferenceHandle, SharedPreference, attach_preference
 
 def manipulation(agent: Union[int, str], preference: Preference, order=None, endowment=None) -> Dict[str, Dict]:
     """
@@ -43,34 +46,207 @@ def manipulation(agent: Union[int, str], preference: Preference, order=None, end
     {'Sequential Priority': {}, 'TTC': {}}
     """
 
-    def manipulation_helper(agent: Union[int, str], preference: Preference, alloc_func: Callable, alloc_func_arg: Any, alloc_func_arg_name: str):
+    def manipulation_helper(truth: List[int], outcome: Callable[[List[int]], int]):
+        # outcome(report) is the object assigned to the agent when it reports `report`
         result_report = {}
-        truth = preference.prefs[agent]
-        curr = alloc_func(alloc_func_arg, preference).allocation[agent] # assigned objects with truth preference
+        curr = outcome(truth) # assigned objects with truth preference
         if curr != 0: # curr = 0 means current allocation is the best for the agent
             misrepresent = list(map(list, itertools.permutations(range(len(truth)))))
             for x in misrepresent:
-                preference.prefs[agent] = x
-                misresult = alloc_func(alloc_func_arg, preference).allocation[agent]
+                misresult = outcome(x)
                 if truth.index(misresult) < truth.index(curr): # successfully manipulate the outcome
                     result_report.setdefault(misresult, []).append(x)
-            preference.prefs[agent] = truth
         return result_report
-        
-        
+
+    def ttc_outcome(report):
+        misreported.prefs[agent] = report
+        return top_trading_cycles(endowment, misreported).allocation[agent]
 
     if isinstance(agent, str):
         agent = preference.agents.index(agent) # transfrom name into index
     
+    truth = list(preference.prefs[agent])
     result_report = {}
     
     if order == None and endowment == None:
         raise ValueError("Neither order nor endowment is given.")
     
-    if order is not None: # sp-based logic
-        result_report["Sequential Priority"] = manipulation_helper(agent, preference, sequential_priority, order, "order")
+    if order is not None: # sp-based logic, only the agent's own pick is recomputed for each misreport
+        evaluator = IncrementalSP(order, preference)
+        result_report["Sequential Priority"] = manipulation_helper(truth, lambda report: evaluator.outcome(agent, report))
     
     if endowment is not None: # TTC-based logic
-        result_report["TTC"] = manipulation_helper(agent, preference, top_trading_cycles, endowment, "endowment")
+        # misreports are written into a private copy, so the caller's profile is never modified
+        misreported = copy.copy(preference)
+        misreported.prefs = list(preference.prefs)
+        misreported._ranks = None
+        misreported._digest = None
+        result_report["TTC"] = manipulation_helper(truth, ttc_outcome)
+
+    return result_report
+
+
+def fast_manipulation(agent: Union[int, str], preference: Preference, order=None, endowment=None) -> Dict[str, Dict]:
+    """
+    Find every object that a given agent can obtain by misreporting, without enumerating all n! misreports.
+
+    Both mechanisms offer the agent a menu of objects that does not depend on its own report, and the agent gets the
+    object it ranks first among that menu:
+
+    - Sequential Priority: the menu is the set of objects still available at the agent's turn. It is read off one run
+      of the order prefix, so no misreport has to be simulated.
+    - TTC: an object is on the menu if and only if the agent obtains it when it ranks the object first. Only the objects
+      the agent truly prefers to its current one are tried, so TTC runs at most n times.
+
+    Parameters
+    ----------
+    agent : int or str
+        The index or name of the agent whose manipulation potential is being checked.
+    preference : Preference
+        The preference profile of all agents. It is not modified.
+    order : list, optional
+        The assignment order for Sequential Priority (SP) mechanism. If provided, SP will be checked.
+    endowment : list, optional
+        The endowment (initial ownership) for Top Trading Cycles (TTC) mechanism. If provided, TTC will be checked.
+
+    Returns
+    -------
+    result_report : Dict[str, Dict]
+        Same keys as `manipulation`. The inner dict maps each object that can be obtained via manipulation with a strictly
+        better ranking to a list holding one witness misreport: the object placed first, followed by the true preference.
+
+        If the mechanism is strategy-proof, the result will be an empty dictionary.
+
+    Examples
+    --------
+    >>> prefs = Preference([[0, 1, 2], [1, 2, 0], [2, 0, 1]])
+    >>> fast_manipulation(0, prefs, order=[0, 1, 2], endowment=[0, 1, 2])
+    {'Sequential Priority': {}, 'TTC': {}}
+
+    See Also
+    --------
+    manipulation:
+        Exhaustive version which reports every successful permutation. Use it for small markets only.
+    """
+    if isinstance(agent, str):
+        agent = preference.agents.index(agent) # transfrom name into index
+
+    if order is None and endowment is None:
+        raise ValueError("Neither order nor endowment is given.")
+
+    prefs = preference.prefs
+    truth = prefs[agent]
+    rank = {obj: i for i, obj in enumerate(truth)}
+
+    def witness(target):
+        return [target] + [obj for obj in truth if obj != target]
+
+    result_report = {}
+
+    if order is not None: # sp-based logic
+        available = IncrementalSP(order, preference).available(agent)
+        curr = min(available, key=rank.__getitem__) # truthful outcome
+        result_report["Sequential Priority"] = {obj: [witness(obj)] for obj in available if rank[obj] < rank[curr]}
+
+    if endowment is not None: # TTC-based logic
+        _check_endowment(endowment, len(prefs))
+        curr = _ttc_engine(endowment, prefs)[agent]
+        report = {}
+        misreported = list(prefs) # shallow copy, only the agent's row is replaced
+        for target in truth[:rank[curr]]:
+            misreported[agent] = witness(target)
+            if _ttc_engine(endowment, misreported)[agent] == target:
+                report[target] = [misreported[agent]]
+        result_report["TTC"] = report
 
     return result_report
+
+
+_worker_market = None # (preference, order, endowment, exhaustive) held by each worker process
+
+def _init_worker(preference: Union[Preference, PreferenceHandle], order, endowment, exhaustive: bool):
+    global _worker_market
+    if isinstance(preference, PreferenceHandle):
+        preference = attach_preference(preference)
+    _worker_market = (preference, order, endowment, exhaustive)
+
+def _audit_agents(agents: List[int]) -> List[Tuple[int, Dict[str, Dict]]]:
+    preference, order, endowment, exhaustive = _worker_market
+    analyzer = manipulation if exhaustive else fast_manipulation
+    return [(agent, analyzer(agent, preference, order=order, endowment=endowment)) for agent in agents]
+
+def audit_all_agents(preference: Preference, order=None, endowment=None, exhaustive: bool = False,
+                     max_workers: Optional[int] = None, chunksize: int = 16,
+                     callback: Optional[Callable[[str, Dict[str, Dict]], Any]] = None, share: bool = False) -> Dict[str, Dict[str, Dict]]:
+    """
+    Run the manipulation analysis for every agent in a process pool.
+
+    The profile, order and endowment are sent once to each worker process when it starts, so every worker analyses
+    its own isolated copy of the profile; with share=True, workers receive a `SharedPreference` handle instead and
+    read one shared copy. Agents are dispatched in chunks and the reports are merged as chunks finish.
+
+    Parameters
+    ----------
+    preference : Preference
+        The preference profile of all agents. It is not modified.
+    order : list, optional
+        The assignment order for Sequential Priority (SP) mechanism. If provided, SP will be checked.
+    endowment : list, optional
+        The endowment (initial ownership) for Top Trading Cycles (TTC) mechanism. If provided, TTC will be checked.
+    exhaustive : bool, optional
+        If True, use `manipulation` (all n! misreports) for each agent; otherwise use `fast_manipulation` (default).
+    max_workers : int, optional
+        Number of worker processes (default: number of CPUs). With max_workers=1, agents are analysed in the current process.
+    chunksize : int, optional
+        Number of agents per task (default = 16).
+    callback : Callable[[str, Dict[str, Dict]], Any], optional
+        Called with (agent name, report) in the parent process as soon as the agent's report arrives.
+    share : bool, optional
+        Publish the profile in shared memory for the workers instead of copying it into each of them (default = False).
+
+    Returns
+    -------
+    reports : Dict[str, Dict[str, Dict]]
+        reports[agent name] is the report of that agent, with the same format as `manipulation`. Agents appear in index order.
+
+    Examples
+    --------
+    >>> prefs = Preference([[0, 1, 2], [1, 2, 0], [2, 0, 1]], ["Alice", "Bob", "Carol"])
+    >>> audit_all_agents(prefs, order=[0, 1, 2], max_workers=1)
+    {'Alice': {'Sequential Priority': {}}, 'Bob': {'Sequential Priority': {}}, 'Carol': {'Sequential Priority': {}}}
+    """
+    if order is None and endowment is None:
+        raise ValueError("Neither order nor endowment is given.")
+    if chunksize <= 0:
+        raise ValueError("chunksize should be a positive integer.")
+
+    n = len(preference.prefs)
+    chunks = [list(range(start, min(start + chunksize, n))) for start in range(0, n, chunksize)]
+    reports = {}
+
+    def collect(results):
+        for agent, report in results:
+            reports[agent] = report
+            if callback is not None:
+                callback(preference.agents[agent], report)
+
+    if max_workers == 1:
+        _init_worker(preference, order, endowment, exhaustive)
+        try:
+            for chunk in chunks:
+                collect(_audit_agents(chunk))
+        finally:
+            _init_worker(None, None, None, False)
+    else:
+        shared = SharedPreference(preference) if share else None
+        try:
+            with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                     initargs=(shared.handle if share else preference, order, endowment, exhaustive)) as executor:
+                futures = [executor.submit(_audit_agents, chunk) for chunk in chunks]
+                for future in as_completed(futures):
+                    collect(future.result())
+        finally:
+            if shared is not None:
+                shared.close()
+
+    return {preference.agents[agent]: reports[agent] for agent in range(n)}
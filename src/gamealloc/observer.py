@@ -0,0 +1,98 @@
+from dataclasses import dataclass, field
+from typing import *
+
+@dataclass(frozen=True)
+class TraceEvent:
+    """
+    Structured event emitted by `sequential_priority` and `top_trading_cycles` when an observer is attached.
+
+    Parameters
+    --------
+    kind: str
+        "assign" (one agent receives one object), "cycle" (one TTC trading cycle is cleared),
+        "walk" (one TTC path walk ends), "round" (summary of one textbook TTC round) or "finish" (the run ends).
+    mechanism: str
+        "sequential_priority" or "top_trading_cycles".
+    time: float
+        Seconds since the run started.
+    round: int
+        Index of the round the event belongs to. For SP, every agent's turn is a round. For TTC "cycle" and "assign"
+        events, the textbook TTC round in which the cycle is cleared, where every cycle present in the graph is
+        cleared at once. For "walk" events, the index of the walk. For "round" events, the textbook round.
+        For "finish", the number of rounds.
+
+        TTC is run as a path walk: a walk follows pointers from one unassigned agent and clears every cycle it
+        closes until its path is empty. Walks are the unit of work, so cycles are emitted in walk order, and one
+        walk can clear cycles of several rounds while cycles of one round can be cleared by several walks.
+        A round is therefore only complete when the run ends: the "round" events are emitted in round order just
+        before "finish".
+    agents: Tuple[int, ...]
+        Agents involved, in cycle order for "cycle" events.
+    objects: Tuple[int, ...]
+        objects[k] is the object received by agents[k].
+    duration: float
+        Seconds spent in the walk ("walk"), in the whole run ("finish"), or finding the cycles of the round ("round",
+        each cycle is charged the time since the previous cycle); 0.0 otherwise.
+
+    Examples
+    --------
+    >>> from gamealloc import Preference, top_trading_cycles
+    >>> events = []
+    >>> top_trading_cycles([0, 1], Preference([[1, 0], [0, 1]]), observer=events.append)
+    Allocation([1, 0], agents=['agent_0', 'agent_1'], objects=['object_0', 'object_1'])
+    >>> [(e.kind, e.agents) for e in events]
+    [('cycle', (0, 1)), ('assign', (0,)), ('assign', (1,)), ('walk', ()), ('round', (0, 1)), ('finish', ())]
+    """
+    kind: str
+    mechanism: str
+    time: float
+    round: int
+    agents: Tuple[int, ...] = ()
+    objects: Tuple[int, ...] = ()
+    duration: float = 0.0
+
+Observer = Callable[[TraceEvent], Any]
+
+@dataclass
+class TraceRecorder:
+    """
+    Observer that keeps every event and summarises a run.
+
+    Pass the recorder itself as `observer`. Events can also be forwarded to another observer (e.g. a metrics client).
+
+    Parameters
+    --------
+    forward: Observer, optional
+        Called with every event after it is recorded.
+
+    Examples
+    --------
+    >>> from gamealloc import Preference, top_trading_cycles
+    >>> recorder = TraceRecorder()
+    >>> top_trading_cycles([0, 1, 2], Preference([[1, 0, 2], [0, 1, 2], [2, 0, 1]]), observer=recorder)
+    Allocation([1, 0, 2], agents=['agent_0', 'agent_1', 'agent_2'], objects=['object_0', 'object_1', 'object_2'])
+    >>> recorder.summary()["cycles"]
+    2
+    """
+    forward: Optional[Observer] = None
+    events: List[TraceEvent] = field(default_factory=list)
+
+    def __call__(self, event: TraceEvent):
+        self.events.append(event)
+        if self.forward is not None:
+            self.forward(event)
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Return the number of rounds (textbook rounds for TTC), cycles and assignments, the longest cycle and the
+        total run time in seconds.
+        """
+        cycles = [len(e.agents) for e in self.events if e.kind == "cycle"]
+        finish = [e for e in self.events if e.kind == "finish"]
+        return {
+            "rounds": sum(e.round for e in finish),
+            "cycles": len(cycles),
+            "max_cycle_length": max(cycles, default=0),
+            "assignments": sum(e.kind == "assign" for e in self.events),
+            "seconds": sum(e.duration for e in finish),
+        }
@@ -1,13 +1,17 @@
+from dataclasses import dataclass
 from typing import *
 import itertools
+import random
 import warnings
-from .preference import Preference
-from .allocation import Allocation
+from .preference import Preference, SparsePreference
+from .allocation import Allocation, CompactAllocation
+from .ttc import _ttc_engine, _capacitated_ttc_engine
 
 def _build_graph(allocation: Allocation, preference: Preference):
     """
-    Build a directed graph where each node is an object based on allocation and preference.
-    There is an edge from object i to object j if the agent holding object i strictly prefers object j over i.
+    Build a directed graph where each node is an agent based on allocation and preference.
+    There is an edge from agent a to agent b if agent a strictly prefers the object held by b over its own,
+    so every cycle is a trading cycle whose agents all gain by passing their objects backwards along it.
 
     Parameters
     ----------
@@ -23,21 +27,66 @@ def _build_graph(allocation: Allocation, preference: Preference):
     
     Example
     -------
-    >>> allocation = Allocation([0, 1, 2])
+    >>> allocation = Allocation([1, 0, 2])
     >>> preference = Preference([[1, 2, 0], [2, 0, 1], [0, 1, 2]])
     >>> _build_graph(allocation, preference)
-    [[1, 2], [2, 0], [0, 1]]
+    [[], [2], [1, 0]]
+    """
+    holder = [0] * len(allocation.allocation)
+    for agent, obj in enumerate(allocation.allocation):
+        holder[obj] = agent
+    graph = []
+    for agent, pref in enumerate(preference.prefs):
+        curr_rank = list(pref).index(allocation.allocation[agent])
+        graph.append([holder[obj] for obj in pref[:curr_rank]]) # holders of the objects the agent strictly prefers
+    return graph
 
-    Todos
-    --------
-    Currently, the graph is object-based. Agent-based graph would be more intuitive to point out the cycles and easier to give suggestion to agents.
+def _find_cycle(n: int, successors: Callable[[int], Iterable[int]]) -> Optional[List[int]]:
     """
+    Return one directed cycle of an implicit graph with nodes 0, ..., n-1, or None if the graph is acyclic.
 
-    graph = [[] for _ in range(len(allocation.allocation))] # adjacency list
-    for i, v in enumerate(preference.prefs):
-        curr_rank = v.index(allocation.allocation[i])
-        graph[allocation.allocation[i]] += v[:curr_rank] # append all objects that the agent strictly prefers over the assigned one
-    return graph
+    The depth-first search keeps an explicit stack of neighbour iterators instead of recursing,
+    so it is not limited by Python's recursion limit. Neighbours are generated lazily by `successors`,
+    hence the edge list is never materialised.
+
+    Parameters
+    ----------
+    n : int
+        Number of nodes.
+    successors : Callable[[int], Iterable[int]]
+        successors(v) yields the heads of all edges leaving v.
+
+    Returns
+    -------
+    cycle : Optional[List[int]]
+        Nodes [v0, v1, ..., vk] such that v0 -> v1 -> ... -> vk -> v0, or None.
+
+    Example
+    -------
+    >>> graph = [[1], [2], [0]]
+    >>> _find_cycle(3, graph.__getitem__)
+    [0, 1, 2]
+    """
+    state = bytearray(n) # 0: not visited, 1: on the current path, 2: completely searched
+    for root in range(n):
+        if state[root]:
+            continue
+        state[root] = 1
+        path = [root]
+        neighbors = [iter(successors(root))]
+        while path:
+            for nxt in neighbors[-1]:
+                if state[nxt] == 1: # back edge closes a cycle
+                    return path[path.index(nxt):]
+                if state[nxt] == 0:
+                    state[nxt] = 1
+                    path.append(nxt)
+                    neighbors.append(iter(successors(nxt)))
+                    break
+            else:
+                state[path.pop()] = 2
+                neighbors.pop()
+    return None
 
 def _has_cycle(graph: List[List[int]]):
     """
@@ -55,45 +104,135 @@ def _has_cycle(graph: List[List[int]]):
 
     Example
     -------
-    >>> graph = [[1, 2], [2, 0], [0, 1]]
+    >>> graph = [[], [2], [1, 0]]
     >>> _has_cycle(graph)
     True
     """
-    visited = set() # nodes have been completly searched
-    path = set()
-    def dfs(node):
-        if node in path:
-            return True
-        if node in visited:
-            return False
-        path.add(node)
-        for neighbor in graph[node]:
-            if dfs(neighbor):
-                return True
-        path.remove(node)
-        visited.add(node)
-        return False
-    for node in range(len(graph)):
-        if dfs(node):
-            return True
-    return False
-
-
-def is_pareto_efficient(allocation: Allocation, preference: Preference) -> bool:
+    return _find_cycle(len(graph), graph.__getitem__) is not None
+
+def _check_allocation(allocation: Allocation, preference: Preference):
+    """Check that allocation and preference describe the same market, where every agent holds an object."""
+    n = len(allocation.allocation)
+    if n == 0:
+        warnings.warn("No agents exist. The allocation will always be Pareto Efficiency.", UserWarning)
+    default_agents = [f"agent_{i}" for i in range(n)]
+    default_objects = [f"object_{i}" for i in range(n)]
+    if allocation.agents != default_agents and allocation.agents != preference.agents:
+        raise ValueError("Agents in allocation should be same as agents in preference")
+    if allocation.objects != default_objects and allocation.objects != preference.objects:
+        raise ValueError("Objects in allocation should be same as objects in preference")
+    if len(preference.prefs) != n:
+        raise ValueError(f"Lists in preference should be same as number of elements in allocation.")
+    if n > 0 and min(allocation.allocation) < 0:
+        raise ValueError("Unassigned agents (-1) are only supported with a SparsePreference.")
+
+def _improving_cycle(allocation: Sequence[int], prefs: Sequence[Sequence[int]], ranks: Optional[Sequence[Sequence[int]]] = None) -> Optional[List[int]]:
+    """
+    Search the agent-based graph for a trading cycle. Inputs are assumed to be validated.
+
+    There is an edge from agent i to agent j if agent i strictly prefers the object held by agent j to
+    its own object, i.e. the neighbours of i are the holders of prefs[i][:rank of allocation[i]].
+    Only the holder of each object and the rank of each agent's own object are stored (O(n) memory).
+    The ranks are read from the rank matrix in O(1) when it is given, otherwise they are searched in prefs.
+    """
+    n = len(allocation)
+    holder = [0] * n # holder[obj] is the agent who is assigned obj
+    for agent, obj in enumerate(allocation):
+        holder[obj] = agent
+    if ranks is not None:
+        own_rank = [ranks[i][obj] for i, obj in enumerate(allocation)]
+    else:
+        own_rank = [pref.index(allocation[i]) for i, pref in enumerate(prefs)]
+    def successors(agent):
+        return map(holder.__getitem__, itertools.islice(prefs[agent], own_rank[agent]))
+    return _find_cycle(n, successors)
+
+def _check_sparse_allocation(allocation: Allocation, preference: SparsePreference):
+    """Check that allocation and a SparsePreference describe the same market."""
+    n = len(allocation.allocation)
+    if allocation.agents != [f"agent_{i}" for i in range(n)] and allocation.agents != preference.agents:
+        raise ValueError("Agents in allocation should be same as agents in preference")
+    if allocation.objects != [f"object_{i}" for i in range(len(allocation.objects))] and allocation.objects != preference.objects:
+        raise ValueError("Objects in allocation should be same as objects in preference")
+    if preference.n_agents != n:
+        raise ValueError("Number of agents in preference should be same as number of elements in allocation.")
+    if n > 0 and max(allocation.allocation) >= preference.n_objects:
+        raise ValueError("Object index is out of range.")
+
+def _sparse_improving_cycle(allocation: Sequence[int], preference: SparsePreference) -> Optional[List[int]]:
+    """
+    Return a Pareto improvement of an allocation under truncated lists, in O(#agents + #objects + total list length).
+
+    [a] alone means agent a improves by itself: it prefers an object nobody holds to its own, or holds an object it
+    does not list (and prefers being unassigned). Otherwise the result is a trading cycle among assigned agents.
+    """
+    indptr, indices = preference.indptr, preference.indices
+    holder = [-1] * preference.n_objects
+    for agent, obj in enumerate(allocation):
+        if obj >= 0:
+            holder[obj] = agent
+    own_end = []
+    for agent, own in enumerate(allocation):
+        p, end = indptr[agent], indptr[agent + 1]
+        while p < end and indices[p] != own:
+            if holder[indices[p]] < 0:
+                return [agent]
+            p += 1
+        if own >= 0 and p == end:
+            return [agent]
+        own_end.append(p)
+    def successors(agent):
+        return map(holder.__getitem__, indices[indptr[agent]:own_end[agent]])
+    return _find_cycle(len(allocation), successors)
+
+def find_improving_cycle(allocation: Allocation, preference: Union[Preference, SparsePreference]) -> Optional[List[int]]:
+    """
+    Return a trading cycle that Pareto-improves the allocation, or None if the allocation is Pareto efficient.
+
+    Parameters
+    --------
+    allocation: Allocation
+        The allocation result for each agent (-1 for unassigned agents with a SparsePreference).
+    preference: Preference | SparsePreference
+        The preference profile for each agent.
+
+    Returns
+    --------
+    cycle: Optional[List[int]]
+        Agents [a0, a1, ..., ak] such that a0 strictly prefers the object of a1, a1 strictly prefers the object of a2, ...,
+        and ak strictly prefers the object of a0. Trading along the cycle makes all of them better off.
+        With a SparsePreference, [a] alone means agent a improves by itself: it prefers an object nobody holds,
+        or it holds an object it does not list. None if no improvement exists.
+
+    Examples
+    --------
+    >>> allocation = Allocation([0, 2, 1])
+    >>> preference = Preference([[0, 1, 2], [1, 0, 2], [2, 0, 1]])
+    >>> find_improving_cycle(allocation, preference)
+    [1, 2]
+    """
+    if isinstance(preference, SparsePreference):
+        _check_sparse_allocation(allocation, preference)
+        return _sparse_improving_cycle(allocation.allocation, preference)
+    _check_allocation(allocation, preference)
+    return _improving_cycle(allocation.allocation, preference.prefs, preference.rank_matrix())
+
+def is_pareto_efficient(allocation: Allocation, preference: Union[Preference, SparsePreference]) -> bool:
     """
     Return True if allocation is Pareto efficient.
 
     Parameters
     --------
     allocation: Allocation
-        The allocation result for each agent.
-    preference: Preference
+        The allocation result for each agent (-1 for unassigned agents with a SparsePreference).
+    preference: Preference | SparsePreference
         The preference profile for each agent.
 
     Returns
     --------
     bool
         True if the current allocation is Pareto efficient.
+        Use `find_improving_cycle` to see the trading cycle when it is not.
     
     Examples
     --------
@@ -112,20 +251,351 @@ def is_pareto_efficient(allocation: Allocation, preference: Preference) -> bool:
     >>> is_pareto_efficient(allocation, preference)
     ValueError: "Agents in allocation should be same as agents in preference"
     """
-    n = len(allocation.allocation)
-    if n == 0:
-        warnings.warn("No agents exist. The allocation will always be Pareto Efficiency.", UserWarning)
-    default_agents = [f"agent_{i}" for i in range(n)]
-    default_objects = [f"object_{i}" for i in range(n)]
-    if allocation.agents != default_agents and allocation.agents != preference.agents:
-        raise ValueError("Agents in allocation should be same as agents in preference")
-    if allocation.objects != default_objects and allocation.objects != preference.objects:
-        raise ValueError("Objects in allocation should be same as objects in preference")
-    if len(preference.prefs) != n:
-        raise ValueError(f"Lists in preference should be same as number of elements in allocation.")
-    
-    graph = _build_graph(allocation, preference)
-    return not _has_cycle(graph)
+    return find_improving_cycle(allocation, preference) is None
+
+@dataclass
+class ParetoImprovement:
+    """
+    Result of `pareto_improve`: a Pareto efficient allocation that every agent weakly prefers to the original one.
+
+    Parameters
+    --------
+    allocation: Allocation
+        The repaired, Pareto efficient allocation.
+    cycles: List[List[int]]
+        Trading cycles [a0, a1, ..., ak]: a0 receives the original object of a1, ..., and ak the original object of a0.
+    chains: List[List[int]]
+        Only with a SparsePreference. Chains [a0, a1, ..., ak]: a0 receives the original object of a1, ..., and ak
+        receives an object nobody held, or gives up an object it does not list. a0's original object is left free.
+    improved: List[int]
+        Agents who are strictly better off, in increasing order. Every other agent keeps its object.
+
+    Examples
+    --------
+    >>> repair = pareto_improve(Allocation([0, 1, 2]), Preference([[1, 0, 2], [0, 1, 2], [0, 1, 2]]))
+    >>> repair.allocation.to_list(), repair.cycles, repair.improved
+    ([1, 0, 2], [[0, 1]], [0, 1])
+    """
+    allocation: Allocation
+    cycles: List[List[int]]
+    chains: List[List[int]]
+    improved: List[int]
+
+def _trades(before: Sequence[int], after: Sequence[int], n_objects: int) -> Tuple[List[List[int]], List[List[int]]]:
+    """Split the moves from before to after into cycles and chains of agents, in O(#agents + #objects)."""
+    holder = [-1] * n_objects
+    for agent, obj in enumerate(before):
+        if obj >= 0:
+            holder[obj] = agent
+    successor = {a: holder[new] if new >= 0 else -1 for a, (old, new) in enumerate(zip(before, after)) if old != new}
+    taken = {b for b in successor.values() if b >= 0} # movers whose original object went to another mover
+    cycles, chains, seen = [], [], set()
+    for agent in successor: # chains start at movers nobody took from
+        if agent not in taken:
+            chain = []
+            while agent >= 0:
+                chain.append(agent)
+                seen.add(agent)
+                agent = successor[agent]
+            chains.append(chain)
+    for agent in successor: # what is left are cycles
+        if agent not in seen:
+            cycle = []
+            while agent not in seen:
+                cycle.append(agent)
+                seen.add(agent)
+                agent = successor[agent]
+            cycles.append(cycle)
+    return cycles, chains
+
+def pareto_improve(allocation: Allocation, preference: Union[Preference, SparsePreference]) -> ParetoImprovement:
+    """
+    Repair an allocation into a Pareto efficient allocation that dominates it, and report the trades.
+
+    The repair runs top trading cycles with the current allocation as the endowment. Every agent either keeps its
+    object or trades it for a better one, and the result is Pareto efficient (it is the core of that housing market).
+    With a SparsePreference, objects nobody holds are free seats that agents may take through chains, and an agent
+    holding an object it does not list gives it up first. The repair costs one TTC run and one linear pass:
+    O(n^2) = O(input size) for a Preference, O(#agents + #objects + total list length) for a SparsePreference.
+
+    Parameters
+    --------
+    allocation: Allocation
+        The allocation to repair, e.g. a hand-made or legacy assignment. -1 (unassigned) is only allowed with a
+        SparsePreference; with a Preference every agent must hold an object, otherwise ValueError is raised.
+    preference: Preference | SparsePreference
+        The preference profile for each agent.
+
+    Returns
+    --------
+    ParetoImprovement
+        The repaired allocation, the trading cycles (and, for a SparsePreference, chains) and the agents who gain.
+        An already efficient allocation is returned unchanged, with no trades.
+
+    Examples
+    --------
+    >>> preference = Preference([[1, 2, 0], [2, 0, 1], [0, 1, 2]], ["Alice", "Bob", "Carol"], ["A", "B", "C"])
+    >>> repair = pareto_improve(Allocation([0, 1, 2], ["Alice", "Bob", "Carol"], ["A", "B", "C"]), preference)
+    >>> repair.allocation.to_pairs()
+    [('Alice', 'B'), ('Bob', 'C'), ('Carol', 'A')]
+    >>> repair.cycles
+    [[0, 1, 2]]
+
+    See Also
+    --------
+    find_improving_cycle:
+        One improving cycle, without repairing the allocation.
+    """
+    before = list(allocation.allocation)
+    if isinstance(preference, SparsePreference):
+        _check_sparse_allocation(allocation, preference)
+        indptr, indices = preference.indptr, preference.indices
+        rank = [] # position of each agent's object in its list, len(list) for -1, None for an unlisted object
+        endowment = []
+        for agent, obj in enumerate(before):
+            row = indices[indptr[agent]:indptr[agent + 1]]
+            position = len(row) if obj < 0 else (row.index(obj) if obj in row else None)
+            rank.append(position)
+            endowment.append(obj if position is not None else -1) # unlisted objects are given up first
+        after = _capacitated_ttc_engine(endowment, preference, [1] * preference.n_objects)
+        def gains(agent, obj):
+            return rank[agent] is None or (obj >= 0 and obj != before[agent])
+        n_objects = preference.n_objects
+    else:
+        _check_allocation(allocation, preference)
+        after = _ttc_engine(before, preference.prefs)
+        def gains(agent, obj):
+            return obj != before[agent]
+        n_objects = len(before)
+    cycles, chains = _trades(before, after, n_objects)
+    improved = [agent for agent, obj in enumerate(after) if gains(agent, obj)]
+    return ParetoImprovement(Allocation._from_trusted(after, preference.agents, preference.objects), cycles, chains, improved)
+
+def _serial_dictatorship_outcomes(prefs: Sequence[Sequence[int]]) -> Iterator[List[int]]:
+    """
+    Yield every distinct serial dictatorship outcome exactly once. Inputs are assumed to be validated.
+
+    The search walks the tree of dictator choices. Two orders that only swap dictators whose picks do not
+    interact lead to the same allocation, so each allocation is generated through one canonical order only:
+    when agent a is chosen as the next dictator, every remaining agent b < a is blocked from picking its
+    current top object (the allocation where b gets it is produced in b's branch). A block is lifted as soon
+    as the object is picked by someone else.
+
+    A state is (remaining agents, picked objects, blocked agents). States from which no allocation can be
+    completed are remembered, so branches that reach the same dead state are merged instead of searched again.
+    """
+    n = len(prefs)
+    allocation = [-1] * n
+    blocked = [-1] * n # blocked[b] is the object agent b must not pick while it is available
+    dead = set()
+
+    def top(agent, picked):
+        for obj in prefs[agent]:
+            if not picked >> obj & 1:
+                return obj
+
+    def search(agents, picked):
+        if not agents:
+            yield list(allocation)
+            return
+        remaining = [a for a in range(n) if agents >> a & 1]
+        tops = [top(a, picked) for a in remaining]
+        block_mask = sum(1 << a for a, t in zip(remaining, tops) if blocked[a] == t)
+        key = (agents, picked, block_mask)
+        if key in dead:
+            return
+        saved = [blocked[a] for a in remaining]
+        found = False
+        for a, t in zip(remaining, tops):
+            if blocked[a] != t:
+                allocation[a] = t
+                for result in search(agents & ~(1 << a), picked | 1 << t):
+                    found = True
+                    yield result
+                allocation[a] = -1
+            blocked[a] = t # later branches must not give t to a
+        for a, b in zip(remaining, saved):
+            blocked[a] = b
+        if not found:
+            dead.add(key)
+
+    yield from search((1 << n) - 1, 0)
+
+class ParetoEfficientOutcomes:
+    """
+    Count, sample and unrank the distinct Pareto efficient allocations of a profile without listing them.
+
+    Every Pareto efficient allocation is reached by exactly one canonical serial dictatorship order (see
+    `iter_pareto_efficient_allocations`), and the number of allocations reachable from a state depends only on
+    (remaining agents, picked objects, blocked agents), each stored as a bitmask. The counts are computed once by
+    a memoised dynamic program over these states, which on typical profiles are far fewer than the n! orders.
+    Unranking then walks down one branch in O(n^2) per allocation, guided by the counts.
+
+    Allocations are indexed 0 to count() - 1 in the order `iter_pareto_efficient_allocations` yields them.
+
+    Parameters
+    --------
+    preference: Preference
+        Agent preference profile.
+
+    Methods
+    --------
+    count() -> int
+        Number of distinct Pareto efficient allocations.
+    unrank(index, compact) -> Allocation | CompactAllocation
+        The index-th allocation.
+    sample(seed, compact) -> Allocation | CompactAllocation
+        A uniformly random allocation.
+
+    Examples
+    --------
+    >>> outcomes = ParetoEfficientOutcomes(Preference([[0, 1, 2], [1, 2, 0], [0, 1, 2]]))
+    >>> outcomes.count()
+    4
+    >>> outcomes.unrank(3).to_list()
+    [1, 2, 0]
+
+    Warnings
+    --------
+    The number of states grows exponentially, and most of them are dead states (count 0) that still have to be stored.
+    On uniform random profiles, n = 16 takes about 7 s and 100 MB, n = 18 about 20 s and 350 MB (4M states), and
+    n = 20 over two minutes and about 2.5 GB (24M states); correlated profiles such as Mallows are not cheaper.
+    A warning is issued for n > 16.
+    """
+
+    def __init__(self, preference: Preference):
+        if not isinstance(preference, Preference):
+            raise TypeError("preference should be Preference type.")
+        n = len(preference.prefs)
+        if n > 16:
+            warnings.warn("The number of states grows exponentially: n = 18 needs about 350 MB and n = 20 several GB. "
+                          "Use it carefully with large number of agents (n > 16).", UserWarning)
+        self.preference = preference
+        self._n = n
+        self._counts = {} # state packed as one int (see _children) -> number of allocations
+        self._root = ((1 << n) - 1, 0, 0)
+
+    def _children(self, agents: int, picked: int, block: int) -> List[Tuple[int, int, int, int, int]]:
+        """
+        Return (dictator, object, remaining agents, picked objects, blocked agents) after every canonical choice
+        of the next dictator, in agent order.
+        """
+        prefs = self.preference.prefs
+        tops = []
+        with_top = {} # object -> agents whose top remaining object it is
+        remaining = agents
+        while remaining:
+            low = remaining & -remaining
+            remaining ^= low
+            agent = low.bit_length() - 1
+            for obj in prefs[agent]:
+                if not picked >> obj & 1:
+                    break
+            tops.append((agent, obj))
+            with_top[obj] = with_top.get(obj, 0) | low
+        children = []
+        lower = 0 # agents before the dictator are blocked from their current top object
+        for agent, obj in tops:
+            if not block >> agent & 1:
+                children.append((agent, obj, agents & ~(1 << agent), picked | 1 << obj, (block | lower) & ~with_top[obj]))
+            lower |= 1 << agent
+        return children
+
+    def _count(self, agents: int, picked: int, block: int) -> int:
+        if agents & (agents - 1) == 0: # zero or one agent left: it takes its top object unless it is blocked
+            return 0 if agents & block else 1
+        n = self._n
+        key = agents | picked << n | block << 2 * n
+        count = self._counts.get(key)
+        if count is None:
+            count = 0
+            for _, _, *child in self._children(agents, picked, block):
+                count += self._count(*child)
+            self._counts[key] = count
+        return count
+
+    def count(self) -> int:
+        """Return the number of distinct Pareto efficient allocations (0 when there are no agents)."""
+        return self._count(*self._root) if self._n else 0
+
+    def unrank(self, index: int, compact: bool = False) -> Union[Allocation, CompactAllocation]:
+        """Return the index-th Pareto efficient allocation, for 0 <= index < count()."""
+        if not 0 <= index < self.count():
+            raise IndexError("index out of range.")
+        allocation = [-1] * len(self.preference.prefs)
+        state = self._root
+        while state[0]:
+            for agent, obj, *child in self._children(*state):
+                count = self._count(*child)
+                if index < count:
+                    allocation[agent] = obj
+                    state = child
+                    break
+                index -= count
+        if compact:
+            return CompactAllocation(allocation, self.preference.name_table())
+        return Allocation._from_trusted(allocation, self.preference.agents, self.preference.objects)
+
+    def sample(self, seed: Optional[int] = None, compact: bool = False) -> Union[Allocation, CompactAllocation]:
+        """Return a uniformly random Pareto efficient allocation."""
+        if self.count() == 0:
+            raise IndexError("There is no allocation to sample.")
+        return self.unrank(random.Random(seed).randrange(self.count()), compact)
+
+def count_pareto_efficient_allocations(preference: Preference) -> int:
+    """
+    Return the number of distinct Pareto efficient allocations, without building them.
+
+    Examples
+    --------
+    >>> count_pareto_efficient_allocations(Preference([[0, 1, 2], [1, 2, 0], [0, 1, 2]]))
+    4
+
+    See Also
+    --------
+    ParetoEfficientOutcomes:
+        Also samples and unranks the allocations, reusing the same counts.
+    """
+    return ParetoEfficientOutcomes(preference).count()
+
+def iter_pareto_efficient_allocations(preference: Preference, compact: bool = False) -> Iterator[Union[Allocation, CompactAllocation]]:
+    """
+    Lazily yield every Pareto efficient allocation exactly once.
+
+    Every Pareto efficient allocation is the outcome of some serial dictatorship, so the generator walks the tree of
+    dictator choices instead of testing all n! allocations. Results are yielded as soon as they are found, so callers
+    can stop early, and only the current branch (plus the set of dead states) is kept in memory.
+
+    Parameters
+    --------
+    preference: Preference
+        Agent preference profile.
+    compact: bool, optional
+        If True, yield CompactAllocation objects sharing one NameTable, which is cheaper to keep in bulk (default = False).
+
+    Yields
+    --------
+    allocation: Allocation | CompactAllocation
+        A Pareto efficient allocation. The order of the allocations is not specified.
+
+    Examples
+    --------
+    >>> preference = Preference([[0, 1, 2], [1, 2, 0], [0, 1, 2]])
+    >>> allocations = iter_pareto_efficient_allocations(preference)
+    >>> next(allocations).to_list()
+    [0, 1, 2]
+    >>> sorted(a.to_list() for a in allocations)
+    [[0, 2, 1], [1, 2, 0], [2, 1, 0]]
+    """
+    if len(preference.prefs) == 0: # same as find_all_pareto_efficient_allocations
+        return
+    if compact:
+        names = preference.name_table()
+        for allocation in _serial_dictatorship_outcomes(preference.prefs):
+            yield CompactAllocation(allocation, names)
+        return
+    for allocation in _serial_dictatorship_outcomes(preference.prefs):
+        yield Allocation._from_trusted(allocation, preference.agents, preference.objects)
 
 def find_all_pareto_efficient_allocations(preference: Preference) -> List[Allocation]:
     """
@@ -150,16 +620,12 @@ def find_all_pareto_efficient_allocations(preference: Preference) -> List[Alloca
     Warnings
     --------
     The time complexity for this funcion is O(n!). Use it carefully with large number of agents (n >= 7).
+    The allocations are sorted, so all of them are held in memory; use `iter_pareto_efficient_allocations` to consume them lazily.
     """
 
     n = len(preference.prefs)
     if n >= 7:
         warnings.warn("The time complexity for this funcion is O(n!). Use it carefully with large number of agents (n >= 7).", UserWarning)
-    permutation = itertools.permutations(range(n))
-    res = []
-    if n > 0: # Check there is at least an agent
-        for p in permutation:
-            allocation = Allocation(list(p), preference.agents, preference.objects)
-            if is_pareto_efficient(allocation, preference):
-                res.append(allocation)
-    return res
+    if n == 0: # Check there is at least an agent
+        return []
+    return sorted(iter_pareto_efficient_allocations(preference), key=lambda x: x.allocation)
@@ -1,6 +1,9 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import *
+from array import array
+import itertools
 import warnings
+from .allocation import NameTable
 
 @dataclass
 class Preference:
@@ -30,6 +33,16 @@ class Preference:
     validate() -> Preference
         Checks and enforces the consistency and validity of the object.  
         Returns a validated Preference if all checks pass.
+    from_array(data, agents, objects) -> Preference
+        Build an array-backed Preference whose rows are int32 `array.array`.
+    from_validated(prefs, agents, objects) -> Preference
+        Build a Preference from data that is already known to be valid, skipping all checks.
+    to_array() -> List[array]
+        Return the order matrix as int32 rows.
+    rank_matrix() -> List[array]
+        Return the inverse of the order matrix: rank_matrix()[k][obj] is the position of obj in agent k's preference.
+    name_table() -> NameTable
+        Return the shared, immutable name table of this market.
 
     Examples
     --------
@@ -58,10 +71,101 @@ class Preference:
     prefs: List[List[int]]      
     agents: Optional[List[str]] = None
     objects: Optional[List[str]] = None
+    _ranks: Optional[List[array]] = field(default=None, init=False, repr=False, compare=False) # cache of rank_matrix()
+    _digest: Optional[str] = field(default=None, init=False, repr=False, compare=False) # cache of cache.profile_hash()
+
+    @classmethod
+    def from_array(cls, data: Iterable[Sequence[int]], agents: Optional[List[str]] = None, objects: Optional[List[str]] = None) -> "Preference":
+        """
+        Build an array-backed Preference from an n x n integer matrix.
+
+        Each row is stored as an int32 `array.array` (4 bytes per entry instead of a Python list of int objects),
+        so a 20k x 20k profile takes about 1.6 GB. Rows that already are int32 arrays are used without copying.
+
+        Parameters
+        --------
+        data: Iterable[Sequence[int]]
+            data[k] is agent k's preference. Any 2-D integer collection is accepted (list of lists, list of arrays, NumPy array).
+        agents: List[str], optional
+            Names or identifiers of the agents.
+        objects: List[str], optional
+            Names or identifiers of the objects.
+
+        Returns
+        --------
+        Preference
+            A Preference whose prefs are int32 arrays.
+
+        Examples
+        --------
+        >>> pref = Preference.from_array([[0, 1, 2], [2, 1, 0], [1, 0, 2]])
+        >>> pref.prefs[1]
+        array('i', [2, 1, 0])
+        >>> pref.rank_matrix()[1]
+        array('i', [2, 1, 0])
+        """
+        try:
+            prefs = [row if isinstance(row, array) and row.typecode == "i" else array("i", row) for row in data]
+        except TypeError:
+            raise TypeError("Each agent's preference profile should only contain int.")
+        n = len(prefs)
+        for row in prefs: # one pass per row at C speed, instead of the O(n) Python-level checks in validate()
+            if len(row) != n or len(set(row)) != n or (n > 0 and (min(row) < 0 or max(row) >= n)):
+                raise ValueError("Each agent's preference should be a complete ranking of objects 0 to n-1, where n is the number of agents.")
+        pref = cls.from_validated(prefs, agents, objects)
+        return pref._valid_agents()._valid_objects()
+
+    @classmethod
+    def from_validated(cls, prefs: List[List[int]], agents: Optional[List[str]] = None, objects: Optional[List[str]] = None) -> "Preference":
+        """
+        Build a Preference without running `__post_init__`.
+
+        Use it when the profile has already been checked at the system boundary, e.g. for profiles produced by
+        this package or by a trusted pipeline. Rows are not padded and names are not checked; missing name lists
+        are replaced by the default names.
+
+        Examples
+        --------
+        >>> pref = Preference.from_validated([[0, 1], [1, 0]])
+        >>> pref.agents
+        ['agent_0', 'agent_1']
+        """
+        self = cls.__new__(cls)
+        self.prefs = prefs
+        self.agents = agents if agents is not None else [f"agent_{i}" for i in range(len(prefs))]
+        self.objects = objects if objects is not None else [f"object_{i}" for i in range(len(prefs))]
+        self._ranks = None
+        self._digest = None
+        return self
+
+    def to_array(self) -> List[array]:
+        """Return the order matrix as a list of int32 `array.array` rows (a copy)."""
+        return [array("i", row) for row in self.prefs]
+
+    def name_table(self) -> NameTable:
+        """Return the interned NameTable of this market, shared by every CompactAllocation built from it."""
+        return NameTable.intern(self.agents, self.objects)
+
+    def rank_matrix(self) -> List[array]:
+        """
+        Return the rank matrix, the inverse of the order matrix.
+
+        rank_matrix()[k][obj] is the position of obj in agent k's preference (0 is the most preferred),
+        so comparing two objects for an agent is O(1). The matrix is computed once and cached; `validate()` clears the cache.
+        """
+        if self._ranks is None:
+            ranks = []
+            for row in self.prefs:
+                rank = array("i", [0]) * len(row)
+                for position, obj in enumerate(row):
+                    rank[obj] = position
+                ranks.append(rank)
+            self._ranks = ranks
+        return self._ranks
 
     def _valid_prefs(self):
         """Check data type in prefs"""
-        if not all(isinstance(pref, list) for pref in self.prefs):
+        if not all(isinstance(pref, (list, array, memoryview)) for pref in self.prefs): # memoryview rows come from load_preference
             raise TypeError("Each element in prefs should be a list.")
         for pref in self.prefs:
             if not all(isinstance(x, int) for x in pref):
@@ -96,10 +200,12 @@ class Preference:
         Checks and enforces the consistency and validity of the object.  
         Returns a validated Preference if all checks pass (in-place).
         """
+        self._ranks = None
+        self._digest = None
         return self._valid_prefs()._valid_agents()._valid_objects()
 
     def __post_init__(self):
-        # TODO: Support #(agents) != #(objects)
+        # #(agents) != #(objects) and truncated lists are supported by SparsePreference
         self._valid_prefs()._valid_agents()._valid_objects()
         n = len(self.prefs)
         m = n # m = len(self.prefs[0]) (It will occurs IndexError when n = 0)
@@ -113,7 +219,7 @@ class Preference:
             if len(self.agents) < n:
                 warnings.warn(f"List of agents is partial. \
                                 Missing names have been appended as \"agent_i\" for the i-th agent.", UserWarning)
-            self.agents += agents[len(self.agents):]
+            self.agents = self.agents + agents[len(self.agents):] # copy, the caller's list is not extended
         if self.objects is None:
             self.objects = objects
         elif len(self.objects) > m:
@@ -122,12 +228,139 @@ class Preference:
             if len(self.objects) < m:
                 warnings.warn(f"List of objects is partial. \
                                 Missing names have been appended as \"object_i\" for the i-th object.", UserWarning)
-            self.objects += objects[len(self.objects):]
+            self.objects = self.objects + objects[len(self.objects):]
         for i, v in enumerate(self.prefs):
             set_v = set(v)
             if len(set_v) == 0 or set_v != set(range(m)):
                 missing = [x for x in range(m) if x not in v]
-                self.prefs[i] += missing
+                self.prefs[i].extend(missing)
                 if missing:
                     warnings.warn(f"Preference for agent {self.agents[i]} is partial. \
                                   Missing {missing} have been appended to the end.", UserWarning)
+
+
+@dataclass
+class SparsePreference:
+    """
+    Truncated preference lists stored in compressed sparse row (CSR) form, for large and unbalanced markets.
+
+    Agent k ranks only the objects indices[indptr[k]:indptr[k + 1]], best first. Unlisted objects are unacceptable:
+    agent k prefers staying unassigned to receiving them. The number of objects may differ from the number of agents.
+    Storage is 4 bytes per list entry plus 8 bytes per agent, so 50k agents ranking their top 10 of 5k objects take
+    about 2.4 MB, and `sequential_priority`, `top_trading_cycles` and the Pareto checks run in time proportional to
+    the total list length.
+
+    Parameters
+    --------
+    indptr: Sequence[int]
+        Row offsets, of length n_agents + 1, starting at 0 and non-decreasing.
+    indices: Sequence[int]
+        Concatenated preference lists of all agents.
+    n_objects: int
+        Number of objects in the market.
+    agents: List[str], optional
+        Names or identifiers of the agents.
+    objects: List[str], optional
+        Names or identifiers of the objects.
+
+    Attributes
+    --------
+    indptr: array
+        Row offsets as an int64 `array.array`.
+    indices: array
+        Concatenated preference lists as an int32 `array.array`.
+    n_agents: int
+        Number of agents.
+
+    Methods
+    --------
+    from_lists(lists, n_objects, agents, objects) -> SparsePreference
+        Build from one (possibly empty) preference list per agent.
+    from_preference(preference, k) -> SparsePreference
+        Keep the top k objects of every agent of a Preference.
+    row(agent) -> array
+        Return agent's preference list.
+    to_lists() -> List[List[int]]
+        Return every agent's preference list.
+
+    Examples
+    --------
+    >>> pref = SparsePreference.from_lists([[1, 0], [1], []], n_objects=2)
+    >>> pref.indptr, pref.indices
+    (array('q', [0, 2, 3, 3]), array('i', [1, 0, 1]))
+    >>> sequential_priority([1, 0, 2], pref).to_list()
+    [0, 1, -1]
+    """
+    indptr: Sequence[int]
+    indices: Sequence[int]
+    n_objects: int
+    agents: Optional[List[str]] = None
+    objects: Optional[List[str]] = None
+
+    def __post_init__(self):
+        try:
+            self.indptr = self.indptr if isinstance(self.indptr, array) and self.indptr.typecode == "q" else array("q", self.indptr)
+            self.indices = self.indices if isinstance(self.indices, array) and self.indices.typecode == "i" else array("i", self.indices)
+        except TypeError:
+            raise TypeError("indptr and indices should only contain int.")
+        if not isinstance(self.n_objects, int) or self.n_objects < 0:
+            raise TypeError("n_objects should be a non-negative int.")
+        indptr, indices = self.indptr, self.indices
+        if len(indptr) == 0 or indptr[0] != 0 or indptr[-1] != len(indices):
+            raise ValueError("indptr should start with 0 and end with the length of indices.")
+        if any(a > b for a, b in zip(indptr, itertools.islice(indptr, 1, None))):
+            raise ValueError("indptr should be non-decreasing.")
+        if indices and (min(indices) < 0 or max(indices) >= self.n_objects):
+            raise ValueError("Object index is out of range.")
+        for k in range(len(indptr) - 1):
+            if len(set(indices[indptr[k]:indptr[k + 1]])) != indptr[k + 1] - indptr[k]:
+                raise ValueError("Elements in each agent's preference should be different.")
+        self.agents = self._names(self.agents, self.n_agents, "agent")
+        self.objects = self._names(self.objects, self.n_objects, "object")
+
+    @staticmethod
+    def _names(names: Optional[List[str]], n: int, kind: str) -> List[str]:
+        if names is None:
+            return [f"{kind}_{i}" for i in range(n)]
+        if not all(isinstance(name, str) for name in names):
+            raise TypeError(f"Each {kind}'s name should be string")
+        if len(set(names)) != len(names):
+            raise ValueError(f"Each {kind}'s name should be different")
+        if len(names) != n:
+            raise ValueError(f"Number of {kind}s should be {n}.")
+        return list(names)
+
+    @classmethod
+    def from_lists(cls, lists: Iterable[Sequence[int]], n_objects: Optional[int] = None,
+                   agents: Optional[List[str]] = None, objects: Optional[List[str]] = None) -> "SparsePreference":
+        """
+        Build a SparsePreference from one preference list per agent (best first; lists may be empty).
+
+        n_objects defaults to the number of object names, or else to the largest listed index plus one.
+        """
+        indptr = array("q", [0])
+        indices = array("i")
+        for row in lists:
+            indices.extend(row)
+            indptr.append(len(indices))
+        if n_objects is None:
+            n_objects = len(objects) if objects is not None else (max(indices) + 1 if indices else 0)
+        return cls(indptr, indices, n_objects, agents, objects)
+
+    @classmethod
+    def from_preference(cls, preference: Preference, k: Optional[int] = None) -> "SparsePreference":
+        """Keep the top k objects (all of them if k is None) of every agent of a Preference."""
+        return cls.from_lists((row[:k] for row in preference.prefs), len(preference.objects),
+                              preference.agents, preference.objects)
+
+    @property
+    def n_agents(self) -> int:
+        return len(self.indptr) - 1
+
+    def row(self, agent: int) -> array:
+        """Return agent's preference list as an int32 `array.array` (a copy)."""
+        return self.indices[self.indptr[agent]:self.indptr[agent + 1]]
+
+    def to_lists(self) -> List[List[int]]:
+        """Return every agent's preference list."""
+        return [self.row(agent).tolist() for agent in range(self.n_agents)]
@@ -0,0 +1,257 @@
+# Random serial dictatorship (RSD): sequential priority with a uniformly random order
+from dataclasses import dataclass
+from typing import *
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+import math
+import os
+import random
+import warnings
+from .preference import Preference
+from .sp import _sp_engine
+from .instance import spawn_seeds
+from .storage import PreferenceHandle, SharedPreference, attach_preference
+
+@dataclass
+class RSDResult:
+    """
+    Assignment-probability matrix of random serial dictatorship.
+
+    Parameters
+    --------
+    probabilities: List[List[float]]
+        probabilities[i][obj] is the probability that agent i receives obj.
+    half_width: List[List[float]]
+        Half-width of the confidence interval of each probability (all 0.0 for exact results).
+    samples: int
+        Number of sampled orders (0 for exact results).
+    agents: List[str]
+        Names or identifiers of the agents.
+    objects: List[str]
+        Names or identifiers of the objects.
+    centers: List[List[float]], optional
+        Center of each confidence interval. The Wilson interval is not centered on the estimate; None means centered.
+
+    Methods
+    --------
+    probability(agent, obj) -> float
+        Probability by index or by name.
+    interval(agent, obj) -> Tuple[float, float]
+        Confidence interval, clipped to [0, 1].
+    max_half_width() -> float
+        Largest half-width over all cells.
+    """
+    probabilities: List[List[float]]
+    half_width: List[List[float]]
+    samples: int
+    agents: List[str]
+    objects: List[str]
+    centers: Optional[List[List[float]]] = None
+
+    def _index(self, agent: Union[int, str], obj: Union[int, str]) -> Tuple[int, int]:
+        if isinstance(agent, str):
+            agent = self.agents.index(agent)
+        if isinstance(obj, str):
+            obj = self.objects.index(obj)
+        return agent, obj
+
+    def probability(self, agent: Union[int, str], obj: Union[int, str]) -> float:
+        """Return the probability that agent receives obj."""
+        agent, obj = self._index(agent, obj)
+        return self.probabilities[agent][obj]
+
+    def interval(self, agent: Union[int, str], obj: Union[int, str]) -> Tuple[float, float]:
+        """Return the confidence interval of the probability that agent receives obj."""
+        agent, obj = self._index(agent, obj)
+        p = self.probabilities[agent][obj] if self.centers is None else self.centers[agent][obj]
+        h = self.half_width[agent][obj]
+        return max(0.0, p - h), min(1.0, p + h)
+
+    def max_half_width(self) -> float:
+        """Return the largest confidence half-width over all cells."""
+        return max((max(row) for row in self.half_width if row), default=0.0)
+
+_worker_prefs = None # preference rows held by each worker process
+
+def _init_worker(prefs: Union[Sequence[Sequence[int]], PreferenceHandle]):
+    global _worker_prefs
+    _worker_prefs = attach_preference(prefs).prefs if isinstance(prefs, PreferenceHandle) else prefs
+
+def _rsd_counts(prefs: Sequence[Sequence[int]], seed: int, count: int) -> List[array]:
+    """Run SP on count random orders and return counts[i][obj], the number of runs where agent i got obj."""
+    n = len(prefs)
+    rng = random.Random(seed)
+    counts = [array("l", [0]) * n for _ in range(n)]
+    order = list(range(n))
+    for _ in range(count):
+        rng.shuffle(order)
+        for agent, obj in enumerate(_sp_engine(order, prefs)):
+            counts[agent][obj] += 1
+    return counts
+
+def _worker_counts(seed: int, count: int) -> List[array]:
+    return _rsd_counts(_worker_prefs, seed, count)
+
+def rsd_monte_carlo(preference: Preference, samples: int = 10000, target_error: Optional[float] = None,
+                    confidence: float = 0.95, batch_size: int = 1000, seed: int = 42,
+                    max_workers: Optional[int] = 1, share: bool = False) -> RSDResult:
+    """
+    Estimate the random serial dictatorship assignment probabilities by sampling orders.
+
+    Orders are sampled in batches; batch k uses the k-th seed of `spawn_seeds(seed, ...)`, so results are reproducible
+    for a fixed seed, batch_size and max_workers. Batches can run in a process pool, where every worker receives the
+    preference profile once, or only a `SharedPreference` handle with share=True. Confidence intervals are Wilson
+    score intervals: unlike the normal approximation z * sqrt(p (1 - p) / N), their width does not vanish when an
+    estimate is 0 or 1, so target_error cannot stop early on rare assignments that have not been sampled yet.
+
+    Parameters
+    --------
+    preference: Preference
+        Agent preference profile.
+    samples: int
+        Number of sampled orders, or the maximum number when target_error is given (default = 10000).
+    target_error: float, optional
+        Stop as soon as every confidence half-width is at most target_error (e.g. 0.005 for +-0.5%).
+        The rule is checked after every wave of batches.
+    confidence: float
+        Confidence level of the intervals (default = 0.95).
+    batch_size: int
+        Number of orders per batch (default = 1000).
+    seed: int
+        Random seed (default = 42).
+    max_workers: int, optional
+        Number of worker processes. With 1 (default), batches run in the current process; None uses every CPU.
+    share: bool
+        Publish the profile in shared memory for the workers instead of copying it into each of them (default = False).
+
+    Returns
+    --------
+    RSDResult
+        Probability matrix, confidence half-widths and the number of sampled orders.
+
+    Examples
+    --------
+    >>> preference = Preference([[0, 1, 2], [0, 1, 2], [1, 0, 2]])
+    >>> result = rsd_monte_carlo(preference, samples=20000, target_error=0.01)
+    >>> round(result.probability(2, 1), 1) # exactly 2/3, see rsd_exact
+    0.7
+
+    See Also
+    --------
+    rsd_exact:
+        Exact probabilities for small and medium markets, in the same format.
+    """
+    if not isinstance(preference, Preference):
+        raise TypeError("preference should be Preference type.")
+    if samples <= 0 or batch_size <= 0:
+        raise ValueError("samples and batch_size should be positive integers.")
+    if not 0 < confidence < 1:
+        raise ValueError("confidence should be in (0, 1).")
+    prefs = preference.prefs
+    n = len(prefs)
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    sizes = [batch_size] * (samples // batch_size) + ([samples % batch_size] if samples % batch_size else [])
+    seeds = spawn_seeds(seed, len(sizes))
+    totals = [array("l", [0]) * n for _ in range(n)]
+    done = 0
+
+    def add(counts):
+        for total, row in zip(totals, counts):
+            for obj, c in enumerate(row):
+                if c:
+                    total[obj] += c
+
+    def half_widths(count): # Wilson score interval
+        scale = 1 + z * z / count
+        return [[z * math.sqrt(c / count * (1 - c / count) / count + z * z / (4 * count * count)) / scale for c in row]
+                for row in totals]
+
+    def centers(count):
+        scale = 1 + z * z / count
+        return [[(c / count + z * z / (2 * count)) / scale for c in row] for row in totals]
+
+    def reached_target():
+        return target_error is not None and max((max(row) for row in half_widths(done)), default=0.0) <= target_error
+
+    if max_workers == 1:
+        for s, size in zip(seeds, sizes):
+            add(_rsd_counts(prefs, s, size))
+            done += size
+            if reached_target():
+                break
+    else:
+        shared = SharedPreference(preference) if share else None
+        try:
+            with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                     initargs=(shared.handle if share else prefs,)) as executor:
+                wave = max_workers or os.cpu_count() or 1
+                for start in range(0, len(sizes), wave):
+                    futures = [executor.submit(_worker_counts, s, size) for s, size in zip(seeds[start:start + wave], sizes[start:start + wave])]
+                    for future in futures:
+                        add(future.result())
+                    done += sum(sizes[start:start + wave])
+                    if reached_target():
+                        break
+        finally:
+            if shared is not None:
+                shared.close()
+
+    return RSDResult([[c / done for c in row] for row in totals], half_widths(done), done,
+                     list(preference.agents), list(preference.objects), centers(done))
+
+def rsd_exact(preference: Preference) -> RSDResult:
+    """
+    Compute the exact random serial dictatorship assignment probabilities.
+
+    Instead of averaging over all n! orders, the probability mass is pushed forward over states
+    (remaining agents, remaining objects), stored as a pair of bitmasks. From a state with k remaining agents,
+    each of them is the next dictator with probability 1/k and takes its top remaining object. Orders that lead to the
+    same state are merged, and only two levels of states are kept in memory. The number of states at level k is at most
+    C(n, k) for the agents times the number of reachable object sets, which on typical profiles is far below n!.
+
+    Parameters
+    --------
+    preference: Preference
+        Agent preference profile.
+
+    Returns
+    --------
+    RSDResult
+        Exact probability matrix, with zero half-widths and samples = 0.
+
+    Examples
+    --------
+    >>> preference = Preference([[0, 1, 2], [0, 1, 2], [1, 0, 2]])
+    >>> rsd_exact(preference).probabilities[2]
+    [0.0, 0.6666666666666666, 0.3333333333333333]
+
+    Warnings
+    --------
+    The number of states grows exponentially in the worst case. Use it carefully with large number of agents (n > 20).
+    """
+    if not isinstance(preference, Preference):
+        raise TypeError("preference should be Preference type.")
+    prefs = preference.prefs
+    n = len(prefs)
+    if n > 20:
+        warnings.warn("The number of states grows exponentially. Use it carefully with large number of agents (n > 20).", UserWarning)
+    probabilities = [[0.0] * n for _ in range(n)]
+    level = {((1 << n) - 1, (1 << n) - 1): 1.0} # (remaining agents, remaining objects) -> probability
+    for k in range(n, 0, -1):
+        following = {}
+        for (agents, objects), mass in level.items():
+            share = mass / k
+            remaining = agents
+            while remaining:
+                low = remaining & -remaining
+                agent = low.bit_length() - 1
+                remaining ^= low
+                for obj in prefs[agent]:
+                    if objects >> obj & 1:
+                        break
+                probabilities[agent][obj] += share
+                state = (agents ^ low, objects ^ (1 << obj))
+                following[state] = following.get(state, 0.0) + share
+        level = following
+    return RSDResult(probabilities, [[0.0] * n for _ in range(n)], 0, list(preference.agents), list(preference.objects))
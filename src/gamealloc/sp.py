@@ -1,8 +1,81 @@
 from typing import *
-from .preference import Preference
-from .allocation import Allocation
+from array import array
+import operator
+import time
+from .preference import Preference, SparsePreference
+from .allocation import Allocation, ManyToOneAllocation, _check_capacities
+from .observer import TraceEvent, Observer
 
-def sequential_priority(order: List[int], preferences: Preference) -> Allocation:
+def _check_order(order: Sequence[int], n: int):
+    """Check that order is a permutation of agent indices for n agents."""
+    if not all(isinstance(x, int) for x in order):
+        raise TypeError(f"Each element in order should be int.")
+    if len(order) != n:
+        raise ValueError("The length of order should be same as the length of preference profile.")
+    if set(order) != set(range(len(order))):
+        raise ValueError(f"order only contains integers from 0 to n-1, where n is the number of agents.")
+
+def _sp_engine(order: Sequence[int], prefs: Sequence[Sequence[int]], observer: Optional[Observer] = None) -> List[int]:
+    """
+    Sequential priority on validated inputs. Returns allocation[i], the object picked by agent i.
+    With an observer, one "assign" event is emitted per turn and a "finish" event at the end of the run.
+
+    Examples
+    --------
+    >>> _sp_engine([0, 1, 2], [[0, 1, 2], [2, 0, 1], [2, 1, 0]])
+    [0, 2, 1]
+    """
+    if observer is not None:
+        clock = time.perf_counter
+        start_time = clock()
+    picked = bytearray(len(prefs)) # picked[obj] == 1 if obj has been picked (#objects == #agents)
+    allocation = [-1] * len(order)
+    for turn, agent in enumerate(order):
+        for obj in prefs[agent]:
+            if not picked[obj]:
+                allocation[agent] = obj
+                picked[obj] = 1
+                if observer is not None:
+                    observer(TraceEvent("assign", "sequential_priority", clock() - start_time, turn, (agent,), (obj,)))
+                break
+    if observer is not None:
+        now = clock() - start_time
+        observer(TraceEvent("finish", "sequential_priority", now, len(order), duration=now))
+    return allocation
+
+def _sparse_sp_engine(order: Sequence[int], preference: SparsePreference) -> List[int]:
+    """
+    Sequential priority over truncated lists. An agent whose listed objects are all picked is unassigned (-1).
+    Runs in O(#agents + #objects + total list length).
+    """
+    indptr, indices = preference.indptr, preference.indices
+    picked = bytearray(preference.n_objects)
+    allocation = [-1] * preference.n_agents
+    for agent in order:
+        for p in range(indptr[agent], indptr[agent + 1]):
+            obj = indices[p]
+            if not picked[obj]:
+                allocation[agent] = obj
+                picked[obj] = 1
+                break
+    return allocation
+
+def _capacitated_sp_engine(order: Sequence[int], preference: SparsePreference, capacities: Sequence[int]) -> List[int]:
+    """Sequential priority where obj has capacities[obj] seats. Runs in O(#agents + #objects + total list length)."""
+    indptr, indices = preference.indptr, preference.indices
+    seats = array("q", capacities)
+    allocation = [-1] * preference.n_agents
+    for agent in order:
+        for p in range(indptr[agent], indptr[agent + 1]):
+            obj = indices[p]
+            if seats[obj]:
+                allocation[agent] = obj
+                seats[obj] -= 1
+                break
+    return allocation
+
+def sequential_priority(order: List[int], preferences: Union[Preference, SparsePreference], observer: Optional[Observer] = None,
+                        capacities: Optional[Sequence[int]] = None) -> Union[Allocation, ManyToOneAllocation]:
     """
     This function implements sequential priority algorithm.
     Given the order of agents and each agent's preference, it suggests an object allocation satisfy Pareto Efficiency.
@@ -11,13 +84,21 @@ def sequential_priority(order: List[int], preferences: Preference) -> Allocation
     --------
     order: List[int] | tuple[int] 
         determine the assigning order for agents. order[0] will be assigned first, then order[1], and so on.
-    preferences: Preference
-        preferences.prefs[i] is agent i's preference profile
+    preferences: Preference | SparsePreference
+        preferences.prefs[i] is agent i's preference profile. With a SparsePreference, an agent whose listed objects
+        are all taken is unassigned.
+    observer: Callable[[TraceEvent], Any], optional
+        Receives a TraceEvent for every assignment (each agent's turn is a round) and at the end of the run, with timing.
+        Attaching no observer costs nothing. Not supported with a SparsePreference or capacities.
+    capacities: List[int], optional
+        capacities[obj] is the number of seats of obj. Each agent takes a seat of its best object with a free seat.
+        Objects are not duplicated per seat, so the cost does not depend on the capacities.
     
     Returns
     --------
-    allocation: Allocation
-        allocation.allocation[i] is the assigned object for agent i
+    allocation: Allocation | ManyToOneAllocation
+        allocation.allocation[i] is the assigned object for agent i, or -1 if agent i is unassigned.
+        A ManyToOneAllocation when capacities are given.
     
     Examples
     --------
@@ -41,23 +122,144 @@ def sequential_priority(order: List[int], preferences: Preference) -> Allocation
     Allocation: 
         Data class for allocation result, having method such as .to_list(), .to_dict(), .to_pairs(), and so on. Please refer to *allocation.py*.
     
-    Todos
+    """
+
+    if capacities is not None:
+        if observer is not None:
+            raise ValueError("observer is not supported with capacities.")
+        if isinstance(preferences, Preference):
+            preferences = SparsePreference.from_preference(preferences)
+        elif not isinstance(preferences, SparsePreference):
+            raise TypeError("preferences should be Preference or SparsePreference type.")
+        capacities = _check_capacities(capacities, preferences.n_objects)
+        _check_order(order, preferences.n_agents)
+        allocation = _capacitated_sp_engine(order, preferences, capacities)
+        return ManyToOneAllocation._from_trusted(allocation, capacities, preferences.agents, preferences.objects)
+    if isinstance(preferences, SparsePreference):
+        if observer is not None:
+            raise ValueError("observer is not supported with SparsePreference.")
+        _check_order(order, preferences.n_agents)
+        return Allocation._from_trusted(_sparse_sp_engine(order, preferences), preferences.agents, preferences.objects)
+    _check_order(order, len(preferences.prefs))
+    allocation = _sp_engine(order, preferences.prefs, observer)
+    return Allocation._from_trusted(allocation, preferences.agents, preferences.objects)
+
+def sequential_priority_batch(orders: Iterable[Sequence[int]], preferences: Preference) -> List[array]:
+    """
+    Run sequential priority once for every order against the same preference profile.
+
+    The preference profile is checked once and shared by every run, and no Allocation object is built.
+    This is intended for random serial dictatorship and sensitivity sweeps.
+
+    Parameters
     --------
-    Currently, one-to-one matching is assumed.
+    orders: Iterable[Sequence[int]]
+        2-D collection of orders (list of lists, tuples, arrays, or rows of a NumPy array). Each row is one order.
+    preferences: Preference
+        preferences.prefs[i] is agent i's preference profile
+
+    Returns
+    --------
+    results: List[array]
+        results[k] is an int32 `array.array` where results[k][i] is the object assigned to agent i under orders[k].
+
+    Examples
+    --------
+    >>> preferences = Preference([[0, 1, 2], [2, 0, 1], [2, 1, 0]])
+    >>> [r.tolist() for r in sequential_priority_batch([[0, 1, 2], [2, 1, 0]], preferences)]
+    [[0, 2, 1], [1, 0, 2]]
     """
+    if not isinstance(preferences, Preference):
+        raise TypeError("preferences should be Preference type.")
+    prefs = preferences.prefs
+    n = len(prefs)
+    results = []
+    for order in orders:
+        try:
+            order = list(map(operator.index, order)) # accepts NumPy integers, rejects floats
+        except TypeError:
+            raise TypeError("Each element in order should be int.")
+        _check_order(order, n)
+        results.append(array("i", _sp_engine(order, prefs)))
+    return results
 
-    if not all(isinstance(x, int) for x in order):
-        raise TypeError(f"Each element in order should be int.")
-    if set(order) != set(range(len(order))):
-        raise ValueError(f"order only contains integers from 0 to n-1, where n is the number of agents.")
-   
-    n = len(order) # number of agents 
-    picked = set() # record picked objects
-    allocation = [None for _ in range(n)]
-    for agent in order:
-        for obj in preferences.prefs[agent]:
-            if obj not in picked:
-                allocation[agent] = obj
-                picked.add(obj)
-                break
-    return Allocation(allocation, preferences.agents, preferences.objects)
+class IncrementalSP:
+    """
+    Re-evaluate sequential priority when a single agent changes its reported preference.
+
+    Agents who pick before agent i in `order` are not affected by i's report, so their picks are taken from one
+    truthful run. The picked-object state at agent i's turn is snapshotted (and cached for the last queried agent),
+    and only the suffix of the order starting at i is replayed. A query for the agent at position t costs
+    O(n - t) picks instead of a full run, and `outcome` only needs the agent's own pick.
+
+    Parameters
+    --------
+    order: List[int]
+        Assigning order, as in `sequential_priority`.
+    preferences: Preference
+        The true preference profile. It is not modified.
+
+    Methods
+    --------
+    available(agent) -> List[int]
+        Objects still available at the agent's turn.
+    outcome(agent, report) -> int
+        Object the agent receives when it reports `report`.
+    evaluate(agent, report) -> List[int]
+        Full allocation when the agent reports `report` and everyone else reports truthfully.
+
+    Examples
+    --------
+    >>> sp = IncrementalSP([0, 1, 2], Preference([[0, 1, 2], [0, 2, 1], [2, 1, 0]]))
+    >>> sp.truthful
+    [0, 2, 1]
+    >>> sp.evaluate(1, [1, 0, 2])
+    [0, 1, 2]
+    """
+
+    def __init__(self, order: List[int], preferences: Preference):
+        if not isinstance(preferences, Preference):
+            raise TypeError("preferences should be Preference type.")
+        _check_order(order, len(preferences.prefs))
+        self.order = list(order)
+        self.prefs = preferences.prefs
+        self.truthful = _sp_engine(self.order, self.prefs)
+        self.position = [0] * len(self.order) # position[agent] is the agent's turn in order
+        for turn, agent in enumerate(self.order):
+            self.position[agent] = turn
+        self._cached = (-1, None) # (agent, picked objects at its turn)
+
+    def _snapshot(self, agent: int) -> bytearray:
+        """Return the picked-object state at the agent's turn (shared, do not modify)."""
+        if self._cached[0] != agent:
+            picked = bytearray(len(self.prefs))
+            for other in self.order[:self.position[agent]]:
+                picked[self.truthful[other]] = 1
+            self._cached = (agent, picked)
+        return self._cached[1]
+
+    def available(self, agent: int) -> List[int]:
+        """Return the objects that are still available at the agent's turn."""
+        picked = self._snapshot(agent)
+        return [obj for obj in range(len(picked)) if not picked[obj]]
+
+    def outcome(self, agent: int, report: Sequence[int]) -> int:
+        """Return the object the agent receives when it reports `report`; the suffix of the order is not replayed."""
+        picked = self._snapshot(agent)
+        for obj in report:
+            if not picked[obj]:
+                return obj
+        raise ValueError("report should rank every object.")
+
+    def evaluate(self, agent: int, report: Sequence[int]) -> List[int]:
+        """Return the allocation when the agent reports `report`, replaying only the suffix of the order from its turn."""
+        picked = bytearray(self._snapshot(agent))
+        allocation = list(self.truthful) # picks before the agent's turn are unchanged
+        prefs = self.prefs
+        for other in self.order[self.position[agent]:]:
+            for obj in (report if other == agent else prefs[other]):
+                if not picked[obj]:
+                    allocation[other] = obj
+                    picked[obj] = 1
+                    break
+        return allocation
@@ -0,0 +1,367 @@
+# Compact binary storage for preference profiles and batches of allocations
+#
+# File layout (little-endian):
+#   magic    8 bytes   b"GAMEALLC"
+#   version  uint32    1
+#   kind     uint32    0 = preference profile, 1 = allocations
+#   length   uint64    length of the JSON header in bytes
+#   header   JSON      {"rows", "cols", "agents", "objects"}, padded with spaces to a multiple of 64 bytes
+#   data     int32     rows x cols matrix, row-major
+#
+# `SharedPreference` writes the same layout into a shared memory block, so workers rebuild a profile from a small handle.
+from dataclasses import dataclass
+from typing import *
+from array import array
+from multiprocessing import shared_memory
+import json
+import mmap
+import os
+import struct
+import sys
+from .preference import Preference
+from .allocation import Allocation, CompactAllocation, NameTable
+
+MAGIC = b"GAMEALLC"
+VERSION = 1
+PREFERENCE, ALLOCATIONS = 0, 1
+_PREFIX = struct.Struct("<8sIIQ")
+_ALIGN = 64
+
+def _header(kind: int, n_rows: int, n_cols: int, agents: Sequence[str], objects: Sequence[str]) -> bytes:
+    """Return the prefix and the padded JSON header, i.e. everything before the int32 block."""
+    header = json.dumps({"rows": n_rows, "cols": n_cols, "agents": list(agents), "objects": list(objects)}).encode()
+    header += b" " * (-(_PREFIX.size + len(header)) % _ALIGN) # the int32 block starts on a 64-byte boundary
+    return _PREFIX.pack(MAGIC, VERSION, kind, len(header)) + header
+
+def _int32_rows(rows: Iterable[Sequence[int]], n_cols: int) -> Iterator[array]:
+    """Yield each row as a little-endian int32 array."""
+    for row in rows:
+        block = row if isinstance(row, array) and row.typecode == "i" else array("i", row)
+        if len(block) != n_cols:
+            raise ValueError("Each row should have the same length.")
+        if sys.byteorder == "big":
+            block = array("i", block)
+            block.byteswap()
+        yield block
+
+def _check_prefix(prefix: bytes, kind: int, source: Any) -> int:
+    """Check the prefix of a file or shared block and return the length of its JSON header."""
+    if len(prefix) != _PREFIX.size:
+        raise ValueError(f"{source} is not a gamealloc file.")
+    magic, version, file_kind, length = _PREFIX.unpack(prefix)
+    if magic != MAGIC:
+        raise ValueError(f"{source} is not a gamealloc file.")
+    if version != VERSION:
+        raise ValueError(f"Unsupported file version {version}.")
+    if file_kind != kind:
+        raise ValueError(f"{source} does not contain {'a preference profile' if kind == PREFERENCE else 'allocations'}.")
+    return length
+
+def _write(path: Union[str, os.PathLike], kind: int, rows: Iterable[Sequence[int]], n_rows: int, n_cols: int,
+           agents: Sequence[str], objects: Sequence[str]):
+    tmp = f"{os.fspath(path)}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(_header(kind, n_rows, n_cols, agents, objects))
+            for block in _int32_rows(rows, n_cols):
+                f.write(block.tobytes())
+        os.replace(tmp, path) # atomic, an invalid row never leaves a partial file or destroys the previous one
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+def _read(path: Union[str, os.PathLike], kind: int, use_mmap: bool) -> Tuple[Dict[str, Any], List[Sequence[int]]]:
+    with open(path, "rb") as f:
+        length = _check_prefix(f.read(_PREFIX.size), kind, path)
+        header = json.loads(f.read(length))
+        n_rows, n_cols = header["rows"], header["cols"]
+        offset = _PREFIX.size + length
+        if os.fstat(f.fileno()).st_size != offset + 4 * n_rows * n_cols:
+            raise ValueError(f"{path} is truncated.")
+        if use_mmap and sys.byteorder == "little" and n_rows * n_cols > 0:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            data = memoryview(buffer)[offset:].cast("i") # read-only, pages are shared through the OS cache
+            return header, [data[i * n_cols:(i + 1) * n_cols] for i in range(n_rows)]
+        rows = []
+        for _ in range(n_rows):
+            row = array("i")
+            row.fromfile(f, n_cols)
+            if sys.byteorder == "big":
+                row.byteswap()
+            rows.append(row)
+        return header, rows
+
+def _check_preference_header(header: Dict[str, Any], source: Any):
+    """Check that the header describes an n x n profile with n agent and object names. The rows are not read."""
+    n = header["rows"]
+    if header["cols"] != n or len(header["agents"]) != n or len(header["objects"]) != n:
+        raise ValueError(f"{source} has an inconsistent header.")
+
+def save_preference(preference: Preference, path: Union[str, os.PathLike]):
+    """
+    Save a preference profile in the gamealloc binary format (JSON header plus an int32 n x n block).
+
+    Parameters
+    --------
+    preference: Preference
+        Preference profile to save.
+    path: str | os.PathLike
+        Destination file.
+
+    Examples
+    --------
+    >>> save_preference(Preference([[0, 1], [1, 0]], ["A", "B"]), "profile.gamealloc")
+    >>> load_preference("profile.gamealloc").prefs[1].tolist()
+    [1, 0]
+    """
+    if not isinstance(preference, Preference):
+        raise TypeError("preference should be Preference type.")
+    n = len(preference.prefs)
+    _write(path, PREFERENCE, preference.prefs, n, n, preference.agents, preference.objects)
+
+def load_preference(path: Union[str, os.PathLike], mmap: bool = True, validate: bool = False) -> Preference:
+    """
+    Load a preference profile saved by `save_preference`.
+
+    With mmap=True (default), the rows are read-only int32 memoryviews into a memory-mapped file: nothing is copied,
+    and processes that open the same file share its pages through the OS cache.
+    With mmap=False, the rows are read into int32 `array.array`.
+
+    By default only the header is checked, together with the file size it implies, so loading a memory-mapped profile
+    does not touch its rows. Files written by `save_preference` are valid; pass validate=True for files from
+    untrusted sources, which checks that every row is a permutation in O(n^2).
+
+    Parameters
+    --------
+    path: str | os.PathLike
+        File written by `save_preference`.
+    mmap: bool, optional
+        Memory-map the file instead of reading it (default = True).
+    validate: bool, optional
+        Check every row, as `Preference.validate()` does (default = False).
+
+    Returns
+    --------
+    Preference
+        The stored preference profile.
+    """
+    header, rows = _read(path, PREFERENCE, mmap)
+    _check_preference_header(header, path)
+    preference = Preference.from_validated(rows, header["agents"], header["objects"])
+    return preference.validate() if validate else preference
+
+def save_allocations(allocations: Iterable[Union[Allocation, CompactAllocation, Sequence[int]]], path: Union[str, os.PathLike],
+                     names: Optional[NameTable] = None):
+    """
+    Save a batch of allocations of one market as an int32 matrix, one row per allocation.
+
+    Parameters
+    --------
+    allocations: Iterable[Allocation | CompactAllocation | Sequence[int]]
+        Allocations of the same market. Plain sequences are assignment vectors.
+    path: str | os.PathLike
+        Destination file.
+    names: NameTable, optional
+        Names of the market. If not provided, the names of the first Allocation/CompactAllocation are used,
+        or the default names.
+
+    Examples
+    --------
+    >>> save_allocations([Allocation([0, 1]), Allocation([1, 0])], "allocations.gamealloc")
+    >>> [a.to_list() for a in load_allocations("allocations.gamealloc")]
+    [[0, 1], [1, 0]]
+    """
+    rows = []
+    for allocation in allocations:
+        if isinstance(allocation, CompactAllocation):
+            names = names or allocation.names
+            rows.append(allocation.allocation)
+        elif isinstance(allocation, Allocation):
+            names = names or NameTable.intern(allocation.agents, allocation.objects)
+            rows.append(allocation.allocation)
+        else:
+            rows.append(allocation)
+    n = len(rows[0]) if rows else (len(names.agents) if names is not None else 0)
+    if names is None:
+        names = NameTable.default(n)
+    _write(path, ALLOCATIONS, rows, len(rows), n, names.agents, names.objects)
+
+def load_allocations(path: Union[str, os.PathLike], mmap: bool = True) -> List[CompactAllocation]:
+    """
+    Load a batch of allocations saved by `save_allocations`.
+
+    Every allocation is a CompactAllocation sharing one NameTable. With mmap=True (default), their assignment vectors
+    are read-only int32 memoryviews into the memory-mapped file, so nothing is copied.
+
+    Parameters
+    --------
+    path: str | os.PathLike
+        File written by `save_allocations`.
+    mmap: bool, optional
+        Memory-map the file instead of reading it (default = True).
+
+    Returns
+    --------
+    List[CompactAllocation]
+        The stored allocations, in order.
+    """
+    header, rows = _read(path, ALLOCATIONS, mmap)
+    names = NameTable.intern(header["agents"], header["objects"])
+    return [CompactAllocation(row, names) for row in rows]
+
+_attached = {} # PreferenceHandle -> (Preference, SharedMemory or None), profiles attached by this process
+
+@dataclass(frozen=True)
+class PreferenceHandle:
+    """
+    Small picklable reference to a preference profile published by `SharedPreference`.
+
+    Send it to worker processes instead of the profile: `attach_preference(handle)` rebuilds the profile there
+    from read-only int32 views of the shared block, so nothing is copied or unpickled.
+
+    Parameters
+    --------
+    name: str
+        Name of the shared memory block, or path of a file written by `save_preference`.
+    backend: str
+        "shm" for `multiprocessing.shared_memory` (default) or "file" for a memory-mapped file.
+    """
+    name: str
+    backend: str = "shm"
+
+class _AttachedMemory(shared_memory.SharedMemory):
+    def close(self):
+        try:
+            super().close()
+        except BufferError:
+            # rows handed out by attach_preference are still alive: they keep the mapping, which is unmapped when they
+            # are freed, so only the descriptor is closed here
+            if self._fd >= 0:
+                os.close(self._fd)
+                self._fd = -1
+
+def _preference_from_buffer(buffer: memoryview, source: str) -> Preference:
+    length = _check_prefix(bytes(buffer[:_PREFIX.size]), PREFERENCE, source)
+    header = json.loads(bytes(buffer[_PREFIX.size:_PREFIX.size + length]))
+    n_rows, n_cols = header["rows"], header["cols"]
+    offset = _PREFIX.size + length
+    end = offset + 4 * n_rows * n_cols
+    if len(buffer) < end: # shared memory blocks may be rounded up to a whole page
+        raise ValueError(f"{source} is truncated.")
+    _check_preference_header(header, source)
+    data = buffer.toreadonly()[offset:end].cast("i")
+    rows = [data[i * n_cols:(i + 1) * n_cols] for i in range(n_rows)]
+    if sys.byteorder == "big":
+        rows = [array("i", row) for row in rows]
+        for row in rows:
+            row.byteswap()
+    return Preference.from_validated(rows, header["agents"], header["objects"])
+
+def attach_preference(handle: PreferenceHandle) -> Preference:
+    """
+    Rebuild a profile published by `SharedPreference` from its handle, typically in a worker process.
+
+    The rows are read-only int32 memoryviews into the shared block or memory-mapped file, exactly like
+    `load_preference(path, mmap=True)`. Only the header is checked, with either backend: the publisher wrote a
+    validated profile, so attaching costs O(n) and does not read the rows. Each process attaches a handle once;
+    later calls return the same Preference until `detach_preference(handle)`.
+
+    Parameters
+    --------
+    handle: PreferenceHandle
+        `SharedPreference.handle` of an open publisher.
+
+    Returns
+    --------
+    Preference
+        The shared preference profile.
+    """
+    if not isinstance(handle, PreferenceHandle):
+        raise TypeError("handle should be PreferenceHandle type.")
+    entry = _attached.get(handle)
+    if entry is None:
+        if handle.backend == "shm":
+            # the publisher owns the block: since Python 3.13 attaching processes can opt out of the resource tracker,
+            # before that, child processes share the publisher's tracker, so registering again is harmless
+            block = _AttachedMemory(name=handle.name, **({"track": False} if sys.version_info >= (3, 13) else {}))
+            entry = (_preference_from_buffer(block.buf, handle.name), block)
+        elif handle.backend == "file":
+            entry = (load_preference(handle.name, mmap=True, validate=False), None)
+        else:
+            raise ValueError(f"Unknown backend {handle.backend!r}, use 'shm' or 'file'.")
+        _attached[handle] = entry
+    return entry[0]
+
+def detach_preference(handle: PreferenceHandle) -> bool:
+    """
+    Release this process's attachment of a handle and return whether it was attached.
+
+    The mapping is released as soon as no row of the attached Preference is referenced any more. `SharedPreference.close()`
+    detaches the handle in the publishing process; long-lived workers should detach handles they no longer use.
+    """
+    entry = _attached.pop(handle, None)
+    if entry is None:
+        return False
+    if entry[1] is not None:
+        entry[1].close()
+    return True
+
+class SharedPreference:
+    """
+    Publish a preference profile once, for zero-copy use by any number of worker processes.
+
+    With path=None (default), the profile is written into a `multiprocessing.shared_memory` block in the storage
+    format of `save_preference`; with a path, it is saved there and workers memory-map the file. Either way, `handle`
+    pickles in a few bytes, and every process that attaches it maps the same physical pages, so fanning out to many
+    workers costs no extra memory per process.
+
+    The publisher owns the shared memory block and frees it in `close()` (or when leaving the with block); a file
+    given by path is kept. Shared memory handles should be attached by child processes of the publisher while it is open.
+
+    Parameters
+    --------
+    preference: Preference
+        Preference profile to publish.
+    path: str | os.PathLike, optional
+        Publish through this file instead of shared memory.
+
+    Examples
+    --------
+    >>> with SharedPreference(Preference([[0, 1], [1, 0]])) as shared:
+    ...     attach_preference(shared.handle).prefs[1].tolist() # what each worker runs, e.g. in a pool initializer
+    [1, 0]
+    """
+
+    def __init__(self, preference: Preference, path: Optional[Union[str, os.PathLike]] = None):
+        if not isinstance(preference, Preference):
+            raise TypeError("preference should be Preference type.")
+        self._block = None
+        if path is not None:
+            save_preference(preference, path)
+            self.handle = PreferenceHandle(os.fspath(path), "file")
+            return
+        n = len(preference.prefs)
+        head = _header(PREFERENCE, n, n, preference.agents, preference.objects)
+        self._block = shared_memory.SharedMemory(create=True, size=len(head) + 4 * n * n)
+        buffer = self._block.buf
+        buffer[:len(head)] = head
+        offset = len(head)
+        for block in _int32_rows(preference.prefs, n):
+            buffer[offset:offset + 4 * n] = memoryview(block).cast("B")
+            offset += 4 * n
+        self.handle = PreferenceHandle(self._block.name, "shm")
+
+    def __enter__(self) -> "SharedPreference":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Detach the handle in this process and free the shared memory block. Workers must not attach the handle afterwards."""
+        detach_preference(self.handle)
+        if self._block is not None:
+            self._block.close()
+            self._block.unlink()
+            self._block = None
@@ -1,8 +1,319 @@
 from typing import *
-from .preference import Preference
-from .allocation import Allocation
+from array import array
+import operator
+import time
+from .preference import Preference, SparsePreference
+from .allocation import Allocation, ManyToOneAllocation, _check_capacities
+from .observer import TraceEvent, Observer
 
-def top_trading_cycles(endowment: Union[List[int], tuple[int]], preferences: Preference) -> Allocation:
+def _check_endowment(endowment: Sequence[int], n: int):
+    """Check that endowment is a permutation of object indices for n agents."""
+    if not all(isinstance(x, int) for x in endowment):
+        raise TypeError("Each element in endowment should be int.")
+    if len(endowment) != n:
+        raise ValueError("The length of endowment should be same as the length of preference profile.")
+    set_endo = set(endowment)
+    if len(endowment) != len(set_endo):
+        raise ValueError("One object cannot held by multi-agent.")
+    if set_endo != set(range(len(set_endo))):
+        raise ValueError("endowment only contains integers from 0 to n-1, where n is the number of agents.")
+
+def _check_sparse_endowment(endowment: Sequence[int], n_agents: int, n_objects: int):
+    """Check that endowment gives at most one object to each of n_agents agents (-1 for none)."""
+    if not all(isinstance(x, int) for x in endowment):
+        raise TypeError("Each element in endowment should be int.")
+    if len(endowment) != n_agents:
+        raise ValueError("The length of endowment should be same as the number of agents.")
+    held = [x for x in endowment if x != -1]
+    if len(held) != len(set(held)):
+        raise ValueError("One object cannot held by multi-agent.")
+    if held and (min(held) < 0 or max(held) >= n_objects):
+        raise ValueError("endowment only contains -1 (no object) and integers from 0 to m-1, where m is the number of objects.")
+
+def _sparse_ttc_engine(endowment: Sequence[int], preference: SparsePreference) -> List[int]:
+    """
+    Top trading cycles over truncated lists, in O(#agents + #objects + total list length).
+
+    An agent points to the owner of its best listed object still in the market. Its endowment is its outside option:
+    when its own object comes first in its remaining list, or the list is exhausted, it points to itself and keeps
+    its endowment. Agents without an endowment (-1) own nothing that others can trade for and stay unassigned.
+    Each agent's list is scanned once through a persistent pointer, and cycles are found by path following.
+    """
+    indptr, indices = preference.indptr, preference.indices
+    n = len(endowment)
+    owner = [-1] * preference.n_objects
+    for agent, obj in enumerate(endowment):
+        if obj >= 0:
+            owner[obj] = agent
+    pointer = list(indptr[:-1])
+    target = [-1] * n # object each agent on the path points to
+    position = [-1] * n # index in the path, -1 if the agent is not on it
+    done = bytearray(n)
+    allocation = [-1] * n
+    for start in range(n):
+        if done[start] or endowment[start] < 0:
+            continue
+        path = [start]
+        position[start] = 0
+        while path:
+            agent = path[-1]
+            own, p, end = endowment[agent], pointer[agent], indptr[agent + 1]
+            while p < end:
+                obj = indices[p]
+                if obj == own or (owner[obj] >= 0 and not done[owner[obj]]):
+                    break
+                p += 1
+            pointer[agent] = p
+            obj = indices[p] if p < end else own
+            target[agent] = obj
+            successor = owner[obj]
+            if position[successor] < 0:
+                position[successor] = len(path)
+                path.append(successor)
+                continue
+            cycle = path[position[successor]:] # clear the cycle and resume from the agent before it
+            del path[position[successor]:]
+            for member in cycle:
+                allocation[member] = target[member]
+                done[member] = 1
+                position[member] = -1
+    return allocation
+
+def _check_capacitated_endowment(endowment: Sequence[int], n_agents: int, capacities: Sequence[int]):
+    """Check that endowment gives each agent at most one seat (-1 for none) and no object more seats than its capacity."""
+    if not all(isinstance(x, int) for x in endowment):
+        raise TypeError("Each element in endowment should be int.")
+    if len(endowment) != n_agents:
+        raise ValueError("The length of endowment should be same as the number of agents.")
+    held = [0] * len(capacities)
+    for obj in endowment:
+        if obj < -1 or obj >= len(capacities):
+            raise ValueError("endowment only contains -1 (no seat) and integers from 0 to m-1, where m is the number of objects.")
+        if obj >= 0:
+            held[obj] += 1
+    if any(h > c for h, c in zip(held, capacities)):
+        raise ValueError("Number of agents holding an object should not exceed its capacity.")
+
+def _capacitated_ttc_engine(endowment: Sequence[int], preference: SparsePreference, capacities: Sequence[int]) -> List[int]:
+    """
+    Top trading cycles where obj has capacities[obj] seats, in O(#agents + #objects + total list length).
+
+    endowment[i] is the object whose seat agent i holds (-1 for none). Seats not held by anyone are free.
+    An agent points to its best listed object that still has a free seat or a seat holder in the market, or to itself
+    (keeping its seat) when its own object comes first or its list is exhausted. Every object is a single node whose
+    seat holders are queued, so an agent pointing to an object points to the object's first remaining holder.
+    Cycles trade seats as usual. A path that reaches an object with a free seat is cleared as a chain: the last agent
+    takes the free seat, every other agent takes the seat of the agent after it, and the first agent's seat becomes free.
+    Paths start from agents in index order, which breaks ties between agents competing for free seats.
+    """
+    indptr, indices = preference.indptr, preference.indices
+    n, m = len(endowment), preference.n_objects
+    free = array("q", capacities)
+    start = [0] * (m + 1) # seat holders of obj are holders[start[obj]:start[obj + 1]]
+    for obj in endowment:
+        if obj >= 0:
+            start[obj + 1] += 1
+            free[obj] -= 1
+    for obj in range(m):
+        start[obj + 1] += start[obj]
+    holders = [0] * start[m]
+    head = start[:m] # first holder of each object that may still be in the market
+    fill = start[:m]
+    for agent, obj in enumerate(endowment):
+        if obj >= 0:
+            holders[fill[obj]] = agent
+            fill[obj] += 1
+    pointer = list(indptr[:-1])
+    target = [-1] * n
+    position = [-1] * n
+    done = bytearray(n)
+    allocation = [-1] * n
+    for first in range(n):
+        if done[first]:
+            continue
+        path = [first]
+        position[first] = 0
+        while path:
+            agent = path[-1]
+            own, p, end = endowment[agent], pointer[agent], indptr[agent + 1]
+            successor = agent
+            while p < end:
+                obj = indices[p]
+                if obj == own:
+                    break
+                if free[obj]:
+                    successor = -1
+                    break
+                h, last = head[obj], start[obj + 1]
+                while h < last and done[holders[h]]:
+                    h += 1
+                head[obj] = h
+                if h < last:
+                    successor = holders[h]
+                    break
+                p += 1
+            pointer[agent] = p
+            target[agent] = indices[p] if successor != agent else own
+            if successor < 0: # chain ending at a free seat
+                free[target[agent]] -= 1
+                if endowment[first] >= 0:
+                    free[endowment[first]] += 1
+                for member in path:
+                    allocation[member] = target[member]
+                    done[member] = 1
+                    position[member] = -1
+                path.clear()
+            elif position[successor] < 0:
+                position[successor] = len(path)
+                path.append(successor)
+            else: # cycle, possibly of length one when the agent keeps its seat
+                cycle = path[position[successor]:]
+                del path[position[successor]:]
+                for member in cycle:
+                    allocation[member] = target[member]
+                    done[member] = 1
+                    position[member] = -1
+    return allocation
+
+class _TTCTracer:
+    """
+    Per-cycle and per-walk hooks of `_ttc_engine` that emit TraceEvents.
+
+    The path walk clears the same cycles as textbook TTC, only in another order. The textbook round of a cycle is
+    recovered from the objects its members skipped: every member points at its target from the round after the last
+    of them left, so the cycle is cleared in round 1 + (latest round among the objects skipped by its members).
+    Rounds are only complete at the end of the run, so their "round" events are emitted by `finish`.
+    """
+
+    def __init__(self, prefs: Sequence[Sequence[int]], observer: Observer):
+        self.prefs = prefs
+        self.observer = observer
+        self.clock = time.perf_counter
+        self.start_time = self.walk_start = self.cycle_start = self.clock()
+        self.removed = [0] * len(prefs) # removed[obj] is the textbook round in which obj left the market
+        self.rounds = self.walks = 0
+        self.round_agents, self.round_objects, self.round_seconds = [], [], [] # indexed by textbook round
+
+    def cycle(self, cycle: List[int], pointer: List[int]):
+        prefs, removed = self.prefs, self.removed
+        latest = -1
+        for member in cycle: # each agent is in one cycle, so this is O(pointer moves) over the run
+            for obj in prefs[member][:pointer[member]]:
+                if removed[obj] > latest:
+                    latest = removed[obj]
+        round_ = latest + 1
+        objects = tuple(prefs[member][pointer[member]] for member in cycle)
+        for obj in objects:
+            removed[obj] = round_
+        clock = self.clock()
+        if round_ == self.rounds:
+            self.rounds += 1
+            self.round_agents.append([])
+            self.round_objects.append([])
+            self.round_seconds.append(0.0)
+        self.round_agents[round_].extend(cycle)
+        self.round_objects[round_].extend(objects)
+        self.round_seconds[round_] += clock - self.cycle_start
+        self.cycle_start = clock
+        now = clock - self.start_time
+        self.observer(TraceEvent("cycle", "top_trading_cycles", now, round_, tuple(cycle), objects))
+        for member, obj in zip(cycle, objects):
+            self.observer(TraceEvent("assign", "top_trading_cycles", now, round_, (member,), (obj,)))
+
+    def walk(self):
+        now = self.clock()
+        self.observer(TraceEvent("walk", "top_trading_cycles", now - self.start_time, self.walks, duration=now - self.walk_start))
+        self.walks += 1
+        self.walk_start = now
+
+    def finish(self):
+        now = self.clock() - self.start_time
+        for round_ in range(self.rounds):
+            self.observer(TraceEvent("round", "top_trading_cycles", now, round_, tuple(self.round_agents[round_]),
+                                     tuple(self.round_objects[round_]), self.round_seconds[round_]))
+        self.observer(TraceEvent("finish", "top_trading_cycles", now, self.rounds, duration=now))
+
+def _ttc_engine(endowment: Sequence[int], prefs: Sequence[Sequence[int]], observer: Optional[Observer] = None) -> List[int]:
+    """
+    Index-based TTC engine. Inputs are assumed to be validated.
+
+    Each agent keeps a pointer into its own preference list that only moves forward, and an inverse
+    endowment map (object -> owner) replaces the `endowment.index` lookups. Agents are followed
+    along a single path: whenever the path closes, the whole cycle is cleared and the walk resumes
+    from the agent right before the cycle, so every cycle is removed in one pass over the agents.
+    The total work is O(n + number of pointer moves), i.e. O(n^2) in the worst case and close to
+    linear on typical instances.
+
+    Parameters
+    --------
+    endowment: Sequence[int]
+        endowment[i] is the object held by agent i
+    prefs: Sequence[Sequence[int]]
+        prefs[i] is agent i's preference list (any indexable rows, e.g. lists or arrays)
+    observer: Observer, optional
+        Receives a TraceEvent for every cycle, assignment, walk and textbook round (see `TraceEvent`).
+
+    Returns
+    --------
+    allocation: List[int]
+        allocation[i] is the assigned object for agent i
+
+    Examples
+    --------
+    >>> _ttc_engine([0, 1, 2, 3], [[1, 2, 0, 3], [2, 0, 1, 3], [0, 3, 2, 1], [0, 1, 3, 2]])
+    [1, 2, 0, 3]
+    """
+    tracer = _TTCTracer(prefs, observer) if observer is not None else None
+    n = len(endowment)
+    owner = [0] * n # owner[obj] is the agent who holds obj
+    for agent, obj in enumerate(endowment):
+        owner[obj] = agent
+    pointer = [0] * n # pointer[i] is the position of agent i's current top choice
+    taken = [False] * n # objects that have been traded in a cycle
+    on_path = [False] * n
+    allocation = [-1] * n
+    path = []
+
+    for start in range(n):
+        if allocation[start] != -1: # agent has been assigned
+            continue
+        path.append(start)
+        on_path[start] = True
+        while path:
+            agent = path[-1]
+            pref = prefs[agent]
+            p = pointer[agent]
+            while taken[pref[p]]: # skip objects which have left the market
+                p += 1
+            pointer[agent] = p
+            nxt = owner[pref[p]]
+            if not on_path[nxt]:
+                path.append(nxt)
+                on_path[nxt] = True
+                continue
+            # one cycle found: every agent from nxt to the end of the path trades
+            cycle = [] if tracer is not None else None
+            while True:
+                member = path.pop()
+                on_path[member] = False
+                obj = prefs[member][pointer[member]]
+                allocation[member] = obj
+                taken[obj] = True
+                if cycle is not None:
+                    cycle.append(member)
+                if member == nxt:
+                    break
+            if cycle is not None:
+                cycle.reverse() # path order, starting from nxt
+                tracer.cycle(cycle, pointer)
+        if tracer is not None:
+            tracer.walk()
+    if tracer is not None:
+        tracer.finish()
+    return allocation
+
+def top_trading_cycles(endowment: Union[List[int], tuple[int]], preferences: Union[Preference, SparsePreference], observer: Optional[Observer] = None,
+                       capacities: Optional[Sequence[int]] = None) -> Union[Allocation, ManyToOneAllocation]:
     """
     This function implements top-trading-cycle (TTC) algorithm.
     Given each agent's preference and initial endowment, it suggests an object allocation satisfy Pareto Efficiency.
@@ -10,14 +321,24 @@ def top_trading_cycles(endowment: Union[List[int], tuple[int]], preferences: Pre
     Parameters
     --------
     endowment: List[int] | tuple[int]
-        endowment[i] is the object held by agent i
-    preferences: Preference
-        preferences.prefs[i] is agent i's preference profile
+        endowment[i] is the object held by agent i. With a SparsePreference, -1 means agent i holds nothing and
+        objects may be held by nobody.
+    preferences: Preference | SparsePreference
+        preferences.prefs[i] is agent i's preference profile. With a SparsePreference, each agent keeps its endowment
+        once no listed object it prefers is left.
+    observer: Callable[[TraceEvent], Any], optional
+        Receives a TraceEvent for every cycle, assignment, path walk and textbook round, with timing (see `TraceEvent`).
+        Not supported with a SparsePreference or capacities.
+    capacities: List[int], optional
+        capacities[obj] is the number of seats of obj; endowment[i] is then the object whose seat agent i holds
+        (-1 for none), and seats held by nobody are free. Objects are not duplicated per seat, so the cost does not
+        depend on the capacities.
     
     Returns
     --------
-    allocation: Allocation
-        allocation.allocation[i] is the assigned object for agent i
+    allocation: Allocation | ManyToOneAllocation
+        allocation.allocation[i] is the assigned object for agent i, or -1 if agent i is unassigned.
+        A ManyToOneAllocation when capacities are given.
     
     Examples
     --------
@@ -41,53 +362,71 @@ def top_trading_cycles(endowment: Union[List[int], tuple[int]], preferences: Pre
     Allocation: 
         Data class for allocation result, having method such as .to_list(), .to_dict(), .to_pairs(), and so on. Please refer to *allocation.py*.
     
+    Notes
+    --------
+    The cycles are found by `_ttc_engine`, which runs in O(n + number of pointer moves) instead of rescanning every preference list each round.
+
     Todos
     --------
-    - Currently, one-to-one matching is assumed.
     - Opposite endowment representation (endowment[i] is the agent who owns object i).
     """
 
-    if not all(isinstance(x, int) for x in endowment):
-        raise TypeError("Each element in endowment should be int.")
+    if capacities is not None:
+        if observer is not None:
+            raise ValueError("observer is not supported with capacities.")
+        if isinstance(preferences, Preference):
+            preferences = SparsePreference.from_preference(preferences)
+        elif not isinstance(preferences, SparsePreference):
+            raise TypeError("preferences should be Preference or SparsePreference type.")
+        capacities = _check_capacities(capacities, preferences.n_objects)
+        _check_capacitated_endowment(endowment, preferences.n_agents, capacities)
+        allocation = _capacitated_ttc_engine(endowment, preferences, capacities)
+        return ManyToOneAllocation._from_trusted(allocation, capacities, preferences.agents, preferences.objects)
+    if isinstance(preferences, SparsePreference):
+        if observer is not None:
+            raise ValueError("observer is not supported with SparsePreference.")
+        _check_sparse_endowment(endowment, preferences.n_agents, preferences.n_objects)
+        return Allocation._from_trusted(_sparse_ttc_engine(endowment, preferences), preferences.agents, preferences.objects)
     if not isinstance(preferences, Preference):
         raise TypeError("preferences should be Preference type.")
-    if len(endowment) != len(preferences.prefs):
-        raise ValueError("The length of endowment should be same as the length of preference profile.")
-    set_endo = set(endowment)
-    if len(endowment) != len(set_endo):
-        raise ValueError("One object cannot held by multi-agent.")
-    if set_endo != set(range(len(set_endo))):
-        raise ValueError("endowment only contains integers from 0 to n-1, where n is the number of agents.")
-    
-    # find top choices for agents
-    n = len(endowment)
-    top_choices = [None for _ in range(n)]
-    allocation = [None for _ in range(n)]
-    remaining_obj = list(range(n))
-    remaining_agent = list(range(n))
-    
-    # find cycles
-    while remaining_obj:
-        # find top choices for agents
-        for i, v in enumerate(preferences.prefs):
-            if allocation[i] is None: # agent has not been assigned
-                for obj in v:
-                    if obj in remaining_obj: # object still available
-                        top_choices[i] = obj
-                        break
-        cycle = []
-        visited = set()
-        next = remaining_agent[0]
-        while next not in visited:
-            cycle.append(next)
-            visited.add(next)
-            next = endowment.index(top_choices[next])
-        start_point = cycle.index(next)
-
-        # one cycle found
-        for agent in cycle[start_point:]:
-            allocation[agent] = top_choices[agent]
-            remaining_obj.remove(top_choices[agent])
-            remaining_agent.remove(agent)
-
-    return Allocation(allocation, preferences.agents, preferences.objects)
+    _check_endowment(endowment, len(preferences.prefs))
+    allocation = _ttc_engine(endowment, preferences.prefs, observer)
+    return Allocation._from_trusted(allocation, preferences.agents, preferences.objects)
+
+def top_trading_cycles_batch(endowments: Iterable[Sequence[int]], preferences: Preference) -> List[array]:
+    """
+    Run top trading cycles once for every endowment against the same preference profile.
+
+    The preference profile is checked once and shared by every run, and no Allocation object is built.
+
+    Parameters
+    --------
+    endowments: Iterable[Sequence[int]]
+        2-D collection of endowments (list of lists, tuples, arrays, or rows of a NumPy array). Each row is one endowment.
+    preferences: Preference
+        preferences.prefs[i] is agent i's preference profile
+
+    Returns
+    --------
+    results: List[array]
+        results[k] is an int32 `array.array` where results[k][i] is the object assigned to agent i under endowments[k].
+
+    Examples
+    --------
+    >>> preferences = Preference([[1, 0, 2], [0, 1, 2], [1, 2, 0]])
+    >>> [r.tolist() for r in top_trading_cycles_batch([[2, 1, 0], [0, 1, 2]], preferences)]
+    [[2, 0, 1], [1, 0, 2]]
+    """
+    if not isinstance(preferences, Preference):
+        raise TypeError("preferences should be Preference type.")
+    prefs = preferences.prefs
+    n = len(prefs)
+    results = []
+    for endowment in endowments:
+        try:
+            endowment = list(map(operator.index, endowment)) # accepts NumPy integers, rejects floats
+        except TypeError:
+            raise TypeError("Each element in endowment should be int.")
+        _check_endowment(endowment, n)
+        results.append(array("i", _ttc_engine(endowment, prefs)))
+    return results
@@ -0,0 +1,134 @@
+from gamealloc.aio import AllocationService, handle_request, serve
+from gamealloc import Preference, Allocation, sequential_priority, top_trading_cycles, is_pareto_efficient, uniform_preference_instance
+from concurrent.futures import ProcessPoolExecutor
+import asyncio
+import json
+import pytest
+
+def test_batched_results_match():
+    pref = Preference.from_array(uniform_preference_instance(12, seed=6))
+    orders = [list(range(12))[k:] + list(range(12))[:k] for k in range(12)]
+
+    async def main():
+        async with AllocationService(max_batch=5) as service:
+            sp = await asyncio.gather(*(service.sequential_priority(order, pref) for order in orders))
+            ttc = await asyncio.gather(*(service.top_trading_cycles(order, pref) for order in orders))
+            pe = await asyncio.gather(*(service.is_pareto_efficient(Allocation(order), pref) for order in orders))
+            return sp, ttc, pe, service.stats()
+
+    sp, ttc, pe, stats = asyncio.run(main())
+    assert sp == [sequential_priority(order, pref) for order in orders]
+    assert ttc == [top_trading_cycles(order, pref) for order in orders]
+    assert pe == [is_pareto_efficient(Allocation(order), pref) for order in orders]
+    assert stats == {"requests": 36, "batches": 9, "cancelled": 0}
+
+def test_equal_profiles_share_a_batch():
+    async def main():
+        async with AllocationService() as service:
+            await asyncio.gather(*(service.sequential_priority([0, 1], Preference([[0, 1], [0, 1]])) for _ in range(10)))
+            return service.stats()["batches"]
+
+    assert asyncio.run(main()) == 1
+
+def test_invalid_request_does_not_fail_batch():
+    pref = Preference([[0, 1], [1, 0]])
+
+    async def main():
+        async with AllocationService() as service:
+            return await asyncio.gather(service.sequential_priority([0, 1], pref), service.sequential_priority([0, 0], pref),
+                                        service.top_trading_cycles([0.0, 1], pref), return_exceptions=True)
+
+    good, bad, wrong_type = asyncio.run(main())
+    assert good.to_list() == [0, 1]
+    assert isinstance(bad, ValueError) and isinstance(wrong_type, TypeError)
+
+def test_validation_and_hash_run_in_executor(monkeypatch):
+    import gamealloc.aio, threading
+    threads = []
+    monkeypatch.setattr(gamealloc.aio, "profile_hash", lambda preference: threads.append(threading.get_ident()) or "digest")
+
+    async def main():
+        async with AllocationService() as service:
+            loop_thread = threading.get_ident()
+            await service.sequential_priority([1, 0], Preference([[0, 1], [0, 1]]))
+            with pytest.raises(ValueError):
+                await service.top_trading_cycles([1, 1], Preference([[0, 1], [0, 1]]))
+            return loop_thread
+
+    loop_thread = asyncio.run(main())
+    assert threads and loop_thread not in threads
+
+def test_cancellation():
+    pref = Preference([[0, 1], [1, 0]])
+
+    async def main():
+        async with AllocationService(max_delay=0.05) as service:
+            task = asyncio.ensure_future(service.sequential_priority([0, 1], pref))
+            await asyncio.sleep(0)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            await asyncio.sleep(0.1)
+            return service.stats()
+
+    assert asyncio.run(main()) == {"requests": 1, "batches": 0, "cancelled": 1}
+
+def test_backpressure():
+    pref = Preference([[0, 1], [1, 0]])
+
+    async def main():
+        async with AllocationService(max_pending=2, max_batch=100) as service:
+            tasks = [asyncio.ensure_future(service.sequential_priority([0, 1], pref)) for _ in range(5)]
+            await asyncio.sleep(0)
+            queued = service.stats()["requests"]
+            await asyncio.gather(*tasks)
+            return queued, service.stats()
+
+    queued, stats = asyncio.run(main())
+    assert queued == 2
+    assert stats["requests"] == 5 and stats["batches"] == 3
+
+def test_process_pool():
+    pref = Preference.from_array(uniform_preference_instance(8, seed=1))
+
+    async def main():
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            async with AllocationService(executor) as service:
+                return await service.top_trading_cycles(list(range(8)), pref)
+
+    assert asyncio.run(main()) == top_trading_cycles(list(range(8)), pref)
+
+def test_handle_request():
+    async def main():
+        async with AllocationService() as service:
+            return (await handle_request(service, '{"id": 1, "prefs": [[1, 0], [1, 0]], "mechanism": "ttc", "endowment": [0, 1]}'),
+                    await handle_request(service, '{"id": 2, "prefs": [[1, 0], [1, 0]], "mechanism": "pareto", "allocation": [0, 1]}'),
+                    await handle_request(service, '{"id": 3, "prefs": [[1, 0], [1, 0]]}'))
+
+    assert asyncio.run(main()) == ({"id": 1, "result": [0, 1]}, {"id": 2, "result": True},
+                                   {"id": 3, "error": "KeyError: 'order'"})
+
+def test_server_roundtrip():
+    async def main():
+        async with AllocationService() as service:
+            server = await serve(service, port=0)
+            port = server.sockets[0].getsockname()[1]
+            async with server:
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+                for k in range(20):
+                    writer.write((json.dumps({"id": k, "prefs": [[0, 1], [0, 1]], "order": [k % 2, 1 - k % 2]}) + "\n").encode())
+                await writer.drain()
+                writer.write_eof()
+                responses = [json.loads(await reader.readline()) for _ in range(20)]
+                writer.close()
+            return responses, service.stats()
+
+    responses, stats = asyncio.run(main())
+    assert sorted((r["id"], r["result"]) for r in responses) == [(k, [0, 1] if k % 2 == 0 else [1, 0]) for k in range(20)]
+    assert stats["batches"] < 20
+
+def test_invalid_parameters():
+    with pytest.raises(ValueError):
+        AllocationService(max_batch=0)
+    with pytest.raises(ValueError):
+        AllocationService(max_delay=-1)
@@ -1,4 +1,4 @@
-from gamealloc import Allocation
+from gamealloc import Allocation, CompactAllocation, ManyToOneAllocation, NameTable, Preference
 import pytest
 
 def allocation_pattern(res, size=15):
@@ -37,7 +37,7 @@ def test_allocation_type_error():
     with pytest.raises(TypeError):
         Allocation([[]])
     with pytest.raises(TypeError) as e:
-        Allocation([-1])
+        Allocation([-2])
     assert "non-negative" in str(e.value)
 
 def test_allocation_value_error():
@@ -48,6 +48,20 @@ def test_allocation_value_error():
         Allocation([1,3,0],None,["a","b","c"])
     assert "index is out of range" in str(e.value)
 
+def test_unassigned_agents():
+    allocation = Allocation([1, -1, 0], ["A", "B", "C"], ["a", "b"])
+    assert allocation.to_dict() == {"A": "b", "B": None, "C": "a"}
+    assert allocation.to_pairs() == [("A", "b"), ("B", None), ("C", "a")]
+    assert "B \u2192 (unassigned)" in str(allocation)
+    assert Allocation([-1, -1]).objects == ["object_0", "object_1"]
+    assert Allocation([3, -1]).objects == ["object_0", "object_1", "object_2", "object_3"]
+    with pytest.raises(ValueError):
+        Allocation([1, -1, 1])
+    with pytest.raises(ValueError):
+        Allocation([0, 1, -1], None, ["a"])
+    compact = CompactAllocation([-1, 0], NameTable.intern(["A", "B"], ["a"]))
+    assert compact.to_dict() == {"A": None, "B": "a"}
+
 def test_empty():
     assert Allocation([]).to_pairs() == []
     assert Allocation([]).to_list() == []
@@ -94,4 +108,60 @@ def test_validate():
         alloc = Allocation([0, 1], ["A", "B"], ["a", "b"])
         alloc.objects[1] = "a"
         alloc.validate()
-    assert "object's name" in str(e.value)
\ No newline at end of file
+    assert "object's name" in str(e.value)
+
+def test_from_trusted():
+    agents, objects = ["A", "B"], ["a", "b"]
+    alloc = Allocation._from_trusted([1, 0], agents, objects)
+    assert alloc == Allocation([1, 0], ["A", "B"], ["a", "b"])
+    assert alloc.agents is agents and alloc.objects is objects
+    assert alloc.to_dict() == {"A": "b", "B": "a"}
+
+def test_partial_names_not_shared():
+    agents = ["A"]
+    with pytest.warns(UserWarning, match="agent_i"):
+        alloc = Allocation([0, 1], agents)
+    assert agents == ["A"]
+    assert alloc.agents == ["A", "agent_1"]
+
+def test_name_table():
+    table = NameTable.intern(["A", "B"], ["a", "b"])
+    assert table is NameTable.intern(("A", "B"), ("a", "b"))
+    assert table is Preference([[0, 1], [1, 0]], ["A", "B"], ["a", "b"]).name_table()
+    assert NameTable.default(2) == NameTable(["agent_0", "agent_1"], ["object_0", "object_1"])
+    with pytest.raises(AttributeError):
+        table.agents = ("C", "D")
+
+def test_compact_allocation():
+    table = NameTable.intern(["A", "B", "C"], ["a", "b", "c"])
+    alloc = CompactAllocation([2, 0, 1], table)
+    assert alloc.to_list() == [2, 0, 1]
+    assert alloc.to_dict() == {"A": "c", "B": "a", "C": "b"}
+    assert alloc.to_pairs() == [("A", "c"), ("B", "a"), ("C", "b")]
+    assert alloc.to_allocation() == Allocation([2, 0, 1], ["A", "B", "C"], ["a", "b", "c"])
+    assert CompactAllocation.from_allocation(alloc.to_allocation()) == alloc
+    assert CompactAllocation([1, 0]).names is NameTable.default(2)
+    assert len({alloc, CompactAllocation([2, 0, 1], table)}) == 1
+    assert not hasattr(alloc, "__dict__")
+    with pytest.raises(ValueError):
+        CompactAllocation([0, 1], table)
+
+def test_many_to_one_allocation():
+    allocation = ManyToOneAllocation([0, 1, 0, -1], [2, 3], ["A", "B", "C", "D"], ["x", "y"])
+    assert allocation.to_list() == [0, 1, 0, -1]
+    assert allocation.to_dict() == {"A": "x", "B": "y", "C": "x", "D": None}
+    assert allocation.to_groups() == {"x": ["A", "C"], "y": ["B"]}
+    assert allocation.load() == [2, 1] and allocation.remaining() == [0, 2]
+    assert ManyToOneAllocation([1, 1], [0, 2]).objects == ["object_0", "object_1"]
+
+def test_many_to_one_allocation_errors():
+    with pytest.raises(ValueError):
+        ManyToOneAllocation([0, 0], [1])
+    with pytest.raises(ValueError):
+        ManyToOneAllocation([2], [1, 1])
+    with pytest.raises(TypeError):
+        ManyToOneAllocation([-2], [1])
+    with pytest.raises(ValueError):
+        ManyToOneAllocation([0], [-1])
+    with pytest.raises(ValueError):
+        ManyToOneAllocation([0], [1], ["A", "B"])
@@ -0,0 +1,42 @@
+import pytest, json
+from gamealloc.bench import run_benchmarks, compare, main, MECHANISMS, FAMILIES
+
+def test_run_benchmarks():
+    res = run_benchmarks([3, 10], repeat=1)
+    assert {r["mechanism"] for r in res} == set(MECHANISMS)
+    assert {r["family"] for r in res} == set(FAMILIES)
+    # exponential mechanisms are skipped above their size limit
+    assert not [r for r in res if r["mechanism"] == "manipulation" and r["size"] == 10]
+    assert all(r["seconds"] >= 0 and r["peak_bytes"] >= 0 for r in res)
+
+def test_run_benchmarks_cold_runs():
+    # every run rebuilds the rank matrix instead of reusing the one cached by the previous run
+    res = run_benchmarks([200], ["uniform"], ["is_pareto_efficient"], repeat=2)
+    assert res[0]["peak_bytes"] >= 4 * 200 * 200
+
+def test_run_benchmarks_value_error():
+    with pytest.raises(ValueError):
+        run_benchmarks([3], ["unknown"])
+    with pytest.raises(ValueError):
+        run_benchmarks([3], repeat=0)
+
+def test_compare():
+    base = [{"mechanism": "sp", "family": "uniform", "size": 10, "seconds": 1.0, "peak_bytes": 100}]
+    assert compare([dict(base[0], seconds=1.2)], base) == []
+    res = compare([dict(base[0], seconds=2.0, peak_bytes=200)], base)
+    assert [r["metric"] for r in res] == ["seconds", "peak_bytes"]
+    assert compare([dict(base[0], seconds=2.0)], base, time_threshold=1.5) == []
+    # timings below min_seconds are noise
+    assert compare([dict(base[0], seconds=2e-4)], [dict(base[0], seconds=1e-4)]) == []
+
+def test_main(tmp_path, capsys):
+    out = tmp_path / "bench.json"
+    args = ["--sizes", "4", "--families", "uniform", "--mechanisms", "sequential_priority", "--repeat", "1"]
+    assert main(args + ["-o", str(out)]) == 0
+    data = json.loads(out.read_text())
+    assert data["results"][0]["mechanism"] == "sequential_priority"
+    for r in data["results"]:
+        r["seconds"], r["peak_bytes"] = 1e-9, 1
+    out.write_text(json.dumps(data))
+    assert main(args + ["--baseline", str(out)]) == 1
+    assert "REGRESSION" in capsys.readouterr().err
@@ -0,0 +1,126 @@
+from gamealloc import ResultCache, profile_hash, Preference, Allocation, sequential_priority, top_trading_cycles, is_pareto_efficient
+from gamealloc import uniform_preference_instance, save_preference, load_preference, SparsePreference
+import pytest
+
+def test_profile_hash_is_stable():
+    rows = uniform_preference_instance(20, seed=4)
+    pref = Preference.from_array(rows)
+    assert profile_hash(pref) == profile_hash(Preference([list(row) for row in rows]))
+    assert profile_hash(pref) != profile_hash(Preference.from_array(rows, [f"a{i}" for i in range(20)]))
+    assert profile_hash(pref) != profile_hash(Preference.from_array(uniform_preference_instance(20, seed=5)))
+
+def test_profile_hash_after_validate():
+    pref = Preference([[0, 1], [1, 0]])
+    before = profile_hash(pref)
+    pref.prefs[0] = [1, 0]
+    pref.validate()
+    assert profile_hash(pref) != before
+
+def test_profile_hash_of_mmap(tmp_path):
+    pref = Preference.from_array(uniform_preference_instance(10, seed=1))
+    save_preference(pref, tmp_path / "p.gamealloc")
+    assert profile_hash(load_preference(tmp_path / "p.gamealloc")) == profile_hash(pref)
+
+def test_cached_results_match():
+    pref = Preference.from_array(uniform_preference_instance(15, seed=3))
+    cache = ResultCache()
+    order = list(range(14, -1, -1))
+    for _ in range(2):
+        assert cache.sequential_priority(order, pref) == sequential_priority(order, pref)
+        assert cache.top_trading_cycles(order, pref) == top_trading_cycles(order, pref)
+        allocation = Allocation(list(range(15)), pref.agents, pref.objects)
+        assert cache.is_pareto_efficient(allocation, pref) == is_pareto_efficient(allocation, pref)
+    assert cache.stats() == {"hits": 3, "misses": 3, "disk_hits": 0, "evictions": 0, "size": 3}
+
+def test_cached_allocation_is_a_copy():
+    pref = Preference([[0, 1], [0, 1]])
+    cache = ResultCache()
+    first = cache.sequential_priority([1, 0], pref)
+    first.allocation[0] = 5
+    assert cache.sequential_priority([1, 0], pref).to_list() == [1, 0]
+
+def test_invalid_calls_are_not_cached():
+    cache = ResultCache()
+    with pytest.raises(ValueError):
+        cache.sequential_priority([0, 0], Preference([[0, 1], [1, 0]]))
+    assert cache.stats()["size"] == 0
+    with pytest.raises(ValueError):
+        cache.sequential_priority([0, 2 ** 40], Preference([[0, 1], [1, 0]]))
+    with pytest.raises(ValueError):
+        cache.top_trading_cycles([-2 ** 31 - 1, 0], Preference([[0, 1], [1, 0]]))
+    with pytest.raises(TypeError):
+        cache.sequential_priority([0, 1], SparsePreference.from_lists([[0], [1]], 2))
+    assert cache.stats()["size"] == 0 and cache.stats()["misses"] == 1 # the rejected keys never reach the cache
+
+def test_lru_eviction():
+    pref = Preference([[0, 1, 2], [0, 1, 2], [0, 1, 2]])
+    cache = ResultCache(maxsize=2)
+    cache.sequential_priority([0, 1, 2], pref)
+    cache.sequential_priority([1, 2, 0], pref)
+    cache.sequential_priority([0, 1, 2], pref) # refresh
+    cache.sequential_priority([2, 0, 1], pref) # evicts [1, 2, 0]
+    cache.sequential_priority([0, 1, 2], pref)
+    assert cache.stats() == {"hits": 2, "misses": 3, "disk_hits": 0, "evictions": 1, "size": 2}
+
+def test_ttl_expiry(monkeypatch):
+    import gamealloc.cache
+    now = [100.0]
+    monkeypatch.setattr(gamealloc.cache.time, "monotonic", lambda: now[0])
+    pref = Preference([[0, 1], [1, 0]])
+    cache = ResultCache(ttl=10)
+    cache.top_trading_cycles([1, 0], pref)
+    now[0] += 5
+    cache.top_trading_cycles([1, 0], pref)
+    now[0] += 10
+    cache.top_trading_cycles([1, 0], pref)
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+def test_disk_tier(tmp_path):
+    pref = Preference([[1, 0], [1, 0]])
+    ResultCache(directory=tmp_path).sequential_priority([1, 0], pref)
+    cache = ResultCache(directory=tmp_path)
+    assert cache.sequential_priority([1, 0], pref).to_list() == [0, 1]
+    assert cache.is_pareto_efficient(Allocation([0, 1]), pref) is True
+    assert cache.stats() == {"hits": 1, "misses": 1, "disk_hits": 1, "evictions": 0, "size": 2}
+
+def test_disk_tier_ttl(tmp_path, monkeypatch):
+    import gamealloc.cache
+    now = [100.0]
+    monkeypatch.setattr(gamealloc.cache.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(gamealloc.cache.time, "time", lambda: now[0])
+    pref = Preference([[1, 0], [1, 0]])
+    ResultCache(ttl=10, directory=tmp_path).sequential_priority([1, 0], pref)
+    cache = ResultCache(ttl=10, directory=tmp_path)
+    now[0] += 8
+    cache.sequential_priority([1, 0], pref) # disk hit, kept in memory for the remaining 2 seconds only
+    now[0] += 3
+    key = ResultCache.key("sequential_priority", pref, [1, 0])
+    assert cache.get(key) == (False, None)
+    assert cache.stats()["disk_hits"] == 1
+    assert not list(tmp_path.rglob("*.json")) # the expired file was deleted
+
+def test_disk_tier_prune(tmp_path, monkeypatch):
+    import gamealloc.cache
+    now = [100.0]
+    monkeypatch.setattr(gamealloc.cache.time, "time", lambda: now[0])
+    cache = ResultCache(ttl=10, directory=tmp_path)
+    pref = Preference([[1, 0], [1, 0]])
+    cache.sequential_priority([1, 0], pref)
+    now[0] += 5
+    cache.sequential_priority([0, 1], pref)
+    (tmp_path / "ab").mkdir()
+    (tmp_path / "ab" / "broken.json").write_text("{")
+    assert cache.prune() == 1 # only the unreadable file
+    now[0] += 6
+    assert cache.prune() == 1
+    assert len(list(tmp_path.rglob("*.json"))) == 1
+    now[0] += 5
+    assert cache.prune() == 1
+    assert not list(tmp_path.rglob("*.json"))
+    assert ResultCache(directory=tmp_path).prune() == 0
+
+def test_invalid_parameters():
+    with pytest.raises(ValueError):
+        ResultCache(maxsize=0)
+    with pytest.raises(ValueError):
+        ResultCache(ttl=0)
@@ -0,0 +1,42 @@
+from gamealloc.cli import process_instance, run, main
+import pytest, io, json, random
+
+def _instances(count, size=5, seed=1):
+    rng = random.Random(seed)
+    for i in range(count):
+        yield json.dumps({"id": i, "prefs": [rng.sample(range(size), size) for _ in range(size)],
+                          "order": rng.sample(range(size), size), "endowment": rng.sample(range(size), size),
+                          "allocation": rng.sample(range(size), size)})
+
+def test_process_instance():
+    res = process_instance('{"id": "x", "prefs": [[1, 0], [0, 1]], "order": [1, 0], "endowment": [0, 1], "allocation": [0, 1]}', lineno=3)
+    assert res == {"line": 3, "id": "x", "sequential_priority": [1, 0], "top_trading_cycles": [1, 0],
+                   "pareto_efficient": False, "improving_cycle": [0, 1]}
+
+def test_process_instance_errors():
+    assert "error" in process_instance("not json")
+    assert "error" in process_instance("[1, 2]")
+    assert "order" in process_instance('{"prefs": [[0]]}', ["sp"])["error"]
+    assert "error" in process_instance('{"prefs": [[0, 0], [1, 0]], "order": [0, 1]}', ["sp"])
+    assert "SparsePreference" in process_instance('{"prefs": [[0, 1], [0, 1]], "allocation": [-1, 0]}', ["pareto"])["error"]
+    res = process_instance('{"prefs": [[0], [1, 0]], "order": [0, 1]}', ["sp"])
+    assert res["sequential_priority"] == [0, 1] and "partial" in res["warnings"][0]
+
+def test_run_in_order():
+    lines = list(_instances(50))
+    serial, parallel = io.StringIO(), io.StringIO()
+    assert run(lines + ["", "oops"], serial, workers=1, chunksize=7) == 1
+    assert run(lines + ["", "oops"], parallel, workers=2, chunksize=3, max_in_flight=2) == 1
+    assert serial.getvalue() == parallel.getvalue()
+    results = [json.loads(line) for line in serial.getvalue().splitlines()]
+    assert [r.get("id") for r in results] == list(range(50)) + [None]
+    assert results[-1]["line"] == 52
+
+def test_main(tmp_path):
+    src, dst = tmp_path / "in.jsonl", tmp_path / "out.ndjson"
+    src.write_text("\n".join(_instances(10)) + "\n")
+    assert main([str(src), "-o", str(dst), "-m", "ttc", "-j", "1"]) == 0
+    results = [json.loads(line) for line in dst.read_text().splitlines()]
+    assert len(results) == 10 and all(set(r) == {"line", "id", "top_trading_cycles"} for r in results)
+    src.write_text('{"prefs": [[0]]}\n')
+    assert main([str(src), "-o", str(dst), "-m", "sp", "-j", "1"]) == 1
@@ -0,0 +1,59 @@
+import pytest, functools
+from gamealloc import fuzz_strategy_proofness, sequential_priority, top_trading_cycles, Preference, Allocation
+
+def boston(preference):
+    # immediate acceptance: in round k every unassigned agent applies to its k-th choice, lower index wins
+    n = len(preference.prefs)
+    allocation, taken = [-1] * n, [False] * n
+    for k in range(n):
+        for agent in range(n):
+            obj = preference.prefs[agent][k]
+            if allocation[agent] == -1 and not taken[obj]:
+                allocation[agent], taken[obj] = obj, True
+    return Allocation(allocation)
+
+def serial_dictatorship(preference):
+    return sequential_priority(list(range(len(preference.prefs))), preference)
+
+def ttc_identity(preference):
+    return top_trading_cycles(list(range(len(preference.prefs))), preference).allocation
+
+def test_fuzz_finds_and_shrinks_boston():
+    result = fuzz_strategy_proofness(boston, time_budget=30, max_workers=1)
+    ce = result.counterexample
+    assert ce is not None and result.instances >= 1
+    n = len(ce.preference.prefs)
+    assert n <= ce.original_size and n == 3 # Boston is strategy-proof with two agents
+    assert sorted(ce.misreport) == list(range(n))
+    truth = ce.preference.prefs[ce.agent]
+    assert truth.index(ce.manipulated) < truth.index(ce.truthful)
+    assert boston(ce.preference).allocation[ce.agent] == ce.truthful
+    misreported = [list(row) for row in ce.preference.prefs]
+    misreported[ce.agent] = ce.misreport
+    assert boston(Preference(misreported)).allocation[ce.agent] == ce.manipulated
+
+def test_fuzz_without_shrink_is_reproducible():
+    first = fuzz_strategy_proofness(boston, time_budget=30, max_workers=1, shrink=False, chunksize=4)
+    second = fuzz_strategy_proofness(boston, time_budget=30, max_workers=1, shrink=False, chunksize=4)
+    assert first.counterexample == second.counterexample
+    assert len(first.counterexample.preference.prefs) == first.counterexample.original_size
+
+def test_fuzz_strategy_proof_mechanisms():
+    for mechanism in (serial_dictatorship, ttc_identity):
+        result = fuzz_strategy_proofness(mechanism, sizes=range(1, 8), max_instances=60, max_workers=1, chunksize=8)
+        assert result.counterexample is None and result.instances == 60
+
+def test_fuzz_process_pool():
+    result = fuzz_strategy_proofness(boston, time_budget=30, max_workers=2, chunksize=4)
+    assert result.counterexample is not None
+    assert len(result.counterexample.preference.prefs) == 3
+    result = fuzz_strategy_proofness(functools.partial(serial_dictatorship), max_instances=20, max_workers=2, chunksize=4)
+    assert result.counterexample is None and result.instances == 20
+
+def test_fuzz_value_error():
+    with pytest.raises(ValueError):
+        fuzz_strategy_proofness(boston, families=["unknown"])
+    with pytest.raises(ValueError):
+        fuzz_strategy_proofness(boston, sizes=[0, 2])
+    with pytest.raises(ValueError):
+        fuzz_strategy_proofness(boston, chunksize=0)
@@ -1,5 +1,7 @@
-import pytest
-from gamealloc import random_objects_preference_instance, random_objects_allocation_instance
+import pytest, random
+from gamealloc import random_objects_preference_instance, random_objects_allocation_instance, Preference
+from gamealloc import uniform_preference_instance, mallows_preference_instance, single_peaked_preference_instance
+from gamealloc import common_value_preference_instance, spawn_seeds
 
 def test_random_objects_preference_instance():
     res = [[[0]], [[1, 0], [0, 1]], [[1, 2, 0], [2, 1, 0], [2, 0, 1]], [[3, 1, 0, 2], [3, 2, 0, 1], [0, 3, 2, 1], [1, 2, 3, 0]]]
@@ -18,3 +20,79 @@ def test_random_objects_allocation_instance():
                 random_objects_allocation_instance(size, 42)
         else:
             assert random_objects_allocation_instance(size, 42) == res[size - 1]
+
+def test_global_random_state_untouched():
+    random.seed(1)
+    expected = random.random()
+    random.seed(1)
+    random_objects_preference_instance(5)
+    uniform_preference_instance(5)
+    assert random.random() == expected
+
+def _is_profile(rows, size, n_agents):
+    return len(rows) == n_agents and all(sorted(row) == list(range(size)) for row in rows)
+
+def test_preference_families():
+    for family in (uniform_preference_instance, single_peaked_preference_instance, common_value_preference_instance,
+                   lambda size, **kw: mallows_preference_instance(size, 0.7, **kw)):
+        rows = family(20, seed=3)
+        assert _is_profile(rows, 20, 20)
+        assert [row.tolist() for row in family(20, seed=3)] == [row.tolist() for row in rows]
+        assert _is_profile(family(20, seed=3, n_agents=5), 20, 5)
+        Preference.from_array(rows)
+        with pytest.raises(ValueError):
+            family(0)
+
+def test_mallows_extremes():
+    assert all(row.tolist() == [2, 0, 1] for row in mallows_preference_instance(3, 0.0, reference=[2, 0, 1]))
+    with pytest.raises(ValueError):
+        mallows_preference_instance(3, 1.5)
+
+def test_single_peaked():
+    axis = [3, 1, 4, 0, 2]
+    for row in single_peaked_preference_instance(5, seed=9, axis=axis):
+        pos = [axis.index(obj) for obj in row] # every prefix is an interval around the peak
+        assert all(max(pos[:k]) - min(pos[:k]) == k - 1 for k in range(1, 6))
+
+def test_common_value_no_noise():
+    rows = common_value_preference_instance(4, noise=0.0, values=[0.1, 0.4, 0.3, 0.2])
+    assert all(row.tolist() == [1, 2, 3, 0] for row in rows)
+
+def test_common_value_shards_share_explicit_values():
+    seeds = spawn_seeds(42, 2)
+    # without values, each shard draws its own common values from its seed
+    drawn = [common_value_preference_instance(6, noise=0.0, seed=s, n_agents=1)[0].tolist() for s in seeds]
+    assert drawn[0] != drawn[1]
+    values = [random.Random(42).gauss(0.0, 1.0) for _ in range(6)]
+    shared = [common_value_preference_instance(6, noise=0.0, seed=s, n_agents=1, values=values)[0].tolist() for s in seeds]
+    assert shared[0] == shared[1] == sorted(range(6), key=values.__getitem__, reverse=True)
+
+def test_spawn_seeds():
+    seeds = spawn_seeds(42, 4)
+    assert len(set(seeds)) == 4
+    assert spawn_seeds(42, 2) == seeds[:2]
+    assert spawn_seeds(43, 4) != seeds
+
+def test_backend_value_error(monkeypatch):
+    with pytest.raises(ValueError):
+        uniform_preference_instance(4, backend="cupy")
+    monkeypatch.setattr("gamealloc.instance.np", None)
+    with pytest.raises(ImportError):
+        common_value_preference_instance(4, backend="numpy")
+
+def test_numpy_backend():
+    pytest.importorskip("numpy")
+    for generate in (uniform_preference_instance, common_value_preference_instance):
+        rows = generate(50, seed=3, n_agents=20, backend="numpy")
+        assert len(rows) == 20 and all(row.typecode == "i" and sorted(row) == list(range(50)) for row in rows)
+        assert rows == generate(50, seed=3, n_agents=20, backend="numpy")
+        Preference.from_array(rows)
+    rows = common_value_preference_instance(5, noise=0.0, values=[1, 5, 3, 2, 4], backend="numpy")
+    assert all(row.tolist() == [1, 4, 2, 3, 0] for row in rows)
+
+def test_families():
+    from gamealloc.instance import FAMILIES
+    from gamealloc import bench, fuzz
+    assert bench.FAMILIES is FAMILIES and fuzz.FAMILIES is FAMILIES
+    for family in FAMILIES.values():
+        assert Preference.from_array(family(6, 1)).validate() and family(6, 1) == family(6, 1)
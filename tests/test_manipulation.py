@@ -1,5 +1,5 @@
-import pytest
-from gamealloc import manipulation, sequential_priority, top_trading_cycles, Preference, Allocation
+import pytest, random
+from gamealloc import manipulation, fast_manipulation, audit_all_agents, sequential_priority, top_trading_cycles, Preference, Allocation
 
 def test_manipulation_base():
     pref = Preference([[0, 1, 2], [2, 0, 1], [2, 1, 0]], ["Alice", "Bob", "Carol"], ["A", "B", "C"])
@@ -10,3 +10,51 @@ def test_manipulation_not_given_arg():
     with pytest.raises(ValueError) as e:
         manipulation(0, Preference([[0]]))
     assert "is given" in str(e.value)
+
+def test_fast_manipulation_matches_manipulation():
+    rng = random.Random(11)
+    for size in range(1, 5):
+        for _ in range(5):
+            pref = Preference([rng.sample(range(size), size) for _ in range(size)])
+            order, endowment = rng.sample(range(size), size), rng.sample(range(size), size)
+            for agent in range(size):
+                slow = manipulation(agent, pref, order=order, endowment=endowment)
+                fast = fast_manipulation(agent, pref, order=order, endowment=endowment)
+                assert {k: set(v) for k, v in fast.items()} == {k: set(v) for k, v in slow.items()}
+
+def test_fast_manipulation_large_market():
+    size = 200
+    rng = random.Random(5)
+    prefs = [rng.sample(range(size), size) for _ in range(size)]
+    pref = Preference([list(p) for p in prefs])
+    res = fast_manipulation("agent_7", pref, order=list(range(size)), endowment=rng.sample(range(size), size))
+    assert res == {"Sequential Priority": {}, "TTC": {}}
+    assert pref.prefs == prefs # preference is not modified
+
+def test_fast_manipulation_not_given_arg():
+    with pytest.raises(ValueError) as e:
+        fast_manipulation(0, Preference([[0]]))
+    assert "is given" in str(e.value)
+
+def test_manipulation_does_not_modify_preference():
+    prefs = [[1, 0, 2], [1, 2, 0], [0, 2, 1]]
+    pref = Preference([list(p) for p in prefs])
+    manipulation(2, pref, order=[0, 1, 2], endowment=[2, 1, 0])
+    assert pref.prefs == prefs
+
+def test_audit_all_agents():
+    rng = random.Random(2)
+    size = 6
+    pref = Preference([rng.sample(range(size), size) for _ in range(size)])
+    order, endowment = rng.sample(range(size), size), rng.sample(range(size), size)
+    seen = []
+    serial = audit_all_agents(pref, order, endowment, max_workers=1, chunksize=4, callback=lambda a, r: seen.append(a))
+    assert sorted(seen) == sorted(pref.agents)
+    assert list(serial) == pref.agents
+    assert serial == {a: manipulation(a, pref, order=order, endowment=endowment) for a in pref.agents}
+    assert audit_all_agents(pref, order, endowment, max_workers=2, chunksize=2) == serial
+
+def test_audit_all_agents_value_error():
+    with pytest.raises(ValueError) as e:
+        audit_all_agents(Preference([[0]]))
+    assert "is given" in str(e.value)
@@ -0,0 +1,79 @@
+from gamealloc import sequential_priority, top_trading_cycles, Preference, TraceEvent, TraceRecorder
+import pytest, random, dataclasses
+
+def test_traced_results_unchanged():
+    rng = random.Random(4)
+    for size in range(1, 20):
+        pref = Preference([rng.sample(range(size), size) for _ in range(size)])
+        perm = rng.sample(range(size), size)
+        recorder = TraceRecorder()
+        assert top_trading_cycles(perm, pref, observer=recorder).to_list() == top_trading_cycles(perm, pref).to_list()
+        assert sequential_priority(perm, pref, observer=recorder).to_list() == sequential_priority(perm, pref).to_list()
+
+def test_ttc_events():
+    pref = Preference([[1, 0, 2], [0, 1, 2], [2, 0, 1]])
+    recorder = TraceRecorder()
+    res = top_trading_cycles([0, 1, 2], pref, observer=recorder)
+    kinds = [e.kind for e in recorder.events]
+    assert kinds == ["cycle", "assign", "assign", "walk", "cycle", "assign", "walk", "round", "finish"]
+    cycles = [e for e in recorder.events if e.kind == "cycle"]
+    assert cycles[0].agents == (0, 1) and cycles[0].objects == (1, 0)
+    assert all(res.allocation[e.agents[0]] == e.objects[0] for e in recorder.events if e.kind == "assign")
+    assert all(e.mechanism == "top_trading_cycles" for e in recorder.events)
+    times = [e.time for e in recorder.events]
+    assert times == sorted(times)
+    summary = recorder.summary()
+    # both cycles are present in the first textbook round, even though they are found by two walks
+    assert [e.round for e in cycles] == [0, 0]
+    assert (summary["rounds"], summary["cycles"], summary["max_cycle_length"], summary["assignments"]) == (1, 2, 2, 3)
+
+def test_ttc_textbook_rounds():
+    # round 0: (0, 1) trade; round 1: 2 keeps object 2 once 0 and 1 are gone; round 2: 3 keeps object 3
+    pref = Preference([[1, 0, 2, 3], [0, 1, 2, 3], [0, 1, 2, 3], [2, 0, 1, 3]])
+    recorder = TraceRecorder()
+    top_trading_cycles([0, 1, 2, 3], pref, observer=recorder)
+    assert [(e.agents, e.round) for e in recorder.events if e.kind == "cycle"] == [((0, 1), 0), ((2,), 1), ((3,), 2)]
+    assert recorder.summary()["rounds"] == 3
+    rounds = [e for e in recorder.events if e.kind == "round"]
+    assert [(e.round, e.agents, e.objects) for e in rounds] == [(0, (0, 1), (1, 0)), (1, (2,), (2,)), (2, (3,), (3,))]
+    assert recorder.events[-4:-1] == rounds and all(e.duration >= 0 for e in rounds)
+    assert sum(e.duration for e in rounds) <= recorder.events[-1].duration
+
+def test_ttc_rounds_match_textbook_ttc():
+    rng = random.Random(9)
+    for size in range(1, 15):
+        prefs = [rng.sample(range(size), size) for _ in range(size)]
+        endowment = rng.sample(range(size), size)
+        recorder = TraceRecorder()
+        top_trading_cycles(endowment, Preference(prefs), observer=recorder)
+        # textbook TTC: every round clears all cycles of the current pointer graph at once
+        owner = {obj: agent for agent, obj in enumerate(endowment)}
+        left, expected, round_ = set(range(size)), {}, 0
+        while left:
+            top = {a: next(o for o in prefs[a] if owner[o] in left) for a in left}
+            for a in left:
+                seen = [a]
+                while owner[top[seen[-1]]] not in seen:
+                    seen.append(owner[top[seen[-1]]])
+                cycle = seen[seen.index(owner[top[seen[-1]]]):]
+                if a in cycle:
+                    expected[a] = round_
+            left -= set(expected)
+            round_ += 1
+        got = {a: e.round for e in recorder.events if e.kind == "assign" for a in e.agents}
+        assert got == expected
+        assert recorder.summary()["rounds"] == round_
+
+def test_sp_events():
+    forwarded = []
+    recorder = TraceRecorder(forward=forwarded.append)
+    sequential_priority([2, 0, 1], Preference([[0, 1, 2], [2, 0, 1], [2, 1, 0]]), observer=recorder)
+    assert forwarded == recorder.events
+    assert [(e.kind, e.round, e.agents, e.objects) for e in recorder.events] == [
+        ("assign", 0, (2,), (2,)), ("assign", 1, (0,), (0,)), ("assign", 2, (1,), (1,)), ("finish", 3, (), ())]
+    assert recorder.summary()["cycles"] == 0
+
+def test_event_is_frozen():
+    event = TraceEvent("finish", "sequential_priority", 0.0, 0)
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        event.kind = "assign"
@@ -1,4 +1,9 @@
-from gamealloc import find_all_pareto_efficient_allocations, is_pareto_efficient, Preference, Allocation
+from gamealloc import find_all_pareto_efficient_allocations, iter_pareto_efficient_allocations, find_improving_cycle, is_pareto_efficient, Preference, Allocation, SparsePreference
+from gamealloc import pareto_improve, ParetoImprovement, ParetoEfficientOutcomes, count_pareto_efficient_allocations
+from gamealloc import uniform_preference_instance, mallows_preference_instance
+from gamealloc.pareto import _build_graph, _has_cycle
+import random
+from collections import Counter
 import pytest, itertools
 
 def test_is_pareto_efficient_base():
@@ -45,4 +50,236 @@ def test_find_all_pareto_efficient_allocations_empty():
 
 def test_find_all_pareto_efficient_allocations_big_n():
     with pytest.warns(UserWarning, match=r"O\(n\!\)"):
-        find_all_pareto_efficient_allocations(Preference([list(range(7)) for _ in range(7)]))
\ No newline at end of file
+        find_all_pareto_efficient_allocations(Preference([list(range(7)) for _ in range(7)]))
+
+def test_find_improving_cycle():
+    prefs = Preference([[0, 1, 2], [1, 0, 2], [2, 0, 1]])
+    assert find_improving_cycle(Allocation([0, 1, 2]), prefs) is None
+    assert find_improving_cycle(Allocation([0, 2, 1]), prefs) == [1, 2]
+    prefs = Preference([[1, 0, 2], [2, 1, 0], [0, 2, 1]])
+    assert find_improving_cycle(Allocation([0, 1, 2]), prefs) == [0, 1, 2]
+
+def test_find_improving_cycle_objects_value_error():
+    alloc = Allocation([0, 1], objects=["A", "C"])
+    with pytest.raises(ValueError) as e:
+        find_improving_cycle(alloc, Preference([[0, 1], [1, 0]], objects=["A", "B"]))
+    assert "objects in preference" in str(e.value)
+
+def test_unassigned_agent_value_error():
+    prefs = Preference([[0, 1, 2]] * 3)
+    for check in (is_pareto_efficient, find_improving_cycle):
+        for allocation in ([-1, 0, 1], [1, 2, -1]):
+            with pytest.raises(ValueError) as e:
+                check(Allocation(allocation), prefs)
+            assert "SparsePreference" in str(e.value)
+    assert is_pareto_efficient(Allocation([-1, 0, 1]), SparsePreference.from_lists([[0, 1, 2]] * 3, 3)) == False
+
+def test_is_pareto_efficient_long_chain():
+    # agent i prefers the object of agent i+1, deeper than the recursion limit
+    size = 1200
+    prefs = [[i + 1, i] + [x for x in range(size) if x not in (i, i + 1)] for i in range(size - 1)]
+    prefs.append(list(range(size - 1, -1, -1)))
+    alloc = Allocation(list(range(size)))
+    assert is_pareto_efficient(alloc, Preference(prefs)) == True
+    prefs[-1] = [0] + prefs[-1][:-1]
+    assert find_improving_cycle(alloc, Preference(prefs)) == list(range(size))
+
+def test_iter_pareto_efficient_allocations_matches_brute_force():
+    rng = random.Random(3)
+    for size in range(1, 6):
+        for _ in range(20):
+            base = rng.sample(range(size), size)
+            pref = Preference([base[:] if rng.random() < 0.5 else rng.sample(range(size), size) for _ in range(size)])
+            res = [x.to_list() for x in iter_pareto_efficient_allocations(pref)]
+            brute = [list(p) for p in itertools.permutations(range(size)) if is_pareto_efficient(Allocation(list(p)), pref)]
+            assert len(res) == len(set(map(tuple, res)))
+            assert sorted(res) == brute
+
+def test_iter_pareto_efficient_allocations_lazy():
+    pref = Preference([list(range(12)) for _ in range(12)]) # 12! Pareto efficient allocations
+    allocations = iter_pareto_efficient_allocations(pref)
+    first = [next(allocations).to_list() for _ in range(3)]
+    assert len(set(map(tuple, first))) == 3
+    assert list(iter_pareto_efficient_allocations(Preference([]))) == []
+
+def test_is_pareto_efficient_array_backed():
+    pref = Preference.from_array([[1, 0, 2], [1, 2, 0], [2, 0, 1]])
+    assert is_pareto_efficient(Allocation([0, 1, 2]), pref) == True
+    assert find_improving_cycle(Allocation([2, 0, 1]), pref) is not None
+
+def test_iter_pareto_efficient_allocations_compact():
+    pref = Preference([[0, 1, 2], [1, 2, 0], [0, 1, 2]], ["Alice", "Bob", "Carol"], ["A", "B", "C"])
+    res = list(iter_pareto_efficient_allocations(pref, compact=True))
+    assert sorted(x.to_list() for x in res) == [x.to_list() for x in find_all_pareto_efficient_allocations(pref)]
+    assert all(x.names is res[0].names for x in res)
+
+def _sparse_dominated(allocation, rows, m):
+    """Brute force: is there an individually rational allocation every agent weakly prefers, one strictly?"""
+    def score(agent, obj):
+        return len(rows[agent]) - rows[agent].index(obj) if obj in rows[agent] else (0 if obj == -1 else -1)
+    current = [score(a, obj) for a, obj in enumerate(allocation)]
+    n = len(rows)
+    for other in itertools.product(*[[-1] + rows[a] for a in range(n)]):
+        taken = [obj for obj in other if obj >= 0]
+        if len(taken) != len(set(taken)):
+            continue
+        scores = [score(a, obj) for a, obj in enumerate(other)]
+        if all(s >= c for s, c in zip(scores, current)) and scores != current:
+            return True
+    return False
+
+def test_sparse_pareto_matches_brute_force():
+    rng = random.Random(8)
+    for _ in range(150):
+        n, m = rng.randint(1, 4), rng.randint(1, 4)
+        rows = [rng.sample(range(m), rng.randint(0, m)) for _ in range(n)]
+        held = rng.sample(range(m), min(n, m, rng.randint(0, n)))
+        allocation = held + [-1] * (n - len(held))
+        rng.shuffle(allocation)
+        pref = SparsePreference.from_lists(rows, m)
+        cycle = find_improving_cycle(Allocation(allocation, None, pref.objects), pref)
+        assert (cycle is not None) == _sparse_dominated(allocation, rows, m)
+
+def test_sparse_improving_cycle():
+    pref = SparsePreference.from_lists([[1, 0], [0, 1], [2]], n_objects=4)
+    assert find_improving_cycle(Allocation([0, 1, 2], None, pref.objects), pref) == [0, 1]
+    assert find_improving_cycle(Allocation([1, 0, 3], None, pref.objects), pref) == [2] # holds an unlisted object
+    assert find_improving_cycle(Allocation([1, 0, -1], None, pref.objects), pref) == [2] # object 2 is free
+    assert is_pareto_efficient(Allocation([1, 0, 2], None, pref.objects), pref)
+    with pytest.raises(ValueError):
+        is_pareto_efficient(Allocation([1, 0]), pref)
+    with pytest.raises(ValueError):
+        is_pareto_efficient(Allocation([1, 0, 2], ["A", "B", "C"], pref.objects), pref)
+
+def test_sparse_sp_is_pareto_efficient():
+    from gamealloc import sequential_priority
+    rng = random.Random(9)
+    n_agents, n_objects = 3000, 500
+    pref = SparsePreference.from_lists((rng.sample(range(n_objects), 10) for _ in range(n_agents)), n_objects)
+    allocation = sequential_priority(rng.sample(range(n_agents), n_agents), pref)
+    assert is_pareto_efficient(allocation, pref)
+
+def _check_repair(before, repair, better_or_equal, strictly_better):
+    after = repair.allocation.to_list()
+    for cycle in repair.cycles:
+        for k, agent in enumerate(cycle):
+            assert after[agent] == before[cycle[(k + 1) % len(cycle)]]
+    for chain in repair.chains:
+        for agent, following in zip(chain, chain[1:]):
+            assert after[agent] == before[following]
+    moved = sorted(a for trade in repair.cycles + repair.chains for a in trade)
+    assert moved == [a for a in range(len(before)) if before[a] != after[a]]
+    assert all(better_or_equal(a, after[a], before[a]) for a in range(len(before)))
+    assert repair.improved == [a for a in range(len(before)) if strictly_better(a, after[a], before[a])]
+
+def test_pareto_improve_dense():
+    rng = random.Random(14)
+    for n in range(1, 9):
+        for _ in range(20):
+            prefs = [rng.sample(range(n), n) for _ in range(n)]
+            before = rng.sample(range(n), n)
+            preference = Preference(prefs)
+            repair = pareto_improve(Allocation(before), preference)
+            assert isinstance(repair, ParetoImprovement)
+            assert is_pareto_efficient(repair.allocation, preference)
+            assert repair.chains == []
+            rank = preference.rank_matrix()
+            _check_repair(before, repair, lambda a, new, old: rank[a][new] <= rank[a][old],
+                          lambda a, new, old: rank[a][new] < rank[a][old])
+
+def test_pareto_improve_dense_unassigned_value_error():
+    preference = Preference([[0, 1, 2]] * 3)
+    for allocation in ([-1, 0, 1], [1, 2, -1]):
+        with pytest.raises(ValueError) as e:
+            pareto_improve(Allocation(allocation), preference)
+        assert "SparsePreference" in str(e.value)
+    repair = pareto_improve(Allocation([1, 2, -1]), SparsePreference.from_lists([[0, 1, 2]] * 3, 3))
+    assert repair.allocation.to_list() == [0, 1, 2] and repair.improved == [0, 1, 2] # a chain through the free object 0
+
+def test_pareto_improve_efficient_is_unchanged():
+    preference = Preference([[0, 1, 2], [1, 0, 2], [2, 0, 1]])
+    repair = pareto_improve(Allocation([0, 1, 2]), preference)
+    assert repair.allocation.to_list() == [0, 1, 2]
+    assert repair.cycles == repair.chains == repair.improved == []
+
+def test_pareto_improve_sparse():
+    rng = random.Random(15)
+    for _ in range(300):
+        n, m = rng.randint(1, 6), rng.randint(1, 6)
+        rows = [rng.sample(range(m), rng.randint(0, m)) for _ in range(n)]
+        held = rng.sample(range(m), min(n, m, rng.randint(0, n)))
+        before = held + [-1] * (n - len(held))
+        rng.shuffle(before)
+        pref = SparsePreference.from_lists(rows, m)
+        repair = pareto_improve(Allocation(before, None, pref.objects), pref)
+        assert is_pareto_efficient(repair.allocation, pref)
+        def score(a, obj):
+            return len(rows[a]) - rows[a].index(obj) if obj in rows[a] else (0 if obj == -1 else -1)
+        _check_repair(before, repair, lambda a, new, old: score(a, new) >= score(a, old),
+                      lambda a, new, old: score(a, new) > score(a, old))
+
+def test_pareto_improve_sparse_chain():
+    pref = SparsePreference.from_lists([[1, 0], [2, 1], [3]], n_objects=4)
+    repair = pareto_improve(Allocation([0, 1, 2], None, pref.objects), pref)
+    assert repair.allocation.to_list() == [1, 2, 3]
+    assert repair.chains == [[0, 1, 2]] and repair.cycles == [] and repair.improved == [0, 1, 2]
+
+def test_pareto_improve_large_market():
+    rng = random.Random(16)
+    n_agents, n_objects = 30000, 30000
+    pref = SparsePreference.from_lists((rng.sample(range(n_objects), 10) for _ in range(n_agents)), n_objects)
+    before = [pref.row(a)[-1] for a in range(n_agents)] # everyone holds its last choice, when it is free
+    seen = set()
+    before = [obj if not (obj in seen or seen.add(obj)) else -1 for obj in before]
+    repair = pareto_improve(Allocation(before, None, pref.objects), pref)
+    assert is_pareto_efficient(repair.allocation, pref)
+    assert len(repair.improved) > n_agents // 2
+
+def test_agent_graph():
+    graph = _build_graph(Allocation([1, 0, 2]), Preference([[1, 2, 0], [2, 0, 1], [0, 1, 2]]))
+    assert graph == [[], [2], [1, 0]]
+    assert _has_cycle(graph)
+    assert not _has_cycle(_build_graph(Allocation([0, 1, 2]), Preference([[0, 1, 2], [1, 0, 2], [2, 0, 1]])))
+
+def test_count_matches_enumeration():
+    for n in range(1, 8):
+        for seed in range(3):
+            preference = Preference.from_array(uniform_preference_instance(n, seed=seed))
+            allocations = [a.to_list() for a in iter_pareto_efficient_allocations(preference)]
+            outcomes = ParetoEfficientOutcomes(preference)
+            assert outcomes.count() == count_pareto_efficient_allocations(preference) == len(allocations)
+            assert [outcomes.unrank(i).to_list() for i in range(len(allocations))] == allocations
+
+def test_count_without_agents():
+    outcomes = ParetoEfficientOutcomes(Preference([]))
+    assert outcomes.count() == 0
+    with pytest.raises(IndexError):
+        outcomes.sample()
+
+def test_unrank_and_sample():
+    preference = Preference.from_array(mallows_preference_instance(12, 0.5, seed=3))
+    outcomes = ParetoEfficientOutcomes(preference)
+    count = outcomes.count()
+    assert count > 1000
+    for index in (0, 1, count // 2, count - 1):
+        assert is_pareto_efficient(outcomes.unrank(index), preference)
+    assert outcomes.unrank(7, compact=True).to_list() == outcomes.unrank(7).to_list()
+    assert outcomes.sample(seed=1) == outcomes.sample(seed=1)
+    with pytest.raises(IndexError):
+        outcomes.unrank(count)
+    with pytest.raises(IndexError):
+        outcomes.unrank(-1)
+
+def test_sample_is_uniform():
+    preference = Preference([[0, 1, 2], [1, 2, 0], [0, 1, 2]])
+    outcomes = ParetoEfficientOutcomes(preference)
+    seen = Counter(tuple(outcomes.sample(seed).to_list()) for seed in range(4000))
+    assert len(seen) == 4 and min(seen.values()) > 850
+
+def test_count_type_error():
+    with pytest.raises(TypeError):
+        ParetoEfficientOutcomes([[0, 1], [1, 0]])
+
+def test_count_warns_for_large_markets():
+    with pytest.warns(UserWarning, match="n > 16"):
+        ParetoEfficientOutcomes(Preference([list(range(17))] * 17))
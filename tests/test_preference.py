@@ -1,5 +1,6 @@
-from gamealloc import Preference
+from gamealloc import Preference, SparsePreference
 import pytest
+from array import array
 
 def test_preferences_value_error():
     with pytest.raises(ValueError):
@@ -84,4 +85,69 @@ def test_validate():
         pref.prefs[0] = [0, 0, 1]
         pref.validate()
     assert "should be different" in str(e.value)
-    
\ No newline at end of file
+    
+def test_from_array():
+    pref = Preference.from_array([[0, 2, 1], (1, 0, 2), array("i", [2, 0, 1])], ["A", "B", "C"])
+    assert all(isinstance(row, array) and row.typecode == "i" for row in pref.prefs)
+    assert pref.agents == ["A", "B", "C"]
+    assert [row.tolist() for row in pref.to_array()] == [[0, 2, 1], [1, 0, 2], [2, 0, 1]]
+    assert [row.tolist() for row in pref.rank_matrix()] == [[0, 2, 1], [1, 0, 2], [1, 2, 0]]
+    assert Preference.from_array([]).prefs == []
+
+def test_from_array_error():
+    with pytest.raises(TypeError):
+        Preference.from_array([[0, 1.5], [1, 0]])
+    with pytest.raises(ValueError):
+        Preference.from_array([[0, 0], [1, 0]])
+
+def test_rank_matrix_cache():
+    pref = Preference([[0, 1], [1, 0]])
+    assert [row.tolist() for row in pref.rank_matrix()] == [[0, 1], [1, 0]]
+    pref.prefs[0] = [1, 0]
+    pref.validate()
+    assert [row.tolist() for row in pref.rank_matrix()] == [[1, 0], [1, 0]]
+
+def test_from_validated():
+    prefs = [[0, 1], [1, 0]]
+    pref = Preference.from_validated(prefs, ["A", "B"])
+    assert pref.prefs is prefs
+    assert pref == Preference([[0, 1], [1, 0]], ["A", "B"])
+    assert Preference.from_validated([[0]]).objects == ["object_0"]
+
+def test_partial_names_not_shared():
+    agents = ["A"]
+    with pytest.warns(UserWarning, match="agent_i"):
+        pref = Preference([[0, 1], [1, 0]], agents)
+    assert agents == ["A"]
+    assert pref.agents == ["A", "agent_1"]
+
+def test_sparse_preference():
+    pref = SparsePreference.from_lists([[2, 0], [], [1]], agents=["A", "B", "C"])
+    assert pref.n_agents == 3 and pref.n_objects == 3
+    assert pref.indptr == array("q", [0, 2, 2, 3]) and pref.indices == array("i", [2, 0, 1])
+    assert pref.row(0) == array("i", [2, 0]) and pref.to_lists() == [[2, 0], [], [1]]
+    assert pref.objects == ["object_0", "object_1", "object_2"]
+    assert SparsePreference.from_lists([[0]], n_objects=5).objects[-1] == "object_4"
+    assert SparsePreference.from_lists([]).n_agents == 0
+
+def test_sparse_from_preference():
+    dense = Preference([[0, 1, 2], [2, 1, 0], [1, 0, 2]], ["A", "B", "C"], ["a", "b", "c"])
+    pref = SparsePreference.from_preference(dense, 2)
+    assert pref.to_lists() == [[0, 1], [2, 1], [1, 0]]
+    assert pref.agents == dense.agents and pref.objects == dense.objects
+
+def test_sparse_preference_errors():
+    with pytest.raises(ValueError):
+        SparsePreference([0, 2], [0, 0], 2)
+    with pytest.raises(ValueError):
+        SparsePreference([0, 1], [2], 2)
+    with pytest.raises(ValueError):
+        SparsePreference([0, 2, 1], [0, 1], 2)
+    with pytest.raises(ValueError):
+        SparsePreference([1, 1], [0], 1)
+    with pytest.raises(TypeError):
+        SparsePreference([0, 1], [0.5], 1)
+    with pytest.raises(ValueError):
+        SparsePreference.from_lists([[0]], agents=["A", "B"])
+    with pytest.raises(ValueError):
+        SparsePreference.from_lists([[0], [0]], agents=["A", "A"])
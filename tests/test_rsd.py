@@ -0,0 +1,72 @@
+from gamealloc import rsd_monte_carlo, rsd_exact, sequential_priority, Preference
+import pytest, itertools, random
+
+def _exact(pref):
+    n = len(pref.prefs)
+    orders = list(itertools.permutations(range(n)))
+    prob = [[0.0] * n for _ in range(n)]
+    for order in orders:
+        for agent, obj in enumerate(sequential_priority(list(order), pref).to_list()):
+            prob[agent][obj] += 1 / len(orders)
+    return prob
+
+def test_rsd_monte_carlo():
+    pref = Preference([[0, 1, 2, 3], [0, 2, 1, 3], [1, 0, 3, 2], [0, 1, 2, 3]])
+    res = rsd_monte_carlo(pref, samples=20000, batch_size=3000)
+    assert res.samples == 20000
+    exact = _exact(pref)
+    for i in range(4):
+        assert sum(res.probabilities[i]) == pytest.approx(1.0)
+        for obj in range(4):
+            assert abs(res.probabilities[i][obj] - exact[i][obj]) <= res.half_width[i][obj] * 1.5 + 1e-9
+    lo, hi = res.interval("agent_0", "object_0")
+    assert lo <= res.probability(0, 0) <= hi
+    # reproducible
+    assert rsd_monte_carlo(pref, samples=2000, batch_size=500).probabilities == rsd_monte_carlo(pref, samples=2000, batch_size=500).probabilities
+
+def test_rsd_monte_carlo_target_error():
+    pref = Preference([[0, 1, 2], [0, 1, 2], [1, 0, 2]])
+    res = rsd_monte_carlo(pref, samples=100000, target_error=0.02, batch_size=500)
+    assert res.samples < 100000
+    assert res.max_half_width() <= 0.02
+
+def test_rsd_monte_carlo_wilson_interval():
+    # every estimate is 0 or 1: a normal-approximation half-width would be 0 and stop after the first batch
+    pref = Preference([[0, 1], [1, 0]])
+    res = rsd_monte_carlo(pref, samples=100000, target_error=0.01, batch_size=10)
+    assert 10 < res.samples < 100000
+    assert res.probability(0, 1) == 0.0 and 0 < res.half_width[0][1] <= 0.01
+    lo, hi = res.interval(0, 1)
+    assert lo == 0.0 and hi > 0.0
+    lo, hi = res.interval(0, 0)
+    assert lo < 1.0 and hi == pytest.approx(1.0)
+
+def test_rsd_monte_carlo_parallel():
+    pref = Preference([[0, 1, 2], [0, 1, 2], [1, 0, 2]])
+    serial = rsd_monte_carlo(pref, samples=3000, batch_size=1000)
+    assert rsd_monte_carlo(pref, samples=3000, batch_size=1000, max_workers=2).probabilities == serial.probabilities
+
+def test_rsd_monte_carlo_error():
+    with pytest.raises(TypeError):
+        rsd_monte_carlo([[0]])
+    with pytest.raises(ValueError):
+        rsd_monte_carlo(Preference([[0]]), samples=0)
+    with pytest.raises(ValueError):
+        rsd_monte_carlo(Preference([[0]]), confidence=1.0)
+
+def test_rsd_exact_matches_brute_force():
+    rng = random.Random(6)
+    for size in range(0, 6):
+        for _ in range(3):
+            pref = Preference([rng.sample(range(size), size) for _ in range(size)])
+            res = rsd_exact(pref)
+            assert res.samples == 0 and res.max_half_width() == 0.0
+            for row, expected in zip(res.probabilities, _exact(pref)):
+                assert row == pytest.approx(expected)
+
+def test_rsd_exact_within_monte_carlo_interval():
+    pref = Preference([[0, 1, 2, 3], [0, 2, 1, 3], [1, 0, 3, 2], [0, 1, 2, 3]])
+    exact, sampled = rsd_exact(pref), rsd_monte_carlo(pref, samples=20000)
+    for i in range(4):
+        for obj in range(4):
+            assert abs(exact.probability(i, obj) - sampled.probability(i, obj)) <= sampled.half_width[i][obj] * 1.5 + 1e-9
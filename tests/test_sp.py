@@ -1,5 +1,5 @@
-from gamealloc import sequential_priority, Preference
-import pytest, itertools
+from gamealloc import sequential_priority, sequential_priority_batch, IncrementalSP, Preference, SparsePreference, ManyToOneAllocation
+import pytest, itertools, random
 
 def test_base_case():
     # Given Agents' and Objects' name
@@ -112,3 +112,105 @@ def test_incorrect_order_value_error():
     with pytest.raises(ValueError):
         # len(order) should be 2 and contains only 0 and 1
         sequential_priority([1,0,0], pref)
+
+def test_batch():
+    pref = Preference(prefs=[[1,0,2], [0,1,2], [1,2,0]])
+    orders = list(itertools.permutations(range(3)))
+    res = sequential_priority_batch(orders, pref)
+    assert [r.tolist() for r in res] == [sequential_priority(order, pref).to_list() for order in orders]
+    assert sequential_priority_batch([], pref) == []
+
+def test_batch_error():
+    pref = Preference(prefs=[[0,1], [1,0]])
+    with pytest.raises(TypeError):
+        sequential_priority_batch([[0, 1], [1.0, 0]], pref)
+    with pytest.raises(ValueError):
+        sequential_priority_batch([[0, 1], [0]], pref)
+    with pytest.raises(TypeError):
+        sequential_priority_batch([[0, 1]], [[0, 1], [1, 0]])
+
+def test_array_backed_preference():
+    prefs = [[1,0,2], [0,1,2], [1,2,0]]
+    assert sequential_priority([2,1,0], Preference.from_array(prefs)).to_list() == [2,0,1]
+
+def test_incremental_sp():
+    rng = random.Random(8)
+    size = 8
+    prefs = [rng.sample(range(size), size) for _ in range(size)]
+    order = rng.sample(range(size), size)
+    pref = Preference([list(p) for p in prefs])
+    sp = IncrementalSP(order, pref)
+    assert sp.truthful == sequential_priority(order, pref).to_list()
+    for agent in range(size):
+        for _ in range(5):
+            report = rng.sample(range(size), size)
+            misreported = Preference([report if i == agent else list(p) for i, p in enumerate(prefs)])
+            expected = sequential_priority(order, misreported).to_list()
+            assert sp.evaluate(agent, report) == expected
+            assert sp.outcome(agent, report) == expected[agent]
+        assert sorted(sp.available(agent)) == sorted(o for o in range(size) if o not in [sp.truthful[a] for a in order[:order.index(agent)]])
+    assert pref.prefs == prefs
+
+def test_incremental_sp_error():
+    with pytest.raises(ValueError):
+        IncrementalSP([0], Preference([[0, 1], [1, 0]]))
+    with pytest.raises(TypeError):
+        IncrementalSP([0, 1], [[0, 1], [1, 0]])
+
+def test_sparse_truncated_lists():
+    pref = SparsePreference.from_lists([[1, 0], [1], [1, 2], []], n_objects=3)
+    assert sequential_priority([0, 1, 2, 3], pref).to_list() == [1, -1, 2, -1]
+    assert sequential_priority([1, 0, 2, 3], pref).to_list() == [0, 1, 2, -1]
+    with pytest.raises(ValueError):
+        sequential_priority([0, 1, 2], pref)
+    with pytest.raises(ValueError):
+        sequential_priority([0, 1, 2, 3], pref, observer=print)
+
+def test_sparse_matches_dense():
+    rng = random.Random(5)
+    for n in range(1, 8):
+        rows = [rng.sample(range(n), n) for _ in range(n)]
+        order = rng.sample(range(n), n)
+        sparse = SparsePreference.from_lists(rows)
+        assert sequential_priority(order, sparse).to_list() == sequential_priority(order, Preference(rows)).to_list()
+
+def test_sparse_large_market():
+    rng = random.Random(0)
+    n_agents, n_objects, k = 50000, 5000, 10
+    pref = SparsePreference.from_lists((rng.sample(range(n_objects), k) for _ in range(n_agents)), n_objects)
+    allocation = sequential_priority(list(range(n_agents)), pref).to_list()
+    assigned = [obj for obj in allocation if obj >= 0]
+    assert len(assigned) == len(set(assigned)) <= n_objects
+
+def test_capacities():
+    pref = SparsePreference.from_lists([[0, 1], [0, 1], [0], [1, 0]], n_objects=2, objects=["A", "B"])
+    allocation = sequential_priority([0, 1, 2, 3], pref, capacities=[2, 1])
+    assert isinstance(allocation, ManyToOneAllocation)
+    assert allocation.to_list() == [0, 0, -1, 1]
+    assert allocation.to_groups() == {"A": ["agent_0", "agent_1"], "B": ["agent_3"]}
+    dense = Preference([[1, 0], [0, 1]])
+    assert sequential_priority([0, 1], dense, capacities=[0, 2]).to_list() == [1, 1]
+    with pytest.raises(ValueError):
+        sequential_priority([0, 1, 2, 3], pref, capacities=[1])
+    with pytest.raises(ValueError):
+        sequential_priority([0, 1, 2, 3], pref, capacities=[-1, 1])
+    with pytest.raises(TypeError):
+        sequential_priority([0, 1, 2, 3], pref, capacities=[1.5, 1])
+
+def test_capacities_match_seat_copies():
+    rng = random.Random(10)
+    for _ in range(100):
+        n, m = rng.randint(1, 8), rng.randint(1, 4)
+        capacities = [rng.randint(0, 3) for _ in range(m)]
+        rows = [rng.sample(range(m), rng.randint(0, m)) for _ in range(n)]
+        order = rng.sample(range(n), n)
+        seat_of = [obj for obj in range(m) for _ in range(capacities[obj])] # one object per seat
+        seat_rows = [[seat for obj in row for seat, o in enumerate(seat_of) if o == obj] for row in rows]
+        copies = sequential_priority(order, SparsePreference.from_lists(seat_rows, len(seat_of))).to_list()
+        allocation = sequential_priority(order, SparsePreference.from_lists(rows, m), capacities=capacities)
+        assert allocation.to_list() == [seat_of[seat] if seat >= 0 else -1 for seat in copies]
+        assert all(r >= 0 for r in allocation.remaining())
+
+def test_capacities_large_seats():
+    pref = SparsePreference.from_lists([[0]] * 1000, n_objects=1)
+    assert sequential_priority(list(range(1000)), pref, capacities=[10 ** 9]).load() == [1000]
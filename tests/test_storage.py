@@ -0,0 +1,191 @@
+from gamealloc import save_preference, load_preference, save_allocations, load_allocations
+from gamealloc import Preference, Allocation, CompactAllocation, NameTable, sequential_priority, top_trading_cycles, is_pareto_efficient
+from gamealloc import uniform_preference_instance, iter_pareto_efficient_allocations, fast_manipulation
+from gamealloc import SharedPreference, PreferenceHandle, attach_preference, detach_preference, audit_all_agents, rsd_monte_carlo
+from gamealloc.storage import _write, PREFERENCE
+from concurrent.futures import ProcessPoolExecutor
+import pytest, pickle, gc, os
+
+def test_preference_roundtrip(tmp_path):
+    path = tmp_path / "profile.gamealloc"
+    pref = Preference.from_array(uniform_preference_instance(30, seed=2), [f"a{i}" for i in range(30)])
+    save_preference(pref, path)
+    for use_mmap in (True, False):
+        loaded = load_preference(path, mmap=use_mmap)
+        assert [list(row) for row in loaded.prefs] == [list(row) for row in pref.prefs]
+        assert loaded.agents == pref.agents and loaded.objects == pref.objects
+        order = list(range(30))
+        assert sequential_priority(order, loaded).to_list() == sequential_priority(order, pref).to_list()
+        assert top_trading_cycles(order, loaded).to_list() == top_trading_cycles(order, pref).to_list()
+        assert is_pareto_efficient(sequential_priority(order, loaded), loaded)
+        assert fast_manipulation(3, loaded, order=order, endowment=order) == {"Sequential Priority": {}, "TTC": {}}
+
+def test_preference_mmap_is_read_only(tmp_path):
+    path = tmp_path / "profile.gamealloc"
+    save_preference(Preference([[0, 1], [1, 0]]), path)
+    loaded = load_preference(path)
+    assert isinstance(loaded.prefs[0], memoryview)
+    with pytest.raises(TypeError):
+        loaded.prefs[0][0] = 1
+
+def test_loaded_preference_validates(tmp_path):
+    path = tmp_path / "profile.gamealloc"
+    save_preference(Preference([[0, 1, 2], [2, 0, 1], [1, 2, 0]]), path)
+    for use_mmap in (True, False):
+        loaded = load_preference(path, mmap=use_mmap)
+        assert loaded.validate() is loaded
+
+def test_corrupt_preference_file(tmp_path):
+    path = tmp_path / "profile.gamealloc"
+    save_preference(Preference([[0, 1], [1, 0]]), path)
+    data = bytearray(path.read_bytes())
+    data[-4:] = (7).to_bytes(4, "little")
+    path.write_bytes(bytes(data))
+    for use_mmap in (True, False):
+        with pytest.raises(ValueError):
+            load_preference(path, mmap=use_mmap, validate=True)
+    data[-4:] = (1).to_bytes(4, "little") # duplicate
+    path.write_bytes(bytes(data))
+    with pytest.raises(ValueError):
+        load_preference(path, validate=True)
+    with pytest.raises(ValueError):
+        load_preference(path).validate()
+
+def test_load_preference_does_not_scan_rows(tmp_path, monkeypatch):
+    path = tmp_path / "profile.gamealloc"
+    save_preference(Preference([[0, 1], [1, 0]]), path)
+    data = bytearray(path.read_bytes())
+    data[-4:] = (7).to_bytes(4, "little")
+    path.write_bytes(bytes(data))
+    monkeypatch.setattr(Preference, "validate", lambda self: pytest.fail("rows were scanned"))
+    for use_mmap in (True, False):
+        assert load_preference(path, mmap=use_mmap).prefs[1].tolist() == [1, 7] # only the header and file size are checked
+    _write(path, PREFERENCE, [[0, 1]], 1, 2, ["A"], ["A", "B"])
+    with pytest.raises(ValueError) as e:
+        load_preference(path)
+    assert "inconsistent header" in str(e.value)
+
+def test_failed_save_keeps_previous_file(tmp_path):
+    path = tmp_path / "allocations.gamealloc"
+    save_allocations([[0, 1]], path)
+    with pytest.raises(ValueError):
+        save_allocations([[1, 0], [0, 1, 2]], path)
+    assert [a.to_list() for a in load_allocations(path)] == [[0, 1]]
+    assert [p.name for p in tmp_path.iterdir()] == ["allocations.gamealloc"]
+
+def test_empty_preference(tmp_path):
+    path = tmp_path / "empty.gamealloc"
+    save_preference(Preference([]), path)
+    assert load_preference(path).prefs == []
+
+def test_allocations_roundtrip(tmp_path):
+    path = tmp_path / "allocations.gamealloc"
+    pref = Preference([[0, 1, 2], [1, 2, 0], [0, 1, 2]], ["Alice", "Bob", "Carol"], ["A", "B", "C"])
+    allocations = list(iter_pareto_efficient_allocations(pref, compact=True))
+    save_allocations(allocations, path)
+    for use_mmap in (True, False):
+        loaded = load_allocations(path, mmap=use_mmap)
+        assert loaded == allocations
+        assert all(a.names is pref.name_table() for a in loaded)
+    save_allocations([Allocation([1, 0]), [0, 1]], path)
+    assert [a.to_dict() for a in load_allocations(path)] == [{"agent_0": "object_1", "agent_1": "object_0"}, {"agent_0": "object_0", "agent_1": "object_1"}]
+
+def test_invalid_file(tmp_path):
+    path = tmp_path / "bad.gamealloc"
+    path.write_bytes(b"not a gamealloc file at all")
+    with pytest.raises(ValueError):
+        load_preference(path)
+    save_allocations([[0, 1]], path)
+    with pytest.raises(ValueError) as e:
+        load_preference(path)
+    assert "preference profile" in str(e.value)
+    path.write_bytes(path.read_bytes()[:-2])
+    with pytest.raises(ValueError) as e:
+        load_allocations(path)
+    assert "truncated" in str(e.value)
+    with pytest.raises(ValueError):
+        save_allocations([[0, 1], [0]], path)
+
+def _attached_rows(handle):
+    return [list(row) for row in attach_preference(handle).prefs]
+
+def test_shared_preference(tmp_path):
+    pref = Preference.from_array(uniform_preference_instance(40, seed=4), [f"a{i}" for i in range(40)])
+    for path in (None, tmp_path / "shared.gamealloc"):
+        with SharedPreference(pref, path) as shared:
+            assert len(pickle.dumps(shared.handle)) < 200
+            attached = attach_preference(shared.handle)
+            assert attach_preference(shared.handle) is attached
+            assert [list(row) for row in attached.prefs] == [list(row) for row in pref.prefs]
+            assert attached.agents == pref.agents and attached.objects == pref.objects
+            assert isinstance(attached.prefs[0], memoryview)
+            with pytest.raises(TypeError):
+                attached.prefs[0][0] = 1
+            order = list(range(40))
+            assert sequential_priority(order, attached).to_list() == sequential_priority(order, pref).to_list()
+            with ProcessPoolExecutor(max_workers=2) as executor:
+                assert executor.submit(_attached_rows, shared.handle).result() == [list(row) for row in pref.prefs]
+
+def test_attach_does_not_scan_rows(tmp_path, monkeypatch):
+    pref = Preference.from_array(uniform_preference_instance(20, seed=5))
+    monkeypatch.setattr(Preference, "validate", lambda self: pytest.fail("rows were scanned"))
+    for path in (None, tmp_path / "shared.gamealloc"):
+        with SharedPreference(pref, path) as shared:
+            assert attach_preference(shared.handle).prefs[3].tolist() == list(pref.prefs[3])
+    data = bytearray(path.read_bytes())
+    data[-4:] = (99).to_bytes(4, "little") # an out-of-range id is not noticed, the rows are never read
+    path.write_bytes(bytes(data))
+    handle = PreferenceHandle(os.fspath(path), "file")
+    assert attach_preference(handle).prefs[19][19] == 99
+    detach_preference(handle)
+
+def test_shared_preference_close():
+    shared = SharedPreference(Preference([[0, 1], [1, 0]]))
+    handle = shared.handle
+    shared.close()
+    shared.close()
+    with pytest.raises(FileNotFoundError):
+        attach_preference(handle)
+
+def _mapped(name):
+    with open("/proc/self/maps") as f:
+        return name in f.read()
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/maps"), reason="needs /proc/self/maps")
+def test_shared_preference_is_unmapped():
+    pref = Preference([[0, 1, 2], [2, 0, 1], [1, 2, 0]])
+    with SharedPreference(pref) as shared:
+        name = shared.handle.name
+        attached = attach_preference(shared.handle)
+        assert attached.validate() is attached
+        assert _mapped(name)
+        del attached
+    gc.collect()
+    assert not _mapped(name)
+    shared = SharedPreference(pref)
+    name = shared.handle.name
+    attached = attach_preference(shared.handle)
+    assert detach_preference(shared.handle) and not detach_preference(shared.handle)
+    assert attach_preference(shared.handle) is not attached
+    shared.close()
+    assert [list(row) for row in attached.prefs] == [list(row) for row in pref.prefs] # rows still alive keep the mapping
+    del attached
+    gc.collect()
+    assert not _mapped(name)
+
+def test_shared_preference_errors():
+    with pytest.raises(TypeError):
+        SharedPreference([[0, 1], [1, 0]])
+    with pytest.raises(TypeError):
+        attach_preference("name")
+    with pytest.raises(ValueError):
+        attach_preference(PreferenceHandle("name", "tcp"))
+
+def test_shared_preference_workflows():
+    pref = Preference.from_array(uniform_preference_instance(12, seed=6))
+    order = list(range(12))
+    assert audit_all_agents(pref, order=order, endowment=order[::-1], max_workers=2, share=True) == \
+        audit_all_agents(pref, order=order, endowment=order[::-1], max_workers=1)
+    shared = rsd_monte_carlo(pref, samples=2000, batch_size=500, max_workers=2, share=True)
+    copied = rsd_monte_carlo(pref, samples=2000, batch_size=500, max_workers=2)
+    assert shared.probabilities == copied.probabilities
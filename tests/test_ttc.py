@@ -1,5 +1,5 @@
-from gamealloc import top_trading_cycles, Preference
-import pytest, itertools
+from gamealloc import top_trading_cycles, top_trading_cycles_batch, Preference, SparsePreference, ManyToOneAllocation
+import pytest, itertools, random
 
 def test_base_case():
     # Given Agents' and Objects' name
@@ -62,4 +62,155 @@ def test_endowment_value_error():
 def test_endowment_duplicate():
     with pytest.raises(ValueError) as e:
         top_trading_cycles([1, 1], Preference([[0, 1], [1, 0]]))
-    assert "multi-agent" in str(e.value)
\ No newline at end of file
+    assert "multi-agent" in str(e.value)
+
+def _reference_ttc(endowment, prefs):
+    # one cycle per round, as in the original implementation
+    n = len(endowment)
+    allocation = [None] * n
+    remaining = set(range(n))
+    while remaining:
+        top = {i: next(o for o in prefs[i] if endowment.index(o) in remaining) for i in remaining}
+        cycle, node = [], min(remaining)
+        while node not in cycle:
+            cycle.append(node)
+            node = endowment.index(top[node])
+        for agent in cycle[cycle.index(node):]:
+            allocation[agent] = top[agent]
+            remaining.remove(agent)
+    return allocation
+
+def test_engine_matches_reference():
+    from gamealloc.ttc import _ttc_engine
+    rng = random.Random(7)
+    for size in range(1, 30):
+        prefs = [rng.sample(range(size), size) for _ in range(size)]
+        endowment = rng.sample(range(size), size)
+        assert _ttc_engine(endowment, prefs) == _reference_ttc(endowment, prefs)
+        assert top_trading_cycles(endowment, Preference(prefs)).to_list() == _reference_ttc(endowment, prefs)
+
+def test_engine_long_cycle():
+    from gamealloc.ttc import _ttc_engine
+    size = 5000 # a single cycle through every agent
+    prefs = [[(i + 1) % size] for i in range(size)]
+    assert _ttc_engine(list(range(size)), prefs) == [(i + 1) % size for i in range(size)]
+
+def test_batch():
+    pref = Preference(prefs=[[1,0,2], [0,1,2], [1,2,0]])
+    endowments = list(itertools.permutations(range(3)))
+    res = top_trading_cycles_batch(endowments, pref)
+    assert [r.tolist() for r in res] == [top_trading_cycles(e, pref).to_list() for e in endowments]
+
+def test_batch_error():
+    pref = Preference(prefs=[[0,1], [1,0]])
+    with pytest.raises(TypeError):
+        top_trading_cycles_batch([[0, 1], ["1", 0]], pref)
+    with pytest.raises(ValueError):
+        top_trading_cycles_batch([[1, 1]], pref)
+
+def test_array_backed_preference():
+    prefs = [[1,0,2], [0,1,2], [1,2,0]]
+    assert top_trading_cycles([2,1,0], Preference.from_array(prefs)).to_list() == top_trading_cycles([2,1,0], Preference(prefs)).to_list()
+
+def test_sparse_truncated_lists():
+    # agent 3 holds nothing; object 3 is held by nobody; agent 2 lists nothing and keeps its endowment
+    pref = SparsePreference.from_lists([[1, 3], [0], [], [0, 1]], n_objects=4)
+    assert top_trading_cycles([0, 1, 2, -1], pref).to_list() == [1, 0, 2, -1]
+    assert top_trading_cycles([2, 1, 0, -1], pref).to_list() == [2, 1, 0, -1] # agent 2 keeps object 0, so agent 1 keeps 1
+    with pytest.raises(ValueError):
+        top_trading_cycles([0, 0, 2, -1], pref)
+    with pytest.raises(ValueError):
+        top_trading_cycles([0, 1, 2, 4], pref)
+    with pytest.raises(ValueError):
+        top_trading_cycles([0, 1, 2], pref)
+
+def test_sparse_matches_dense():
+    rng = random.Random(6)
+    for n in range(1, 8):
+        for _ in range(20):
+            rows = [rng.sample(range(n), n) for _ in range(n)]
+            endowment = rng.sample(range(n), n)
+            sparse = SparsePreference.from_lists(rows)
+            assert top_trading_cycles(endowment, sparse).to_list() == top_trading_cycles(endowment, Preference(rows)).to_list()
+
+def test_sparse_individually_rational_and_efficient():
+    rng = random.Random(7)
+    for _ in range(200):
+        n, m = rng.randint(1, 7), rng.randint(1, 7)
+        rows = [rng.sample(range(m), rng.randint(0, m)) for _ in range(n)]
+        held = rng.sample(range(m), min(n, m, rng.randint(0, n)))
+        endowment = held + [-1] * (n - len(held))
+        rng.shuffle(endowment)
+        sparse = SparsePreference.from_lists(rows, m)
+        allocation = top_trading_cycles(endowment, sparse).to_list()
+        for agent, (own, obj) in enumerate(zip(endowment, allocation)):
+            assert obj == own or (obj in rows[agent] and (own not in rows[agent] or rows[agent].index(obj) < rows[agent].index(own)))
+        assert sorted(obj for obj in allocation if obj >= 0) == sorted(held)
+
+def test_sparse_long_chain():
+    n = 20000 # every agent wants the next agent's object: one long path, then one long cycle
+    pref = SparsePreference.from_lists([[(i + 1) % n] for i in range(n)])
+    assert top_trading_cycles(list(range(n)), pref).to_list() == [(i + 1) % n for i in range(n)]
+
+def test_capacities():
+    # agents 0 and 1 hold seats of A, agent 2 holds B; B has one free seat
+    pref = SparsePreference.from_lists([[1, 0], [0], [0, 1], [1]], n_objects=2, objects=["A", "B"])
+    allocation = top_trading_cycles([0, 0, 1, -1], pref, capacities=[2, 2])
+    assert isinstance(allocation, ManyToOneAllocation)
+    # 0 takes the free seat of B and frees its seat of A, 2 takes that seat and frees its seat of B for 3
+    assert allocation.to_list() == [1, 0, 0, 1]
+    assert allocation.remaining() == [0, 0]
+    with pytest.raises(ValueError):
+        top_trading_cycles([0, 0, 0, -1], pref, capacities=[2, 2])
+    with pytest.raises(ValueError):
+        top_trading_cycles([0, 0, 2, -1], pref, capacities=[2, 2])
+    with pytest.raises(ValueError):
+        top_trading_cycles([0, 0, 1, -1], pref, capacities=[2, 2], observer=print)
+
+def test_unit_capacities_match_ttc():
+    rng = random.Random(11)
+    for _ in range(100):
+        n = rng.randint(1, 8)
+        rows = [rng.sample(range(n), rng.randint(0, n)) for _ in range(n)]
+        endowment = rng.sample(range(n), n)
+        pref = SparsePreference.from_lists(rows, n)
+        assert top_trading_cycles(endowment, pref, capacities=[1] * n).to_list() == top_trading_cycles(endowment, pref).to_list()
+
+def _dominated(allocation, rows, capacities, endowment):
+    """Brute force: is there a feasible assignment every agent weakly prefers, one strictly? The endowment is the outside option."""
+    def score(agent, obj):
+        if obj in rows[agent]:
+            return len(rows[agent]) - rows[agent].index(obj)
+        return 0 if obj == endowment[agent] else (-0.5 if obj == -1 else -1)
+    current = [score(a, obj) for a, obj in enumerate(allocation)]
+    for other in itertools.product(*[[-1, endowment[a]] + row for a, row in enumerate(rows)]):
+        if any(other.count(obj) > c for obj, c in enumerate(capacities)):
+            continue
+        scores = [score(a, obj) for a, obj in enumerate(other)]
+        if all(s >= c for s, c in zip(scores, current)) and scores != current:
+            return True
+    return False
+
+def test_capacities_individually_rational_and_efficient():
+    rng = random.Random(12)
+    for _ in range(300):
+        n, m = rng.randint(1, 5), rng.randint(1, 3)
+        capacities = [rng.randint(0, 2) for _ in range(m)]
+        rows = [rng.sample(range(m), rng.randint(0, m)) for _ in range(n)]
+        seats = [obj for obj in range(m) for _ in range(capacities[obj])]
+        rng.shuffle(seats)
+        endowment = (seats[:rng.randint(0, min(n, len(seats)))] + [-1] * n)[:n]
+        rng.shuffle(endowment)
+        allocation = top_trading_cycles(endowment, SparsePreference.from_lists(rows, m), capacities=capacities).to_list()
+        for agent, (own, obj) in enumerate(zip(endowment, allocation)):
+            assert obj == own or (obj in rows[agent] and (own not in rows[agent] or rows[agent].index(obj) < rows[agent].index(own)))
+        assert all(allocation.count(obj) <= c for obj, c in enumerate(capacities))
+        assert not _dominated(allocation, rows, capacities, endowment)
+
+def test_capacities_large_market():
+    rng = random.Random(13)
+    n, m = 20000, 100
+    pref = SparsePreference.from_lists((rng.sample(range(m), 5) for _ in range(n)), m)
+    endowment = [i % m for i in range(n)]
+    allocation = top_trading_cycles(endowment, pref, capacities=[n // m + 10] * m)
+    assert all(r >= 0 for r in allocation.remaining())